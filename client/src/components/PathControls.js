@@ -71,6 +71,8 @@ const PathControls = ({
           <option value="dijkstra">Dijkstra</option>
           <option value="greedy">Greedy</option>
           <option value="theta_star">Theta*</option>
+          <option value="csgraph">Dijkstra (sparse graph)</option>
+          <option value="hierarchical">Coarse-to-fine A*</option>
         </select>
       </label>
      {paramFields.map(field => (
@@ -4,6 +4,8 @@ import OptimalPathChart from './OptimalPathChart';
 import PathControls from './PathControls';
 import * as THREE from 'three';
 
+// Optimal-path responses kept for ETag revalidation; the least recently used one is dropped beyond this
+const OPTIMAL_PATH_CACHE_SIZE = 20;
 
 const PotreeViewer = () => {
   const containerRef = useRef(null);
@@ -11,6 +13,9 @@ const PotreeViewer = () => {
   const [selectedPoints, setSelectedPoints] = useState([]);
   const [profileResult, setProfileResult] = useState(null);
   const [optimalPathResult, setOptimalPathResult] = useState(null);
+  // Last optimal-path response per request (the most recent OPTIMAL_PATH_CACHE_SIZE requests),
+  // revalidated with its ETag instead of downloaded again
+  const optimalPathCache = useRef(new Map());
 
   const [params, setParams] = useState({
   algorithm: "astar",
@@ -156,17 +161,38 @@ const sendOptimalPathRequest = async (activeParams) => {
     const point2 = [p2.x, p2.y, p2.z];
 
     const urlParams = new URLSearchParams(activeParams);
+    const url = `http://localhost:8000/optimal-path?${urlParams.toString()}`;
+    const body = JSON.stringify({ point1, point2 });
+    const cacheKey = `${url} ${body}`;
+    const cached = optimalPathCache.current.get(cacheKey);
 
     try {
-      const response = await fetch(`http://localhost:8000/optimal-path?${urlParams.toString()}`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ point1, point2 }),
-      });
-      if (!response.ok) {
-        throw new Error(await response.text());
+      const headers = { 'Content-Type': 'application/json' };
+      if (cached) {
+        headers['If-None-Match'] = cached.etag;
+      }
+      const response = await fetch(url, { method: 'POST', headers, body });
+      let data;
+      const cache = optimalPathCache.current;
+      if (response.status === 304 && cached) {
+        data = cached.data;
+        // Re-inserting moves the entry to the end of the Map's insertion order
+        cache.delete(cacheKey);
+        cache.set(cacheKey, cached);
+      } else {
+        if (!response.ok) {
+          throw new Error(await response.text());
+        }
+        data = await response.json();
+        const etag = response.headers.get('ETag');
+        if (etag) {
+          cache.delete(cacheKey);
+          cache.set(cacheKey, { etag, data });
+          while (cache.size > OPTIMAL_PATH_CACHE_SIZE) {
+            cache.delete(cache.keys().next().value);
+          }
+        }
       }
-      const data = await response.json();
       if (!data.path || !Array.isArray(data.path) || data.path.length === 0) {
         alert('No valid path found. Please adjust your parameters.');
         throw new Error('Invalid path data received from server');
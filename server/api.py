@@ -1,12 +1,27 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from pydantic import BaseModel
+import os
+import json
 import time
+import asyncio
+import numpy as np
 from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
-from models import PointRequest, ProfileResponse 
-from utils.terrain_profile import get_terrain_profile
-from utils.optimal_path import a_star, dijkstra, greedy_best_first, get_elevation_grid, theta_star
-from utils.functions import path_length, average_slope
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from models import PointRequest, ProfileResponse, CostDistanceRequest, BatchPathRequest
+from utils.terrain_profile import sample_terrain_profile, MAX_PROFILE_POINTS
+from utils.routing import (
+    ALGORITHMS, optimal_path_job, elevation_grid_job, route_on_grid, path_bounds, grid_cell, search_options,
+)
+from utils.cost_field import cost_distance_job
+from utils.executor import executor, PoolBusy, JobTimeout, JobCancelled
+from utils.result_cache import result_cache
+from utils.encoding import JSON_MEDIA_TYPE, negotiate, to_jsonable, encode_arrays
+from utils.metrics import metrics, record_search
+from utils.dtm_tiles import start_background_build
+from utils.sessions import sessions, session_executor, SessionElsewhere
+from utils.terrain_store import terrain_store
+from utils.warmup import readiness, parse_areas, warm_worker
 
 app = FastAPI()
 
@@ -16,135 +31,404 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Cache", "X-Metadata"],
 )
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # The route template keeps the label set small (no per-request paths)
+    route = request.scope.get("route")
+    metrics.observe(
+        "request_seconds", time.perf_counter() - start, "Request latency until the response headers are sent",
+        path=route.path if route is not None else "unmatched", method=request.method, status=response.status_code,
+    )
+    return response
 
 
-@app.post("/profile", response_model=ProfileResponse)
-async def create_profile(request: PointRequest):
-    if len(request.point1) != 3 or len(request.point2) != 3:
-        raise HTTPException(status_code=400, detail="Points must be 3D coordinates")
+@app.on_event("startup")
+def build_dtm_on_startup():
+    # Set DTM_BUILD_ON_STARTUP=1 to (re)build the tiled ground raster in the background.
+    # Only tiles whose EPT nodes changed are rebuilt; requests use the point cloud until it is ready.
+    if os.environ.get("DTM_BUILD_ON_STARTUP") == "1":
+        start_background_build()
+
+
+@app.on_event("startup")
+def warm_up():
+    # Workers are spawned now rather than on the first request, and every process loads the heavy modules
+    # and the EPT metadata, and the workers the PREWARM_AREAS points, before /health reports ready.
+    # WARMUP_ON_STARTUP=0 skips it.
+    if os.environ.get("WARMUP_ON_STARTUP", "1") == "0":
+        readiness.start(warm=False)
+        return
+    parse_areas()  # a malformed PREWARM_AREAS stops the startup instead of every worker
+    executor.start(warmup=warm_worker)
+    readiness.start(executor)
+
+
+@app.on_event("shutdown")
+def stop_workers():
+    executor.shutdown()
+    session_executor.shutdown()
+    terrain_store.release()
+
+
+def encoded_response(array, metadata, media_type, dtype, headers=None):
+    body, content_type, extra_headers = encode_arrays(array, metadata, media_type, dtype)
+    return Response(body, media_type=content_type, headers={**(headers or {}), **extra_headers, "Vary": "Accept"})
+
+
+async def run_job(raw_request, func, *args, job_executor=None, **kwargs):
+    """
+    Runs a blocking job in the worker pool (or job_executor) so the event loop stays free for other requests,
+    and maps pool errors to HTTP responses. The job is cancelled if the client disconnects;
+    raw_request is the Request or, for shared computations, a coroutine function telling when to give up.
+    """
+    is_disconnected = raw_request.is_disconnected if isinstance(raw_request, Request) else raw_request
     try:
-        profile = get_terrain_profile(request.point1, request.point2)
+        return await (job_executor or executor).run(func, *args, is_disconnected=is_disconnected, **kwargs)
+    except PoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except JobTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except JobCancelled as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    return profile
+
+
+@app.post("/profile", response_model=ProfileResponse)
+async def create_profile(
+    request: PointRequest,
+    raw_request: Request,
+    num_points: int = Query(100, ge=2, le=MAX_PROFILE_POINTS),
+):
+    if len(request.point1) != 3 or len(request.point2) != 3:
+        raise HTTPException(status_code=400, detail="Points must be 3D coordinates")
+    profile = await run_job(raw_request, sample_terrain_profile, request.point1, request.point2, num_points)
+    media_type, dtype = negotiate(raw_request.headers.get("accept"))
+    coordinates = profile["coordinates"]
+    if media_type == JSON_MEDIA_TYPE:
+        return ProfileResponse(
+            distances=profile["distances"].tolist(),
+            elevations=coordinates[:, 2].tolist(),
+            coordinates=coordinates.tolist(),
+        )
+    return encoded_response(
+        np.column_stack([profile["distances"], coordinates]), {"columns": ["distance", "x", "y", "z"]},
+        media_type, dtype,
+    )
+
+def worker_cache_stats() -> dict:
+    caches = executor.cache_stats()
+    if executor.kind == "process":
+        # Planning sessions run in this process and use its own caches
+        caches["server"] = session_executor.cache_stats()
+    return caches
+
+@app.get("/cache-stats")
+def cache_stats():
+    return {
+        **worker_cache_stats(),
+        "workers": executor.stats(),
+        "results": result_cache.stats(),
+        "sessions": sessions.stats(),
+        "terrain_store": terrain_store.stats(),
+    }
+
+@app.get("/health")
+def health():
+    """
+    200 once the startup warm-up of the server and all workers has finished, 503 until then.
+    """
+    return JSONResponse(readiness.stats(), status_code=200 if readiness.ready() else 503)
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """
+    Request latency and per-stage timing histograms, search counters and cache hits in the
+    Prometheus text format, plus the current worker pool and result cache state as gauges.
+    """
+    workers = executor.stats()
+    metrics.set("workers_running", workers["running"], "Jobs running in the worker pool")
+    metrics.set("workers_queued", workers["queued"], "Jobs waiting for a free worker")
+    for outcome, count in executor.counters.items():
+        metrics.set("worker_jobs_total", count, "Worker pool jobs by outcome", kind="counter", outcome=outcome)
+    metrics.set("result_cache_entries", result_cache.stats()["entries"], "Responses held in the result cache")
+    caches = executor.cache_stats()
+    for name in ("points", "edge_tables", "cost_fields"):
+        evictions = caches.get(name, {}).get("evictions", 0)
+        metrics.set("cache_evictions_total", evictions, "Cache evictions over all workers", kind="counter", cache=name)
+    metrics.set("point_cache_bytes", caches.get("points", {}).get("bytes", 0), "Bytes held in the point caches of all workers")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.post("/optimal-path")
 async def optimal_path(
     request: PointRequest,
-    algorithm: str = Query("astar", enum=["astar", "dijkstra", "greedy", "theta_star"]),
+    raw_request: Request,
+    algorithm: str = Query("astar", enum=list(ALGORITHMS)),
     max_slope: float = Query(100.0),
     min_elev: Optional[float] = Query(None),
     max_elev: Optional[float] = Query(None),
     grid_size: int = Query(100),
     max_step: float = Query(10000.0),
     max_angle: float = Query(180.0),
-    buffer : int = Query(10)
-
+    buffer : int = Query(10),
+    interpolation: str = Query("nearest", enum=["nearest", "idw", "griddata"]),
+    reducer: str = Query("mean", enum=["min", "mean", "max"]),
+    corridor_width: int = Query(3, ge=0),
+    coarse_size: int = Query(64, ge=2),
+    time_budget: float = Query(1.0, gt=0),
+    epsilon: float = Query(3.0, ge=1.0),
+    length_weighted_slope: bool = Query(False),
+    debug: bool = Query(False),
 ): 
     start_time = time.time()  # Start timer
 
     if len(request.point1) != 3 or len(request.point2) != 3:
         raise HTTPException(status_code=400, detail="Points must be 3D coordinates")
-    try:
-        print(f"Finding optimal path from {request.point1} to {request.point2} using {algorithm} algorithm")
-        print(f"Parameters: max_slope={max_slope}, min_elev={min_elev}, max_elev={max_elev}, grid_size={grid_size}, max_step={max_step}, max_angle={max_angle}")
-        # Prepare grid and indices
-        min_x = min(request.point1[0], request.point2[0])
-        max_x = max(request.point1[0], request.point2[0])
-        min_y = min(request.point1[1], request.point2[1])
-        max_y = max(request.point1[1], request.point2[1])
-        bounds = (min_x - buffer, max_x + buffer, min_y - buffer, max_y + buffer)
-        xx, yy, elevations = get_elevation_grid(bounds, grid_size=grid_size)
-        def closest_idx(x, y):
-            ix = (abs(xx[0] - x)).argmin()
-            iy = (abs(yy[:,0] - y)).argmin()
-            return (iy, ix)
-        start_idx = closest_idx(request.point1[0], request.point1[1])
-        goal_idx = closest_idx(request.point2[0], request.point2[1])
-        forbidden_mask = None  # You can add logic to build this mask if needed
-
-        # Select algorithm
-        if algorithm == "astar":
-            path_indices = a_star(
-                elevations, start_idx, goal_idx,
-                max_slope=max_slope,
-                forbidden_mask=forbidden_mask,
-                min_elev=min_elev,
-                max_elev=max_elev,
-                max_step=max_step,
-                max_angle=max_angle,
-            )
-        elif algorithm == "dijkstra":
-            path_indices = dijkstra(
-                elevations, start_idx, goal_idx,
-                max_slope=max_slope,
-                forbidden_mask=forbidden_mask,
-                min_elev=min_elev,
-                max_elev=max_elev,
-                max_angle=max_angle,
-                max_step=max_step,
-            )
-        elif algorithm == "greedy":
-            path_indices = greedy_best_first(
-                elevations, start_idx, goal_idx,
-                max_slope=max_slope,
-                forbidden_mask=forbidden_mask,
-                min_elev=min_elev,
-                max_elev=max_elev,
-                max_angle=max_angle,
-                max_step=max_step,
-            )
-        elif algorithm == "theta_star":
-            path_indices = theta_star(
-            elevations, start_idx, goal_idx,
+    if algorithm not in ALGORITHMS:
+        raise HTTPException(status_code=400, detail="Unknown algorithm")
+    options = search_options(algorithm, corridor_width, coarse_size, time_budget, epsilon)
+    # The response only depends on the snapped cells, the grid and the search settings
+    bounds = path_bounds([request.point1, request.point2], buffer)
+    key = (
+        bounds, grid_size, interpolation, reducer,
+        grid_cell(bounds, grid_size, request.point1[0], request.point1[1]),
+        grid_cell(bounds, grid_size, request.point2[0], request.point2[1]),
+        algorithm, max_slope, min_elev, max_elev, max_step, max_angle,
+        tuple(sorted(options.items())) if options else None,
+        length_weighted_slope,
+    )
+
+    async def compute(is_disconnected):
+        result = await run_job(
+            is_disconnected, optimal_path_job,
+            request.point1, request.point2, algorithm,
             max_slope=max_slope,
-            forbidden_mask=forbidden_mask,
             min_elev=min_elev,
             max_elev=max_elev,
+            grid_size=grid_size,
             max_step=max_step,
             max_angle=max_angle,
+            buffer=buffer,
+            interpolation=interpolation,
+            reducer=reducer,
+            options=options,
+            length_weighted_slope=length_weighted_slope,
         )
-        else:
-            raise HTTPException(status_code=400, detail="Unknown algorithm")
-
-        # Convert indices to coordinates
-        path_points = []
-        for iy, ix in path_indices:
-            x = xx[iy, ix]
-            y = yy[iy, ix]
-            z = elevations[iy, ix]
-            path_points.append([float(x), float(y), float(z)])
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        record_search("optimal-path", algorithm, result["debug"])
+        return result
 
-    if not path_points:
-        return {
-            "path": [],
-            "length": 0,
-            "average_slope": 0,
-            "min_slope": 0,
-            "max_slope": 0,
-            "local_average_slope": 0,
-            "local_min_slope": 0,
-            "local_max_slope": 0
-        }
-    
-    length = path_length(path_points)
-    slope_stats = average_slope(path_points)
-    elapsed = time.time() - start_time  # End timer
-    print(f"Request took {elapsed:.3f} seconds")
-    return {
-        "path": path_points,
-        "length": length,
-        "average_slope": slope_stats["avg"],
-        "min_slope": slope_stats["min"],
-        "max_slope": slope_stats["max"],
-        "local_average_slope": slope_stats["local_avg"],
-        "local_min_slope": slope_stats["local_min"],
-        "local_max_slope": slope_stats["local_max"]
+    result, etag, source = await result_cache.get_or_compute(key, compute, raw_request.is_disconnected)
+    metrics.inc("result_cache_requests_total", 1, "/optimal-path requests by result cache outcome", outcome=source)
+    media_type, dtype = negotiate(raw_request.headers.get("accept"))
+    if media_type != JSON_MEDIA_TYPE:
+        # Each representation needs its own strong ETag
+        etag = f'{etag[:-1]}-{media_type.rsplit("-", 1)[-1]}-{dtype}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={int(result_cache.ttl)}",
+        "X-Cache": source.upper(),
+        "Vary": "Accept",
     }
+    elapsed = time.time() - start_time  # End timer
+    body = {key: value for key, value in result.items() if key != "debug"}
+    if debug:
+        # The breakdown is that of the computation that produced the (possibly cached) result
+        body["debug"] = {**result["debug"], "cache": source, "request_seconds": elapsed}
+        headers = {"X-Cache": source.upper(), "Cache-Control": "no-store", "Vary": "Accept"}
+    elif etag in [tag.strip() for tag in raw_request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    if media_type == JSON_MEDIA_TYPE:
+        return JSONResponse(to_jsonable(body), headers=headers)
+    metadata = {"columns": ["x", "y", "z"], **{key: value for key, value in body.items() if key != "path"}}
+    return encoded_response(body["path"], metadata, media_type, dtype, headers)
+
+
+@app.post("/optimal-path/batch")
+async def optimal_path_batch(
+    request: BatchPathRequest,
+    raw_request: Request,
+    grid_size: int = Query(100),
+    buffer: int = Query(10),
+    interpolation: str = Query("nearest", enum=["nearest", "idw", "griddata"]),
+    reducer: str = Query("mean", enum=["min", "mean", "max"]),
+    stream: bool = Query(True),
+    debug: bool = Query(False),
+):
+    """
+    Runs many path jobs on one shared elevation grid covering all their points.
+    With stream=true results are sent as NDJSON lines in completion order, each tagged with the job's index;
+    otherwise one JSON document lists them in job order.
+    """
+    if not request.jobs:
+        raise HTTPException(status_code=400, detail="No jobs given")
+    for job in request.jobs:
+        if len(job.point1) != 3 or len(job.point2) != 3:
+            raise HTTPException(status_code=400, detail="Points must be 3D coordinates")
+        if job.algorithm not in ALGORITHMS:
+            raise HTTPException(status_code=400, detail=f"Unknown algorithm '{job.algorithm}'")
+
+    bounds = path_bounds([point for job in request.jobs for point in (job.point1, job.point2)], buffer)
+    x_coords, y_coords, elevations = await run_job(
+        raw_request, elevation_grid_job, bounds,
+        grid_size=grid_size, interpolation=interpolation, reducer=reducer,
+    )
+    # At most one job per worker at a time, so a large batch does not fill the shared queue
+    slots = asyncio.Semaphore(executor.workers)
+
+    async def run_batch_job(index, job):
+        options = search_options(job.algorithm, job.corridor_width, job.coarse_size, job.time_budget, job.epsilon)
+        async with slots:
+            try:
+                result = await run_job(
+                    raw_request, route_on_grid,
+                    x_coords, y_coords, elevations, job.point1, job.point2, job.algorithm,
+                    max_slope=job.max_slope,
+                    min_elev=job.min_elev,
+                    max_elev=job.max_elev,
+                    max_step=job.max_step,
+                    max_angle=job.max_angle,
+                    options=options,
+                    length_weighted_slope=job.length_weighted_slope,
+                )
+            except HTTPException as e:
+                return {"index": index, "status": e.status_code, "error": e.detail}
+        report = result.pop("debug")
+        record_search("optimal-path/batch", job.algorithm, report)
+        if debug:
+            result["debug"] = report
+        return {"index": index, "status": 200, **result}
+
+    tasks = [asyncio.ensure_future(run_batch_job(index, job)) for index, job in enumerate(request.jobs)]
+    if not stream:
+        return to_jsonable({"bounds": list(bounds), "results": await asyncio.gather(*tasks)})
+
+    async def results():
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(to_jsonable(await finished)) + "\n"
+        finally:
+            # The client went away mid-stream: stop the jobs that are still queued or running
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.post("/sessions")
+def create_planning_session(
+    grid_size: int = Query(100),
+    buffer: int = Query(10),
+    interpolation: str = Query("nearest", enum=["nearest", "idw", "griddata"]),
+    reducer: str = Query("mean", enum=["min", "mean", "max"]),
+):
+    """
+    Opens a planning session for a path whose endpoints will be moved repeatedly. The session keeps
+    the loaded terrain and the search state, so small endpoint or constraint changes are repaired
+    instead of planned again. It expires after SESSION_TTL seconds without requests.
+    """
+    session = sessions.create(grid_size=grid_size, buffer=buffer, interpolation=interpolation, reducer=reducer)
+    return {"session_id": session.id, "ttl": sessions.ttl}
+
+@app.post("/sessions/{session_id}/optimal-path")
+async def session_optimal_path(
+    session_id: str,
+    request: PointRequest,
+    raw_request: Request,
+    max_slope: float = Query(100.0),
+    min_elev: Optional[float] = Query(None),
+    max_elev: Optional[float] = Query(None),
+    max_step: float = Query(10000.0),
+    max_angle: float = Query(180.0),
+    length_weighted_slope: bool = Query(False),
+    debug: bool = Query(False),
+):
+    """
+    Like /optimal-path (astar costs) on the session's grid. The response's "replan" entry tells whether
+    the grid was reused and whether the previous search was repaired, re-rooted or run again.
+    """
+    try:
+        session = sessions.get(session_id)
+    except SessionElsewhere as e:
+        raise HTTPException(status_code=421, detail=str(e))
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    if len(request.point1) != 3 or len(request.point2) != 3:
+        raise HTTPException(status_code=400, detail="Points must be 3D coordinates")
+    result = await run_job(
+        raw_request, session.route,
+        request.point1, request.point2,
+        max_slope=max_slope,
+        min_elev=min_elev,
+        max_elev=max_elev,
+        max_step=max_step,
+        max_angle=max_angle,
+        length_weighted_slope=length_weighted_slope,
+        job_executor=session_executor,
+    )
+    report = result.pop("debug")
+    record_search("sessions/optimal-path", result["replan"]["mode"], report)
+    if debug:
+        result["debug"] = report
+    media_type, dtype = negotiate(raw_request.headers.get("accept"))
+    if media_type == JSON_MEDIA_TYPE:
+        return JSONResponse(to_jsonable(result), headers={"Vary": "Accept"})
+    metadata = {"columns": ["x", "y", "z"], **{key: value for key, value in result.items() if key != "path"}}
+    return encoded_response(result["path"], metadata, media_type, dtype)
+
+@app.delete("/sessions/{session_id}")
+def delete_planning_session(session_id: str):
+    try:
+        deleted = sessions.delete(session_id)
+    except SessionElsewhere as e:
+        raise HTTPException(status_code=421, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    return {"deleted": session_id}
+
+@app.post("/cost-distance")
+async def cost_distance(
+    request: CostDistanceRequest,
+    raw_request: Request,
+    max_slope: float = Query(100.0),
+    min_elev: Optional[float] = Query(None),
+    max_elev: Optional[float] = Query(None),
+    grid_size: int = Query(100),
+    max_step: float = Query(10000.0),
+    max_angle: float = Query(180.0),
+    radius: float = Query(500.0, gt=0),
+    interpolation: str = Query("nearest", enum=["nearest", "idw", "griddata"]),
+    reducer: str = Query("mean", enum=["min", "mean", "max"]),
+    include_surface: bool = Query(False),
+):
+    if len(request.origin) != 3 or any(len(goal) != 3 for goal in request.goals):
+        raise HTTPException(status_code=400, detail="Points must be 3D coordinates")
+    if request.bounds is not None and len(request.bounds) != 4:
+        raise HTTPException(status_code=400, detail="Bounds must be [min_x, max_x, min_y, max_y]")
+    if request.bounds is not None:
+        bounds = tuple(request.bounds)
+    else:
+        x, y = request.origin[0], request.origin[1]
+        bounds = (x - radius, x + radius, y - radius, y + radius)
+    result = await run_job(
+        raw_request, cost_distance_job,
+        request.origin, request.goals, bounds,
+        grid_size=grid_size,
+        max_slope=max_slope,
+        min_elev=min_elev,
+        max_elev=max_elev,
+        max_step=max_step,
+        max_angle=max_angle,
+        interpolation=interpolation,
+        reducer=reducer,
+        include_surface=include_surface,
+    )
+    return to_jsonable(result)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,78 @@
+"""
+Times the vectorized path statistics (utils.functions.path_statistics) on long synthetic paths
+and compares them with the original per-segment loop, which interpolated every segment in 1 m steps.
+
+Run from the server directory:
+    python -m benchmarks.bench_path_stats --vertices 1000 10000 100000
+"""
+import argparse
+import time
+import numpy as np
+from utils.functions import path_statistics
+
+
+def synthetic_path(vertices: int, segment_length: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    headings = np.cumsum(rng.normal(0.0, 0.3, vertices))
+    steps = rng.uniform(0.5, 2.0 * segment_length, vertices)
+    x = np.cumsum(steps * np.cos(headings))
+    y = np.cumsum(steps * np.sin(headings))
+    z = 300.0 + np.cumsum(rng.normal(0.0, 0.2 * segment_length, vertices))
+    return np.column_stack([x, y, z])
+
+
+def loop_statistics(path: np.ndarray) -> dict:
+    # Per-segment loop with the 1 m interpolation steps of the original implementation, as the baseline
+    slopes = []
+    local_slopes = []
+    for i in range(1, len(path)):
+        dz = path[i, 2] - path[i-1, 2]
+        horizontal_dist = np.hypot(path[i, 0] - path[i-1, 0], path[i, 1] - path[i-1, 1])
+        if horizontal_dist > 0:
+            slopes.append(abs(dz) / horizontal_dist)
+        steps = int(np.ceil(horizontal_dist))
+        if steps > 1:
+            for j in range(steps):
+                x0, y0, z0 = path[i-1]
+                x1, y1, z1 = path[i]
+                t0 = j / steps
+                t1 = (j + 1) / steps
+                hdist = np.hypot((x1 - x0) * (t1 - t0), (y1 - y0) * (t1 - t0))
+                if hdist > 0:
+                    local_slopes.append(abs((z1 - z0) * (t1 - t0)) / hdist)
+        elif horizontal_dist > 0:
+            local_slopes.append(abs(dz) / horizontal_dist)
+    return {
+        "length": float(np.linalg.norm(np.diff(path, axis=0), axis=1).sum()),
+        "avg": float(np.mean(slopes)),
+        "local_avg": float(np.mean(local_slopes)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vertices", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--segment-length", type=float, default=5.0,
+                        help="Mean horizontal segment length in metres (Theta* paths have long segments)")
+    parser.add_argument("--loop-limit", type=int, default=100000,
+                        help="Skip the loop baseline above this many vertices")
+    args = parser.parse_args()
+
+    print(f"{'vertices':>9} {'loop s':>9} {'vector s':>9} {'speedup':>8} {'max rel diff':>13}")
+    for vertices in args.vertices:
+        path = synthetic_path(vertices, args.segment_length)
+        start = time.perf_counter()
+        stats = path_statistics(path)
+        vector_time = time.perf_counter() - start
+        if vertices > args.loop_limit:
+            print(f"{vertices:>9} {'-':>9} {vector_time:9.4f} {'-':>8} {'-':>13}")
+            continue
+        start = time.perf_counter()
+        reference = loop_statistics(path)
+        loop_time = time.perf_counter() - start
+        diff = max(abs(stats[key] - value) / max(abs(value), 1e-12) for key, value in reference.items())
+        print(f"{vertices:>9} {loop_time:9.3f} {vector_time:9.4f} {loop_time / vector_time:8.0f} {diff:13.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares scipy.interpolate.griddata(method='nearest') with the binned rasterization used by
+get_elevation_grid on synthetic ground points.
+
+Run from the server directory:
+    python -m benchmarks.bench_rasterize --points 1e6 5e6 1e7 5e7 --grid-size 100 500
+"""
+import argparse
+import time
+import numpy as np
+from utils.rasterize import rasterize_points
+
+
+def synthetic_points(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(0.0, 1000.0, n)
+    y = rng.uniform(0.0, 1000.0, n)
+    z = 100.0 + 20.0 * np.sin(x / 80.0) * np.cos(y / 120.0) + rng.normal(0.0, 0.1, n)
+    return x, y, z
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=float, nargs="+", default=[1e6, 5e6, 1e7, 5e7])
+    parser.add_argument("--grid-size", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--griddata-limit", type=float, default=1e7,
+                        help="Skip the griddata baseline above this many points")
+    args = parser.parse_args()
+
+    from scipy.interpolate import griddata
+
+    print(f"{'points':>12} {'grid':>6} {'griddata s':>11} {'binned s':>9} {'idw s':>8} {'max |dz|':>9}")
+    for n in (int(p) for p in args.points):
+        x, y, z = synthetic_points(n)
+        for grid_size in args.grid_size:
+            bounds = (0.0, 1000.0, 0.0, 1000.0)
+            xx, yy = np.meshgrid(np.linspace(0, 1000, grid_size), np.linspace(0, 1000, grid_size))
+            binned_time, binned = timed(lambda: rasterize_points(x, y, z, bounds, xx.shape))
+            idw_time, _ = timed(lambda: rasterize_points(x, y, z, bounds, xx.shape, fill="idw"))
+            if n <= args.griddata_limit:
+                griddata_time, reference = timed(
+                    lambda: griddata(np.column_stack([x, y]), z, (xx, yy), method="nearest")
+                )
+                diff = f"{np.nanmax(np.abs(binned - reference)):9.3f}"
+                griddata_col = f"{griddata_time:11.3f}"
+            else:
+                diff = f"{'-':>9}"
+                griddata_col = f"{'skipped':>11}"
+            print(f"{n:>12} {grid_size:>6} {griddata_col} {binned_time:9.3f} {idw_time:8.3f} {diff}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compares planning again from scratch (astar) with repairing the previous search (utils.incremental)
+after small endpoint drags and after constraint changes, on synthetic terrain.
+
+Run from the server directory:
+    python -m benchmarks.bench_replan --sizes 200 400 --moves 20 --step 4
+"""
+import argparse
+import time
+import numpy as np
+from benchmarks.synthetic import synthetic_terrain
+from utils.incremental import IncrementalPlanner
+from utils.search import grid_search
+from utils.traversability import edge_tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 400])
+    parser.add_argument("--moves", type=int, default=20, help="Endpoint drags per grid")
+    parser.add_argument("--step", type=int, default=4, help="Largest drag in cells along each axis")
+    parser.add_argument("--max-slope", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'grid':>6} {'edit':>10} {'full s':>8} {'repair s':>9} {'speedup':>8} {'full exp':>9} {'repair exp':>11}")
+    for size in args.sizes:
+        rng = np.random.default_rng(args.seed)
+        elevations, forbidden = synthetic_terrain(size, args.seed)
+        tables = edge_tables(elevations, args.max_slope)
+        start, goal = (1, 1), (size - 2, size - 2)
+        planner = IncrementalPlanner(tables, tables.index(start), tables.index(goal))
+        planner.compute()
+
+        full_seconds = repair_seconds = 0.0
+        full_expanded = repair_expanded = 0
+        for _ in range(args.moves):
+            goal = tuple(int(v) for v in np.clip(np.add(goal, rng.integers(-args.step, args.step + 1, 2)), 0, size - 1))
+            stats = {}
+            t0 = time.perf_counter()
+            reference = grid_search(elevations, start, goal, mode="astar", max_slope=args.max_slope, stats=stats)
+            full_seconds += time.perf_counter() - t0
+            full_expanded += stats["expanded"]
+
+            before = planner.expanded
+            t0 = time.perf_counter()
+            planner.move_target(tables.index(goal))
+            path = planner.compute()
+            repair_seconds += time.perf_counter() - t0
+            repair_expanded += planner.expanded - before
+            if bool(path) != bool(reference):
+                raise RuntimeError(f"Repaired search disagrees on reachability of {goal}")
+        print(f"{size:>6} {'drag':>10} {full_seconds / args.moves:8.4f} {repair_seconds / args.moves:9.4f} "
+              f"{full_seconds / max(repair_seconds, 1e-9):7.1f}x {full_expanded // args.moves:>9} "
+              f"{repair_expanded // args.moves:>11}")
+
+        # Constraint edits on the last planner state: forbidden zones are local, a new max_slope is global
+        for edit, constraints in (
+            ("forbidden", {"max_slope": args.max_slope, "forbidden_mask": forbidden}),
+            ("max_slope", {"max_slope": args.max_slope * 1.1}),
+        ):
+            edited = edge_tables(elevations, **constraints)
+            t0 = time.perf_counter()
+            grid_search(elevations, start, goal, mode="astar", **constraints)
+            full = time.perf_counter() - t0
+            planner = IncrementalPlanner(tables, tables.index(start), tables.index(goal))
+            planner.compute()
+            t0 = time.perf_counter()
+            if planner.update_tables(edited):
+                planner.compute()
+                repair = time.perf_counter() - t0
+                print(f"{size:>6} {edit:>10} {full:8.4f} {repair:9.4f} {full / max(repair, 1e-9):7.1f}x")
+            else:
+                print(f"{size:>6} {edit:>10} {full:8.4f} {'-':>9}  change too widespread, planned again")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Reports node-expansion throughput of the grid searches on synthetic terrain. With a turning limit,
+lattice (exact, over cell and heading states) can be compared with the angle-filtered searches.
+
+Run from the server directory:
+    python -m benchmarks.bench_search --grid-size 100 300 500
+    python -m benchmarks.bench_search --algorithm astar lattice --max-angle 60
+
+--baseline also runs the implementations from before utils.search (benchmarks.legacy_search) on the
+same grids and reports their time and the speedup. They are slow: keep the grids small.
+    python -m benchmarks.bench_search --grid-size 100 150 --baseline
+"""
+import argparse
+import time
+import numpy as np
+from utils.optimal_path import a_star, dijkstra, greedy_best_first, theta_star
+from utils.lattice import lattice_search
+from benchmarks import legacy_search
+
+ALGORITHMS = {
+    "astar": a_star,
+    "dijkstra": dijkstra,
+    "greedy": greedy_best_first,
+    "theta_star": theta_star,
+    "lattice": lattice_search,
+}
+BASELINES = {
+    "astar": legacy_search.a_star,
+    "dijkstra": legacy_search.dijkstra,
+    "greedy": legacy_search.greedy_best_first,
+    "theta_star": legacy_search.theta_star,
+}
+
+
+def synthetic_elevations(grid_size: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.cumsum(np.cumsum(rng.normal(0.0, 1.0, (grid_size, grid_size)), axis=0), axis=1) * 0.05
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grid-size", type=int, nargs="+", default=[100, 300, 500])
+    parser.add_argument("--algorithm", nargs="+", default=list(ALGORITHMS), choices=list(ALGORITHMS))
+    parser.add_argument("--max-slope", type=float, default=100.0)
+    parser.add_argument("--max-angle", type=float, default=180.0)
+    parser.add_argument("--baseline", action="store_true", help="Also time the implementations before utils.search")
+    args = parser.parse_args()
+
+    header = f"{'algorithm':>10} {'grid':>6} {'expanded':>9} {'pushes':>9} {'seconds':>8} {'nodes/s':>10}"
+    if args.baseline:
+        # The old A* and Theta* have no closed-set check and expand stale heap entries again, so their
+        # expansion counts differ; compare the seconds per search
+        header += f" {'old exp':>9} {'old s':>8} {'speedup':>8}"
+    print(header)
+    for grid_size in args.grid_size:
+        elevations = synthetic_elevations(grid_size)
+        start, goal = (0, 0), (grid_size - 1, grid_size - 1)
+        for name in args.algorithm:
+            stats = {}
+            t0 = time.perf_counter()
+            ALGORITHMS[name](
+                elevations, start, goal,
+                max_slope=args.max_slope, max_step=10000.0, max_angle=args.max_angle, stats=stats,
+            )
+            elapsed = time.perf_counter() - t0
+            line = (f"{name:>10} {grid_size:>6} {stats['expanded']:>9} {stats['pushes']:>9} "
+                    f"{elapsed:8.3f} {stats['expanded'] / elapsed:10.0f}")
+            if args.baseline and name in BASELINES:
+                old_stats = {}
+                t0 = time.perf_counter()
+                BASELINES[name](
+                    elevations, start, goal,
+                    max_slope=args.max_slope, max_step=10000.0, max_angle=args.max_angle, stats=old_stats,
+                )
+                old_elapsed = time.perf_counter() - t0
+                line += f" {old_stats['expanded']:>9} {old_elapsed:8.3f} {old_elapsed / elapsed:7.1f}x"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
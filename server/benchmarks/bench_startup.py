@@ -0,0 +1,99 @@
+"""
+Measures the cold start of the server: the time until it accepts connections and until /health
+reports ready, and the latency of the first and second /optimal-path requests, once without the
+startup warm-up (WARMUP_ON_STARTUP=0) and once with it and the request area in PREWARM_AREAS.
+Each run starts a fresh uvicorn process.
+
+Run from the server directory (points must lie inside the EPT dataset):
+    python -m benchmarks.bench_startup --point1 X Y Z --point2 X Y Z --workers 2
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import urllib.error
+import urllib.request
+from utils.routing import path_bounds
+
+
+def get_status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1.0) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def post_path(url: str, body: bytes, grid_size: int) -> float:
+    request = urllib.request.Request(
+        f"{url}/optimal-path?grid_size={grid_size}", data=body,
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - t0
+
+
+def run_server(port: int, env: dict, body: bytes, grid_size: int, timeout: float) -> dict:
+    url = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port)],
+        env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        listening = ready = None
+        while ready is None:
+            if time.perf_counter() - t0 > timeout:
+                raise RuntimeError(f"Server not ready within {timeout:g} seconds")
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with status {server.returncode}")
+            try:
+                status = get_status(f"{url}/health")
+            except OSError:
+                time.sleep(0.02)
+                continue
+            if listening is None:
+                listening = time.perf_counter() - t0
+            if status == 200:
+                ready = time.perf_counter() - t0
+            else:
+                time.sleep(0.02)
+        first = post_path(url, body, grid_size)
+        second = post_path(url, body, grid_size)
+    finally:
+        server.terminate()
+        server.wait()
+    return {"listening": listening, "ready": ready, "first": first, "second": second}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--point1", type=float, nargs=3, required=True)
+    parser.add_argument("--point2", type=float, nargs=3, required=True)
+    parser.add_argument("--grid-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    body = json.dumps({"point1": args.point1, "point2": args.point2}).encode()
+    # The same bounds and grid density as the request, so the prefetched points are the ones it reads
+    area = ",".join(str(v) for v in path_bounds([args.point1, args.point2])) + f",{args.grid_size}"
+    common = {"WORKER_COUNT": str(args.workers), "RESULT_CACHE_SIZE": "0"}
+    runs = (
+        ("cold", {"WARMUP_ON_STARTUP": "0"}),
+        ("warm-up", {"WARMUP_ON_STARTUP": "1"}),
+        ("prewarm", {"WARMUP_ON_STARTUP": "1", "PREWARM_AREAS": area}),
+    )
+    print(f"{'startup':>8} {'listen s':>9} {'ready s':>8} {'first s':>8} {'second s':>9}")
+    for name, env in runs:
+        result = run_server(args.port, {**common, **env}, body, args.grid_size, args.timeout)
+        print(f"{name:>8} {result['listening']:9.3f} {result['ready']:8.3f} {result['first']:8.3f} {result['second']:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
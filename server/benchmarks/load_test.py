@@ -0,0 +1,81 @@
+"""
+Load test for the worker pool: runs a fixed number of concurrent search jobs through
+utils.executor with different pool sizes and reports the throughput of each.
+
+Run from the server directory:
+    python -m benchmarks.load_test --workers 1 2 4 --jobs 32
+
+With --url the same number of concurrent /optimal-path requests is sent to a running server
+instead (start it with e.g. WORKER_COUNT=4 to compare pool sizes):
+    python -m benchmarks.load_test --url http://localhost:8000 --point1 X Y Z --point2 X Y Z
+"""
+import argparse
+import asyncio
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.bench_search import synthetic_elevations
+from utils.executor import JobExecutor
+from utils.search import grid_search
+
+
+def search_job(grid_size: int, seed: int) -> int:
+    elevations = synthetic_elevations(grid_size, seed)
+    path = grid_search(elevations, (0, 0), (grid_size - 1, grid_size - 1), mode="astar", max_step=10000.0)
+    return len(path)
+
+
+async def run_pool(kind: str, workers: int, jobs: int, grid_size: int) -> float:
+    executor = JobExecutor(kind=kind, workers=workers, max_queued=jobs)
+    # One warm-up job per worker so process start-up is not counted
+    await asyncio.gather(*(executor.run(search_job, 10, seed) for seed in range(workers)))
+    t0 = time.perf_counter()
+    await asyncio.gather(*(executor.run(search_job, grid_size, seed) for seed in range(jobs)))
+    elapsed = time.perf_counter() - t0
+    executor.shutdown(wait=True)
+    return elapsed
+
+
+def post_path(url: str, body: bytes) -> int:
+    request = urllib.request.Request(
+        f"{url}/optimal-path", data=body, headers={"Content-Type": "application/json"}, method="POST"
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pool", choices=["process", "thread"], default="process")
+    parser.add_argument("--jobs", type=int, default=32)
+    parser.add_argument("--grid-size", type=int, default=200)
+    parser.add_argument("--url")
+    parser.add_argument("--point1", type=float, nargs=3)
+    parser.add_argument("--point2", type=float, nargs=3)
+    args = parser.parse_args()
+
+    if args.url:
+        if not args.point1 or not args.point2:
+            parser.error("--url needs --point1 and --point2")
+        body = json.dumps({"point1": args.point1, "point2": args.point2}).encode()
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(args.jobs) as clients:
+            statuses = list(clients.map(lambda _: post_path(args.url, body), range(args.jobs)))
+        elapsed = time.perf_counter() - t0
+        print(f"{args.jobs} requests in {elapsed:.2f} s, {args.jobs / elapsed:.2f} req/s, "
+              f"{statuses.count(200)} succeeded")
+        return
+
+    print(f"{'pool':>8} {'workers':>8} {'jobs':>6} {'seconds':>8} {'jobs/s':>8} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        elapsed = asyncio.run(run_pool(args.pool, workers, args.jobs, args.grid_size))
+        throughput = args.jobs / elapsed
+        baseline = baseline or throughput
+        print(f"{args.pool:>8} {workers:>8} {args.jobs:>6} {elapsed:8.2f} {throughput:8.2f} {throughput / baseline:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Reproducible benchmark suite on synthetic terrain (benchmarks.synthetic): times every search algorithm
+across grid sizes and constraint mixes, the path statistics, and - when PDAL is installed - each
+pipeline stage (EPT read, gridding, search, stats, terrain profile) on a generated EPT dataset.
+Also checks that the depth-limited EPT read stays within the terrain relief over one cell of the
+full-density grid, as get_elevation_grid documents.
+
+Results can be saved as a JSON baseline and later runs compared against it; timings that grew by
+more than --threshold are flagged and make the run exit with status 1.
+
+Run from the server directory:
+    python -m benchmarks.suite --sizes 100 200 --save benchmarks/baseline.json
+    python -m benchmarks.suite --sizes 100 200 --baseline benchmarks/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import importlib.util
+import numpy as np
+from benchmarks.synthetic import CELL_SIZE, synthetic_terrain, write_synthetic_ept
+from utils.anytime import anytime_search
+from utils.bidirectional import bidirectional_search
+from utils.functions import path_statistics
+from utils.graph_search import csgraph_dijkstra
+from utils.hierarchical import hierarchical_search
+from utils.lattice import lattice_search
+from utils.search import grid_search, theta_search
+from utils.traversability import clear_edge_table_cache
+
+ALGORITHMS = ("astar", "dijkstra", "greedy", "theta_star", "csgraph", "hierarchical", "anytime", "lattice", "bidirectional")
+MIXES = {
+    "open": {},
+    "slope": {"max_slope": 0.3},
+    "turns": {"max_angle": 60.0},
+    "mixed": {"max_slope": 0.3, "max_angle": 90.0, "forbidden": True},
+}
+REGRESSION_THRESHOLD = 0.25  # relative slowdown that counts as a regression
+MIN_REGRESSION_SECONDS = 0.005  # smaller absolute differences are treated as noise
+PROFILE_POINTS = 1000
+
+
+def run_search(algorithm, elevations, start, goal, forbidden_mask=None, stats=None, **constraints):
+    if algorithm == "theta_star":
+        return theta_search(elevations, start, goal, forbidden_mask=forbidden_mask, stats=stats, **constraints)
+    if algorithm == "hierarchical":
+        return hierarchical_search(elevations, start, goal, forbidden_mask=forbidden_mask, stats=stats, **constraints)
+    if algorithm == "anytime":
+        # No improvement rounds: times the first (inflated) solution, the latency the budget is built on
+        return anytime_search(elevations, start, goal, forbidden_mask=forbidden_mask, stats=stats, time_budget=0.0, **constraints)
+    if algorithm == "bidirectional":
+        return bidirectional_search(elevations, start, goal, forbidden_mask=forbidden_mask, stats=stats, **constraints)
+    if algorithm == "lattice":
+        return lattice_search(elevations, start, goal, forbidden_mask=forbidden_mask, stats=stats, **constraints)
+    if algorithm == "csgraph":
+        return csgraph_dijkstra(elevations, start, goal, forbidden_mask=forbidden_mask, stats=stats, **constraints)
+    return grid_search(elevations, start, goal, mode=algorithm, forbidden_mask=forbidden_mask, stats=stats, **constraints)
+
+
+def best_of(repeat, fn, before=None):
+    """
+    Runs fn repeat times (calling before() ahead of each run) and returns (fastest seconds, last result).
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def best_stages(repeat, fn, before=None):
+    """
+    Like best_of for an fn returning (stage timings, result): the fastest time of every stage.
+    """
+    best = {}
+    result = None
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        timings, result = fn()
+        for name, seconds in timings.items():
+            best[name] = min(best.get(name, float("inf")), seconds)
+    return best, result
+
+
+def path_points(path, elevations):
+    if not path:
+        return np.empty((0, 3))
+    rows, cols = np.asarray(path).T
+    return np.column_stack([cols * CELL_SIZE, rows * CELL_SIZE, elevations[rows, cols]])
+
+
+def search_benchmarks(sizes, algorithms, mixes, repeat, results):
+    for size in sizes:
+        elevations, forbidden = synthetic_terrain(size)
+        start, goal = (0, 0), (size - 1, size - 1)
+        for mix in mixes:
+            constraints = {key: value for key, value in MIXES[mix].items() if key != "forbidden"}
+            mask = forbidden if MIXES[mix].get("forbidden") else None
+            for algorithm in algorithms:
+                if algorithm == "csgraph" and "max_angle" in constraints:
+                    continue  # no turning limit in csgraph; the API falls back to dijkstra
+                stats = {}
+
+                def search():
+                    stats.clear()
+                    return run_search(algorithm, elevations, start, goal, mask, stats, **constraints)
+
+                seconds, path = best_of(repeat, search, clear_edge_table_cache)
+                results[f"search/{algorithm}/{mix}/{size}"] = {
+                    "seconds": seconds,
+                    "expanded": stats.get("expanded", 0),
+                    "path_cells": len(path),
+                }
+                print(f"  search {algorithm:>12} {mix:>6} {size:>5}  {seconds:8.4f} s  "
+                      f"{stats.get('expanded', 0):>8} expanded  {len(path):>5} cells")
+                if algorithm == "astar" and mix == "open" and path:
+                    points = path_points(path, elevations)
+                    seconds, _ = best_of(repeat, lambda: path_statistics(points))
+                    results[f"stats/path_statistics/{size}"] = {"seconds": seconds, "vertices": len(points)}
+
+
+def pipeline_benchmarks(sizes, repeat, density, ept_dir, results):
+    from utils.optimal_path import get_elevation_grid
+    from utils.point_cache import point_cache
+    from utils.routing import route_on_grid
+    from utils.terrain_profile import sample_terrain_profile
+
+    dem_size = max(sizes)
+    started = time.perf_counter()
+    ept_path, _, bounds = write_synthetic_ept(ept_dir, size=dem_size, density=density)
+    print(f"  wrote {ept_path} ({time.perf_counter() - started:.1f} s)")
+    min_x, max_x, min_y, max_y = bounds
+    point1 = [min_x + 1.0, min_y + 1.0, 0.0]
+    point2 = [max_x - 1.0, max_y - 1.0, 0.0]
+
+    for size in sizes:
+        def grid():
+            timings = {}
+            return timings, get_elevation_grid(
+                bounds, grid_size=size, use_dtm=False, timings=timings, ept_path=ept_path
+            )
+
+        def route():
+            response = route_on_grid(xx[0], yy[:, 0], elevations, point1, point2, "astar", max_slope=0.3)
+            return response["debug"]["stages"], response
+
+        cold, _ = best_stages(repeat, grid, point_cache.clear)
+        warm, (xx, yy, elevations) = best_stages(repeat, grid)
+        routed, _ = best_stages(repeat, route, clear_edge_table_cache)
+        for name, seconds in (
+            ("read", cold["read"]), ("grid", cold["grid"]), ("read_cached", warm["read"]),
+            ("search", routed["search"]), ("stats", routed["stats"]),
+        ):
+            results[f"pipeline/{name}/{size}"] = {"seconds": seconds}
+
+        seconds, _ = best_of(
+            repeat,
+            lambda: sample_terrain_profile(point1, point2, PROFILE_POINTS, use_dtm=False, ept_path=ept_path),
+            point_cache.clear,
+        )
+        results[f"pipeline/profile/{size}"] = {"seconds": seconds, "points": PROFILE_POINTS}
+
+        # get_elevation_grid promises the depth-limited grid is within the relief over one cell of the full one
+        _, _, full = get_elevation_grid(bounds, grid_size=size, use_dtm=False, full_density=True, ept_path=ept_path)
+        padded = np.pad(full, 1, mode="edge")
+        relief = np.zeros_like(full)
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                shifted = padded[1 + dy:1 + dy + size, 1 + dx:1 + dx + size]
+                relief = np.maximum(relief, np.abs(shifted - full))
+        excess = np.abs(elevations - full) - relief
+        results[f"density_check/{size}"] = {
+            "max_dz": float(np.abs(elevations - full).max()),
+            "max_excess": float(excess.max()),
+            "ok": bool(excess.max() <= 0.1),  # 10 cm for the point noise
+        }
+        stages = ", ".join(f"{key.split('/')[1]}={value['seconds']:.4f}" for key, value in results.items()
+                           if key.startswith("pipeline/") and key.endswith(f"/{size}"))
+        print(f"  pipeline {size:>5}  {stages}  density check {'ok' if results[f'density_check/{size}']['ok'] else 'FAILED'}")
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints the timings next to the baseline and returns the keys that got slower than the threshold.
+    """
+    regressions = []
+    print(f"\n{'benchmark':<40} {'baseline s':>11} {'current s':>10} {'change':>8}")
+    for key, entry in results.items():
+        if "seconds" not in entry:
+            continue
+        old = baseline.get(key, {}).get("seconds")
+        if old is None:
+            print(f"{key:<40} {'-':>11} {entry['seconds']:10.4f} {'new':>8}")
+            continue
+        change = entry["seconds"] / old - 1.0 if old > 0 else 0.0
+        regressed = change > threshold and entry["seconds"] - old > MIN_REGRESSION_SECONDS
+        if regressed:
+            regressions.append(key)
+        print(f"{key:<40} {old:11.4f} {entry['seconds']:10.4f} {change:+7.0%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--algorithms", nargs="+", default=list(ALGORITHMS), choices=ALGORITHMS)
+    parser.add_argument("--mixes", nargs="+", default=list(MIXES), choices=list(MIXES))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the fastest is kept")
+    parser.add_argument("--no-pipeline", action="store_true", help="Skip the PDAL pipeline stages")
+    parser.add_argument("--density", type=float, default=2.0, help="Synthetic EPT points per square metre")
+    parser.add_argument("--ept-dir", help="Where to write the synthetic EPT (default: a temporary directory)")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a JSON file written with --save")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    results = {}
+    print("Searches")
+    search_benchmarks(args.sizes, args.algorithms, args.mixes, args.repeat, results)
+
+    if args.no_pipeline:
+        pass
+    elif importlib.util.find_spec("pdal") is None:
+        print("PDAL is not installed, skipping the pipeline stages")
+    else:
+        print("Pipeline")
+        ept_dir = args.ept_dir or tempfile.mkdtemp(prefix="synthetic-ept-")
+        try:
+            pipeline_benchmarks(args.sizes, args.repeat, args.density, ept_dir, results)
+        finally:
+            if args.ept_dir is None:
+                shutil.rmtree(ept_dir, ignore_errors=True)
+
+    failed_checks = [key for key, entry in results.items() if entry.get("ok") is False]
+    for key in failed_checks:
+        print(f"{key}: depth-limited grid differs by {results[key]['max_dz']:.3f} m, "
+              f"{results[key]['max_excess']:.3f} m more than the relief over one cell")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+
+    if args.save:
+        document = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "settings": {"sizes": args.sizes, "repeat": args.repeat, "density": args.density},
+            "results": results,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"Saved {len(results)} results to {args.save}")
+
+    if regressions or failed_checks:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
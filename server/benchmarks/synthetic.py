@@ -0,0 +1,188 @@
+"""
+Synthetic terrain for the benchmarks: fractal DEMs with cliffs, plateaus and forbidden zones, and a
+small binary EPT dataset sampled from them so the PDAL stages can run without the markovec cloud.
+
+Write a dataset from the server directory:
+    python -m benchmarks.synthetic --out cache/synthetic-ept --size 400 --density 2
+"""
+import os
+import json
+import argparse
+import numpy as np
+
+CELL_SIZE = 1.0  # metres between DEM nodes
+RELIEF_RATIO = 0.05  # metres between the lowest and highest point of a DEM per metre of its side
+CLIFF_HEIGHT = 5.0  # metres
+ORIGIN = (500000.0, 100000.0)  # keeps the synthetic data away from the real cloud's coordinates
+EPT_SPAN = 64  # EPT voxel grid resolution per node side
+GROUND = 2
+VEGETATION = 5
+
+
+def fractal_dem(size: int, seed: int = 0, beta: float = 3.6, relief: float = None) -> np.ndarray:
+    """
+    A size x size fractional Brownian surface from spectral synthesis (power spectrum ~ 1/f^beta),
+    scaled to the given relief in metres (default RELIEF_RATIO times the side length).
+    """
+    if relief is None:
+        relief = RELIEF_RATIO * size * CELL_SIZE
+    rng = np.random.default_rng(seed)
+    fy = np.fft.fftfreq(size)[:, None]
+    fx = np.fft.rfftfreq(size)[None, :]
+    frequency = np.hypot(fx, fy)
+    frequency[0, 0] = 1.0
+    spectrum = (rng.normal(size=frequency.shape) + 1j * rng.normal(size=frequency.shape)) / frequency ** (beta / 2)
+    spectrum[0, 0] = 0.0
+    surface = np.fft.irfft2(spectrum, s=(size, size))
+    surface -= surface.min()
+    return surface * (relief / max(surface.max(), 1e-12))
+
+
+def synthetic_terrain(size: int, seed: int = 0, forbidden_zones: int = 4):
+    """
+    Returns (elevations, forbidden_mask) for a fractal DEM with two flattened plateaus, a cliff line
+    with a single ramp through it and a few circular forbidden zones. The corners (0, 0) and (size-1, size-1),
+    used as start and goal by the benchmarks, are never inside a forbidden zone.
+    """
+    rng = np.random.default_rng(seed + 1)
+    elevations = fractal_dem(size, seed)
+    rows, cols = np.mgrid[0:size, 0:size]
+
+    for _ in range(2):
+        r, c = rng.uniform(0.2, 0.8, 2) * size
+        inside = np.hypot(rows - r, cols - c) < size * 0.08
+        if inside.any():
+            elevations[inside] = np.percentile(elevations[inside], 80)
+
+    # A cliff between start and goal: the far side of an anti-diagonal line is raised, except along
+    # a narrow strip where a ramp climbs the same height
+    across = rows + cols - size - rng.uniform(-0.2, 0.2) * size
+    gap = np.abs(rows - cols - rng.uniform(-0.5, 0.5) * size) < size * 0.05
+    ramp = np.clip(across / (0.4 * size), 0.0, 1.0)
+    elevations = elevations + CLIFF_HEIGHT * np.where(gap, ramp, across > 0)
+
+    forbidden = np.zeros((size, size), dtype=bool)
+    for _ in range(forbidden_zones):
+        r, c = rng.uniform(0.15, 0.85, 2) * size
+        forbidden |= np.hypot(rows - r, cols - c) < size * rng.uniform(0.03, 0.07)
+    forbidden[0, 0] = forbidden[-1, -1] = False
+    return elevations, forbidden
+
+
+def sample_points(elevations: np.ndarray, density: float, seed: int = 0, vegetation: float = 0.1):
+    """
+    Scatters density points per square metre over the DEM (bilinear ground height plus 5 cm noise)
+    and adds a share of vegetation points 1-15 m above ground. Returns X, Y, Z, Classification arrays.
+    """
+    from utils.rasterize import bilinear_sample
+
+    rng = np.random.default_rng(seed + 2)
+    extent = (elevations.shape[0] - 1) * CELL_SIZE
+    count = int(density * extent * extent)
+    x = rng.uniform(0.0, extent, count)
+    y = rng.uniform(0.0, extent, count)
+    z = bilinear_sample(elevations, x / CELL_SIZE, y / CELL_SIZE) + rng.normal(0.0, 0.05, count)
+    classification = np.full(count, GROUND, dtype=np.uint8)
+    above = rng.random(count) < vegetation
+    z[above] += rng.uniform(1.0, 15.0, above.sum())
+    classification[above] = VEGETATION
+    return x + ORIGIN[0], y + ORIGIN[1], z, classification
+
+
+def write_ept(out_dir: str, x, y, z, classification, span: int = EPT_SPAN, scale: float = 0.01) -> str:
+    """
+    Writes the points as an EPT dataset with "binary" data (scaled int32 X/Y/Z and a uint8
+    Classification per point) and a JSON hierarchy. Points are assigned to octree depths by thinning
+    on the depth's voxel grid, so readers.ept resolution limits behave as for a real dataset.
+    Returns the path of ept.json.
+    """
+    min_x, min_y, min_z = float(x.min()), float(y.min()), float(z.min())
+    width = max(float(x.max()) - min_x, float(y.max()) - min_y, float(z.max()) - min_z) + 1.0
+    cube = [min_x, min_y, min_z, min_x + width, min_y + width, min_z + width]
+    offset = [round(min_x + width / 2), round(min_y + width / 2), round(min_z + width / 2)]
+
+    points = np.column_stack([x, y, z])
+    origin = np.array(cube[:3])
+    remaining = np.arange(len(points))
+    depth = 0
+    nodes = {}
+    # Depth d keeps one point per voxel of width / (span * 2^d); the last depth takes everything left
+    while len(remaining):
+        voxel = width / (span * 2 ** depth)
+        cells = np.floor((points[remaining] - origin) / voxel).astype(np.int64)
+        if voxel <= 0.05 or depth >= 12:
+            keep = np.ones(len(remaining), dtype=bool)
+        else:
+            _, first = np.unique(cells, axis=0, return_index=True)
+            keep = np.zeros(len(remaining), dtype=bool)
+            keep[first] = True
+        taken = remaining[keep]
+        node_width = width / 2 ** depth
+        keys = np.floor((points[taken] - origin) / node_width).astype(np.int64)
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        order = np.argsort(inverse.ravel(), kind="stable")
+        groups = np.split(taken[order], np.cumsum(np.bincount(inverse.ravel()))[:-1])
+        for key, members in zip(unique_keys, groups):
+            nodes[f"{depth}-{key[0]}-{key[1]}-{key[2]}"] = members
+        remaining = remaining[~keep]
+        depth += 1
+
+    os.makedirs(os.path.join(out_dir, "ept-data"), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, "ept-hierarchy"), exist_ok=True)
+    record = np.dtype([("X", "<i4"), ("Y", "<i4"), ("Z", "<i4"), ("Classification", "u1")])
+    for key, members in nodes.items():
+        data = np.empty(len(members), dtype=record)
+        for axis, name in enumerate("XYZ"):
+            data[name] = np.round((points[members, axis] - offset[axis]) / scale)
+        data["Classification"] = classification[members]
+        data.tofile(os.path.join(out_dir, "ept-data", f"{key}.bin"))
+    with open(os.path.join(out_dir, "ept-hierarchy", "0-0-0-0.json"), "w") as f:
+        json.dump({key: int(len(members)) for key, members in nodes.items()}, f)
+
+    metadata = {
+        "bounds": cube,
+        "boundsConforming": [min_x, min_y, min_z, float(x.max()), float(y.max()), float(z.max())],
+        "dataType": "binary",
+        "hierarchyType": "json",
+        "points": int(len(points)),
+        "schema": [
+            {"name": "X", "type": "signed", "size": 4, "scale": scale, "offset": offset[0]},
+            {"name": "Y", "type": "signed", "size": 4, "scale": scale, "offset": offset[1]},
+            {"name": "Z", "type": "signed", "size": 4, "scale": scale, "offset": offset[2]},
+            {"name": "Classification", "type": "unsigned", "size": 1},
+        ],
+        "span": span,
+        "srs": {},
+        "version": "1.0.0",
+    }
+    ept_path = os.path.join(out_dir, "ept.json")
+    with open(ept_path, "w") as f:
+        json.dump(metadata, f, indent=2)
+    return ept_path
+
+
+def write_synthetic_ept(out_dir: str, size: int = 400, density: float = 2.0, seed: int = 0):
+    """
+    Samples synthetic_terrain(size, seed) into an EPT dataset under out_dir.
+    Returns (ept_path, elevations, (min_x, max_x, min_y, max_y) of the DEM).
+    """
+    elevations, _ = synthetic_terrain(size, seed)
+    ept_path = write_ept(out_dir, *sample_points(elevations, density, seed))
+    extent = (size - 1) * CELL_SIZE
+    return ept_path, elevations, (ORIGIN[0], ORIGIN[0] + extent, ORIGIN[1], ORIGIN[1] + extent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=os.path.join("cache", "synthetic-ept"))
+    parser.add_argument("--size", type=int, default=400, help="DEM side length in metres")
+    parser.add_argument("--density", type=float, default=2.0, help="Points per square metre")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ept_path, _, bounds = write_synthetic_ept(args.out, args.size, args.density, args.seed)
+    print(f"Wrote {ept_path} covering {bounds}")
+
+
+if __name__ == "__main__":
+    main()
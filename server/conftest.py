@@ -0,0 +1 @@
+# Lets the tests import the server modules (models, utils) the way api.py does.
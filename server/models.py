@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 class PointRequest(BaseModel):
     point1: List[float]
@@ -8,4 +8,27 @@ class PointRequest(BaseModel):
 class ProfileResponse(BaseModel):
     distances: List[float]
     elevations: List[float]
-    coordinates: List[List[float]]
\ No newline at end of file
+    coordinates: List[List[float]]
+
+class CostDistanceRequest(BaseModel):
+    origin: List[float]
+    goals: List[List[float]] = []
+    bounds: Optional[List[float]] = None
+
+class PathJob(BaseModel):
+    point1: List[float]
+    point2: List[float]
+    algorithm: str = "astar"
+    max_slope: float = 100.0
+    min_elev: Optional[float] = None
+    max_elev: Optional[float] = None
+    max_step: float = 10000.0
+    max_angle: float = 180.0
+    corridor_width: int = 3
+    coarse_size: int = 64
+    time_budget: float = 1.0
+    epsilon: float = 3.0
+    length_weighted_slope: bool = False
+
+class BatchPathRequest(BaseModel):
+    jobs: List[PathJob]
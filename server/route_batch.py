@@ -0,0 +1,293 @@
+"""
+Offline bulk routing: computes the optimal path for every endpoint pair of a CSV or GeoJSON file
+on a process pool and streams the results to GeoJSON lines (one Feature per line) or Parquet.
+
+CSV input has one pair per row: x1, y1, x2, y2 (z1, z2 and id optional) plus any /optimal-path/batch
+job field as a column (algorithm, max_slope, min_elev, max_elev, max_step, max_angle, corridor_width,
+coarse_size, time_budget, epsilon, length_weighted_slope); empty cells take the command-line defaults.
+GeoJSON input has one Feature per pair with a two-point LineString or MultiPoint geometry and the
+same fields (and id) as properties.
+
+Pairs whose midpoints fall in the same --group-size square are routed one after the other on the same
+worker, so they share that worker's point cache tiles (and DTM or terrain store pages).
+The output is also the checkpoint: running the same command again skips the pairs already written.
+Parquet output is a directory of part files, one per --flush-every results.
+
+Run from the server directory:
+    python route_batch.py pairs.csv --output routes.geojsonl --workers 8
+    python route_batch.py pairs.geojson --output routes.parquet --format parquet --max-slope 0.2
+"""
+import os
+import csv
+import json
+import math
+import time
+import argparse
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from models import PathJob
+from utils.routing import ALGORITHMS, optimal_path_job, search_options
+
+GROUP_SIZE = 250.0  # metres per grouping square
+MAX_GROUP_PAIRS = 32  # larger groups are split so the pool stays balanced
+FLUSH_EVERY = 500  # results per Parquet part file
+JOB_FIELDS = tuple(name for name in PathJob.model_fields if name not in ("point1", "point2"))
+RESULT_FIELDS = (
+    "path_length", "average_slope", "min_slope", "max_slope",
+    "local_average_slope", "local_min_slope", "local_max_slope",
+)
+
+
+def _number(value):
+    return None if value is None or value == "" else float(value)
+
+
+def read_pairs(path: str):
+    """
+    Reads the pairs of a CSV or GeoJSON file as (id, point1, point2, job fields) tuples.
+    Pairs without an id are numbered by their position in the file.
+    """
+    pairs = []
+    if path.lower().endswith((".geojson", ".json")):
+        with open(path, "r") as f:
+            collection = json.load(f)
+        for position, feature in enumerate(collection.get("features", [])):
+            coordinates = (feature.get("geometry") or {}).get("coordinates") or []
+            if len(coordinates) != 2:
+                raise ValueError(f"Feature {position} must have exactly two points")
+            properties = dict(feature.get("properties") or {})
+            pair_id = properties.pop("id", feature.get("id", position))
+            point1, point2 = ([float(c[0]), float(c[1]), float(c[2]) if len(c) > 2 else 0.0] for c in coordinates)
+            pairs.append((str(pair_id), point1, point2, properties))
+    else:
+        with open(path, "r", newline="") as f:
+            for position, row in enumerate(csv.DictReader(f)):
+                pair_id = row.pop("id", "") or position
+                point1 = [float(row.pop("x1")), float(row.pop("y1")), _number(row.pop("z1", None)) or 0.0]
+                point2 = [float(row.pop("x2")), float(row.pop("y2")), _number(row.pop("z2", None)) or 0.0]
+                pairs.append((str(pair_id), point1, point2, row))
+    ids = [pair[0] for pair in pairs]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Pair ids must be unique")
+    return pairs
+
+
+def build_job(point1, point2, fields, defaults) -> PathJob:
+    """
+    A validated PathJob from the pair's own fields, falling back to the command-line defaults.
+    """
+    values = dict(defaults)
+    values.update({key: value for key, value in fields.items() if key in JOB_FIELDS and value not in ("", None)})
+    job = PathJob(point1=point1, point2=point2, **values)
+    if job.algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm '{job.algorithm}'")
+    return job
+
+
+def group_pairs(jobs, group_size=GROUP_SIZE, max_pairs=MAX_GROUP_PAIRS):
+    """
+    Splits (id, job) items into lists of nearby pairs, keyed by the grouping square of the pair's
+    midpoint and ordered row by row so consecutive groups are neighbours as well.
+    """
+    squares = defaultdict(list)
+    for pair_id, job in jobs:
+        cx = (job.point1[0] + job.point2[0]) / 2
+        cy = (job.point1[1] + job.point2[1]) / 2
+        squares[(math.floor(cy / group_size), math.floor(cx / group_size))].append((pair_id, job))
+    groups = []
+    for key in sorted(squares):
+        members = squares[key]
+        for start in range(0, len(members), max_pairs):
+            groups.append(members[start:start + max_pairs])
+    return groups
+
+
+def route_group(group, settings):
+    """
+    Routes a group of pairs in one worker process. Returns one record per pair; failures are
+    recorded with their error instead of stopping the run.
+    """
+    records = []
+    for pair_id, job in group:
+        started = time.perf_counter()
+        record = {"id": pair_id, "algorithm": job.algorithm, "point1": job.point1, "point2": job.point2}
+        try:
+            result = optimal_path_job(
+                job.point1, job.point2, job.algorithm,
+                max_slope=job.max_slope,
+                min_elev=job.min_elev,
+                max_elev=job.max_elev,
+                max_step=job.max_step,
+                max_angle=job.max_angle,
+                options=search_options(job.algorithm, job.corridor_width, job.coarse_size, job.time_budget, job.epsilon),
+                length_weighted_slope=job.length_weighted_slope,
+                **settings,
+            )
+        except Exception as e:
+            record.update(status="error", error=str(e), path=[])
+        else:
+            record.update(
+                status="ok" if len(result["path"]) else "unreachable",
+                path=result["path"].tolist(),
+                path_length=float(result["length"]),
+                **{name: float(result[name]) for name in RESULT_FIELDS[1:]},
+            )
+        record["seconds"] = time.perf_counter() - started
+        records.append(record)
+    return records
+
+
+class GeoJSONLinesWriter:
+    """
+    Appends one GeoJSON Feature per line. On open, the pairs already written are read back
+    (a line cut short by an interrupted run is dropped) so the run can resume after them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            keep = data.rfind(b"\n") + 1
+            for line in data[:keep].splitlines():
+                if line.strip():
+                    self.done.add(json.loads(line)["properties"]["id"])
+            if keep < len(data):
+                with open(path, "r+b") as f:
+                    f.truncate(keep)
+        self._file = open(path, "a")
+
+    def write(self, records):
+        for record in records:
+            properties = {key: value for key, value in record.items() if key not in ("path", "point1", "point2")}
+            feature = {
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": record["path"]} if record["path"] else None,
+                "properties": properties,
+            }
+            self._file.write(json.dumps(feature) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """
+    Writes results as numbered part files of a Parquet dataset directory, each written to a
+    temporary name and renamed when complete; the ids in existing parts are skipped on resume.
+    Needs pyarrow.
+    """
+
+    def __init__(self, path: str, flush_every: int = FLUSH_EVERY):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        self.pq = pq
+        self.path = path
+        self.flush_every = flush_every
+        self.pending = []
+        os.makedirs(path, exist_ok=True)
+        parts = sorted(name for name in os.listdir(path) if name.startswith("part-") and name.endswith(".parquet"))
+        self.done = set()
+        for name in parts:
+            self.done.update(pq.read_table(os.path.join(path, name), columns=["id"]).column("id").to_pylist())
+        self.part = len(parts)
+
+    def write(self, records):
+        self.pending.extend(records)
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        import pyarrow as pa
+
+        columns = ("id", "status", "algorithm", "error", "seconds") + RESULT_FIELDS
+        table = pa.table({
+            **{name: [record.get(name) for record in self.pending] for name in columns},
+            "path": pa.array([record["path"] for record in self.pending], type=pa.list_(pa.list_(pa.float64()))),
+        })
+        name = f"part-{self.part:05d}.parquet"
+        self.pq.write_table(table, os.path.join(self.path, name + ".tmp"))
+        os.replace(os.path.join(self.path, name + ".tmp"), os.path.join(self.path, name))
+        self.part += 1
+        self.pending = []
+
+    def close(self):
+        self.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV or GeoJSON file of endpoint pairs")
+    parser.add_argument("--output", required=True, help="GeoJSON lines file, or directory for Parquet")
+    parser.add_argument("--format", choices=["geojsonl", "parquet"], help="Default: from the output name")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--group-size", type=float, default=GROUP_SIZE, help="Grouping square side in metres")
+    parser.add_argument("--flush-every", type=int, default=FLUSH_EVERY, help="Results per Parquet part")
+    parser.add_argument("--grid-size", type=int, default=100)
+    parser.add_argument("--buffer", type=int, default=10)
+    parser.add_argument("--interpolation", default="nearest", choices=["nearest", "idw", "griddata"])
+    parser.add_argument("--reducer", default="mean", choices=["min", "mean", "max"])
+    parser.add_argument("--algorithm", default="astar", choices=list(ALGORITHMS))
+    parser.add_argument("--max-slope", type=float, default=100.0)
+    parser.add_argument("--min-elev", type=float)
+    parser.add_argument("--max-elev", type=float)
+    parser.add_argument("--max-step", type=float, default=10000.0)
+    parser.add_argument("--max-angle", type=float, default=180.0)
+    args = parser.parse_args()
+
+    defaults = {
+        "algorithm": args.algorithm, "max_slope": args.max_slope, "min_elev": args.min_elev,
+        "max_elev": args.max_elev, "max_step": args.max_step, "max_angle": args.max_angle,
+    }
+    settings = {
+        "grid_size": args.grid_size, "buffer": args.buffer,
+        "interpolation": args.interpolation, "reducer": args.reducer,
+    }
+    output_format = args.format or ("parquet" if args.output.endswith(".parquet") else "geojsonl")
+    writer = ParquetWriter(args.output, args.flush_every) if output_format == "parquet" else GeoJSONLinesWriter(args.output)
+
+    pairs = read_pairs(args.input)
+    jobs = [
+        (pair_id, build_job(point1, point2, fields, defaults))
+        for pair_id, point1, point2, fields in pairs if pair_id not in writer.done
+    ]
+    groups = group_pairs(jobs, args.group_size)
+    print(f"{len(pairs)} pairs, {len(pairs) - len(jobs)} already done, {len(jobs)} to route in {len(groups)} groups")
+
+    started = time.perf_counter()
+    completed = failed = 0
+    try:
+        with ProcessPoolExecutor(args.workers) as pool:
+            # A bounded number of groups in flight keeps memory flat for very large inputs
+            queue = iter(groups)
+            running = set()
+            while True:
+                while len(running) < 2 * args.workers:
+                    group = next(queue, None)
+                    if group is None:
+                        break
+                    running.add(pool.submit(route_group, group, settings))
+                if not running:
+                    break
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    records = future.result()
+                    writer.write(records)
+                    completed += len(records)
+                    failed += sum(record["status"] == "error" for record in records)
+                elapsed = time.perf_counter() - started
+                print(f"{completed}/{len(jobs)} routed ({failed} failed), {completed / max(elapsed, 1e-9):.1f} pairs/s")
+    finally:
+        writer.close()
+    print(f"Done in {time.perf_counter() - started:.1f} s, results in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
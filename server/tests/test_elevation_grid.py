@@ -0,0 +1,76 @@
+"""
+get_elevation_grid reads only the EPT depths whose spacing is at most half a grid cell; its docstring
+promises the result stays within the terrain relief over one cell of the full-density grid.
+"""
+import json
+import numpy as np
+import pytest
+import utils.point_cache as point_cache_module
+from utils.optimal_path import get_elevation_grid
+from utils.point_cache import PointCache, POINT_FIELDS
+
+EPT_SIZE = 256.0  # metres per side of the synthetic dataset cube
+EPT_SPAN = 128  # root node spacing of 2 m
+MAX_DEPTH = 6
+FULL_SPACING = 0.25  # metres between the points of the full-density read
+
+
+def surface(x, y):
+    return 40.0 + 8.0 * np.sin(x / 17.0) * np.cos(y / 23.0) + 0.05 * x + 0.5 * np.sin(x / 3.0 + y / 5.0)
+
+
+def fake_read_ept_points(bounds, ept_path, classification=None, resolution=None):
+    # A ground point every `resolution` metres (jittered), like an EPT read limited to that depth
+    spacing = FULL_SPACING if resolution is None else resolution
+    min_x, max_x, min_y, max_y = bounds
+    xs, ys = np.meshgrid(np.arange(min_x, max_x, spacing), np.arange(min_y, max_y, spacing))
+    rng = np.random.default_rng(int(1 / spacing))
+    x = (xs + rng.uniform(0, spacing, xs.shape)).ravel()
+    y = (ys + rng.uniform(0, spacing, ys.shape)).ravel()
+    cloud = np.empty(x.size, dtype=[(name, np.float64) for name in POINT_FIELDS[:3]] + [("Classification", np.uint8)])
+    cloud["X"], cloud["Y"], cloud["Z"] = x, y, surface(x, y)
+    cloud["Classification"] = 2
+    return cloud
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    metadata = {"bounds": [0.0, 0.0, 0.0, EPT_SIZE, EPT_SIZE, EPT_SIZE], "span": EPT_SPAN}
+    (tmp_path / "ept.json").write_text(json.dumps(metadata))
+    (tmp_path / "ept-hierarchy").mkdir()
+    hierarchy = {f"{depth}-0-0-0": 1 for depth in range(MAX_DEPTH + 1)}
+    (tmp_path / "ept-hierarchy" / "0-0-0-0.json").write_text(json.dumps(hierarchy))
+    reads = []
+
+    def read(bounds, ept_path, classification=None, resolution=None):
+        reads.append(resolution)
+        return fake_read_ept_points(bounds, ept_path, classification, resolution)
+
+    monkeypatch.setattr(point_cache_module, "read_ept_points", read)
+    monkeypatch.setattr(point_cache_module, "point_cache", PointCache())
+    return str(tmp_path / "ept.json"), reads
+
+
+def one_cell_relief(xx, yy, cell_size):
+    # Range of the terrain within one cell of each grid node
+    low = high = surface(xx, yy)
+    for dy in np.linspace(-cell_size, cell_size, 9):
+        for dx in np.linspace(-cell_size, cell_size, 9):
+            z = surface(xx + dx, yy + dy)
+            low, high = np.minimum(low, z), np.maximum(high, z)
+    return high - low
+
+
+@pytest.mark.parametrize("grid_size", [26, 51, 101])
+@pytest.mark.parametrize("reducer", ["min", "mean", "max"])
+def test_reduced_depth_within_one_cell_relief(dataset, grid_size, reducer):
+    path, reads = dataset
+    bounds = (10.0, 110.0, 20.0, 120.0)
+    xx, yy, reduced = get_elevation_grid(bounds, grid_size=grid_size, use_dtm=False, reducer=reducer, ept_path=path)
+    _, _, full = get_elevation_grid(
+        bounds, grid_size=grid_size, use_dtm=False, full_density=True, reducer=reducer, ept_path=path
+    )
+    assert reads[0] is not None and reads[0] > FULL_SPACING  # the default read was actually depth-limited
+    assert reads[-1] is None
+    cell_size = (bounds[1] - bounds[0]) / (grid_size - 1)
+    assert np.all(np.abs(reduced - full) <= one_cell_relief(xx, yy, cell_size))
@@ -0,0 +1,45 @@
+"""
+collect_garbage deletes old terrain store generations only once no live process holds a lease on
+them, and checking a lease must never disturb the process holding it.
+"""
+import json
+import os
+import subprocess
+import sys
+from utils.terrain_store import CURRENT_NAME, LEASES_DIR, collect_garbage
+
+
+def make_generation(store_dir, name, lease_pids=()):
+    leases = store_dir / name / LEASES_DIR
+    leases.mkdir(parents=True)
+    for pid in lease_pids:
+        (leases / str(pid)).write_text("")
+
+
+def test_collect_garbage_keeps_generation_leased_by_live_process(tmp_path):
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    try:
+        make_generation(tmp_path, "old", [child.pid])
+        make_generation(tmp_path, "new")
+        (tmp_path / CURRENT_NAME).write_text(json.dumps({"generation": "new", "fingerprint": "f"}))
+
+        assert collect_garbage(str(tmp_path)) == 0
+        assert child.poll() is None  # the lease holder is still running
+        assert (tmp_path / "old" / LEASES_DIR / str(child.pid)).exists()
+    finally:
+        child.kill()
+        child.wait()
+
+    assert collect_garbage(str(tmp_path)) == 1
+    assert sorted(os.listdir(tmp_path)) == [CURRENT_NAME, "new"]
+
+
+def test_collect_garbage_drops_leases_of_exited_processes(tmp_path):
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+    make_generation(tmp_path, "old", [child.pid])
+    make_generation(tmp_path, "new")
+    (tmp_path / CURRENT_NAME).write_text(json.dumps({"generation": "new", "fingerprint": "f"}))
+
+    assert collect_garbage(str(tmp_path)) == 1
+    assert not (tmp_path / "old").exists()
@@ -0,0 +1,146 @@
+import heapq
+import math
+import time
+from utils.executor import check_cancelled
+from utils.search import CANCEL_CHECK_INTERVAL, _blocked_turns, _record
+from utils.traversability import INF, edge_tables
+
+TIME_BUDGET = 1.0  # seconds spent improving the path after the first solution
+INITIAL_EPSILON = 3.0  # heuristic inflation of the first, fastest search
+EPSILON_STEP = 0.5  # inflation decrease between improvement rounds
+CLOCK_CHECK_INTERVAL = 256  # expansions between checks of the time budget
+
+
+def anytime_search(
+    elevations,
+    start_idx,
+    goal_idx,
+    max_slope=None,
+    forbidden_mask=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    max_angle=None,
+    stats=None,
+    time_budget=TIME_BUDGET,
+    initial_epsilon=INITIAL_EPSILON,
+    epsilon_step=EPSILON_STEP,
+):
+    """
+    Anytime Repairing A* (ARA*): a weighted A* with heuristic inflation initial_epsilon finds a first
+    path quickly, then rounds with a decreasing inflation reuse the previous search effort to improve
+    it until epsilon reaches 1 (the A* optimum) or time_budget seconds have passed.
+    Costs are those of astar (step length + |dz|). The first path is always completed, so an
+    unreachable goal or a slow first round can exceed the budget.
+    Returns the best path found as a list of (i, j) indices, or [] if the goal is unreachable.
+    stats gets "suboptimality", a bound on cost / optimal cost of the returned path, and
+    "iterations" with the epsilon, cost, bound and elapsed seconds of every completed round.
+    """
+    started = time.monotonic()
+    deadline = started + time_budget
+    grid = edge_tables(elevations, max_slope, forbidden_mask, min_elev, max_elev, max_step)
+    climbs = grid.flat_climbs()
+    steps = grid.step_lengths
+    offsets = grid.offsets
+    width = grid.width
+    blocked = _blocked_turns(max_angle)
+    sqrt = math.sqrt
+
+    start = grid.index(start_idx)
+    goal = grid.index(goal_idx)
+    goal_row, goal_col = divmod(goal, width)
+
+    size = grid.size
+    g = [INF] * size
+    parent = [-1] * size
+    parent_dir = [-1] * size
+    closed = bytearray(size)
+    open_set = {start}
+    inconsistent = set()  # improved after being expanded in this round; reopened in the next one
+    expanded = pushes = 0
+    max_open = 1
+
+    def h(index):
+        row, col = divmod(index, width)
+        return sqrt((row - goal_row) ** 2 + (col - goal_col) ** 2)
+
+    def improve(epsilon, best_found):
+        # One weighted A* round; returns False when the time budget ran out before it finished
+        nonlocal expanded, pushes, max_open
+        heap = [(g[node] + epsilon * h(node), node) for node in open_set]
+        heapq.heapify(heap)
+        while heap:
+            priority, current = heap[0]
+            if current not in open_set or priority > g[current] + epsilon * h(current):
+                heapq.heappop(heap)  # stale entry
+                continue
+            if g[goal] <= priority:
+                return True
+            heapq.heappop(heap)
+            open_set.discard(current)
+            closed[current] = 1
+            expanded += 1
+            if expanded % CANCEL_CHECK_INTERVAL == 0:
+                check_cancelled()
+            if best_found and expanded % CLOCK_CHECK_INTERVAL == 0 and time.monotonic() > deadline:
+                return False
+
+            g_current = g[current]
+            base = current * 8
+            turns = blocked[parent_dir[current]] if blocked is not None and parent_dir[current] != -1 else None
+            for k in range(8):
+                climb = climbs[base + k]
+                if climb == INF:
+                    continue
+                if turns is not None and turns[k]:
+                    continue
+                neighbor = current + offsets[k]
+                tentative = g_current + steps[k] + climb
+                if tentative < g[neighbor]:
+                    g[neighbor] = tentative
+                    parent[neighbor] = current
+                    parent_dir[neighbor] = k
+                    if closed[neighbor]:
+                        inconsistent.add(neighbor)
+                    else:
+                        open_set.add(neighbor)
+                        heapq.heappush(heap, (tentative + epsilon * h(neighbor), neighbor))
+                        pushes += 1
+            if len(heap) > max_open:
+                max_open = len(heap)
+        return True
+
+    g[start] = 0.0
+    epsilon = max(1.0, initial_epsilon)
+    best_path = []
+    bound = None
+    iterations = []
+    while True:
+        if not improve(epsilon, bool(best_path)):
+            break
+        if g[goal] == INF:
+            break  # the goal is unreachable; later rounds cannot change that
+        # Only paths of completed rounds are published: their parent chain costs exactly g[goal]
+        best_path = grid.trace(parent, goal)
+        frontier = open_set | inconsistent
+        lower = min((g[node] + h(node) for node in frontier), default=g[goal])
+        bound = min(epsilon, g[goal] / lower) if lower > 0 else 1.0
+        iterations.append({
+            "epsilon": epsilon,
+            "cost": g[goal],
+            "bound": bound,
+            "seconds": time.monotonic() - started,
+            "expanded": expanded,
+        })
+        if bound <= 1.0 or epsilon <= 1.0 or time.monotonic() > deadline:
+            break
+        epsilon = max(1.0, epsilon - epsilon_step)
+        open_set |= inconsistent
+        inconsistent.clear()
+        closed = bytearray(size)
+
+    _record(stats, expanded, pushes, max_open)
+    if stats is not None:
+        stats["suboptimality"] = bound
+        stats["iterations"] = iterations
+    return best_path
@@ -0,0 +1,141 @@
+import heapq
+import math
+from utils.executor import check_cancelled
+from utils.search import CANCEL_CHECK_INTERVAL, _record, grid_search
+from utils.traversability import INF, edge_tables
+
+
+def bidirectional_search(
+    elevations,
+    start_idx,
+    goal_idx,
+    max_slope=None,
+    forbidden_mask=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    max_angle=None,
+    stats=None,
+):
+    """
+    Bidirectional A*: one search grows from the start along the edges, the other from the goal along
+    the same edges backwards, so every step is checked (slope, step, forbidden cells, elevation range)
+    in the direction of travel. Both use the average potential p(v) = (h_goal(v) - h_start(v)) / 2
+    (and -p backwards), which keeps the two searches consistent with each other. The side with the
+    smaller open set expands next, and the search stops once the two smallest keys add up to at least
+    the cheapest start-goal connection found, which is then optimal. Costs are those of astar.
+    A turning limit depends on the heading a cell is entered with, which the backward search does
+    not know, so with one astar is run instead.
+    Returns a list of (i, j) indices for the path, or [] if the goal is unreachable. stats gets
+    "expanded_per_side" with the nodes expanded by the forward and backward searches.
+    """
+    if max_angle is not None and max_angle < 180.0:
+        return grid_search(
+            elevations, start_idx, goal_idx, mode="astar",
+            max_slope=max_slope, forbidden_mask=forbidden_mask, min_elev=min_elev, max_elev=max_elev,
+            max_step=max_step, max_angle=max_angle, stats=stats,
+        )
+    grid = edge_tables(elevations, max_slope, forbidden_mask, min_elev, max_elev, max_step)
+    climbs = grid.flat_climbs()
+    steps = grid.step_lengths
+    offsets = grid.offsets
+    width = grid.width
+    sqrt = math.sqrt
+
+    start = grid.index(start_idx)
+    goal = grid.index(goal_idx)
+    start_row, start_col = divmod(start, width)
+    goal_row, goal_col = divmod(goal, width)
+
+    def potential(index):
+        row, col = divmod(index, width)
+        to_goal = sqrt((row - goal_row) ** 2 + (col - goal_col) ** 2)
+        to_start = sqrt((row - start_row) ** 2 + (col - start_col) ** 2)
+        return (to_goal - to_start) * 0.5
+
+    size = grid.size
+    g_forward = [INF] * size
+    g_backward = [INF] * size
+    parent = [-1] * size  # towards the start
+    successor = [-1] * size  # towards the goal
+    closed_forward = bytearray(size)
+    closed_backward = bytearray(size)
+    g_forward[start] = 0.0
+    g_backward[goal] = 0.0
+    heap_forward = [(potential(start), start)]
+    heap_backward = [(-potential(goal), goal)]
+    expanded_forward = expanded_backward = pushes = 0
+    max_open = 2
+
+    best = 0.0 if start == goal else INF  # cheapest start-goal connection found so far
+    meeting = start if start == goal else -1
+
+    while heap_forward and heap_backward:
+        while heap_forward and closed_forward[heap_forward[0][1]]:
+            heapq.heappop(heap_forward)  # stale entry
+        while heap_backward and closed_backward[heap_backward[0][1]]:
+            heapq.heappop(heap_backward)
+        if not heap_forward or not heap_backward:
+            break
+        if heap_forward[0][0] + heap_backward[0][0] >= best:
+            break
+        if (expanded_forward + expanded_backward + 1) % CANCEL_CHECK_INTERVAL == 0:
+            check_cancelled()
+
+        if len(heap_forward) <= len(heap_backward):
+            _, current = heapq.heappop(heap_forward)
+            closed_forward[current] = 1
+            expanded_forward += 1
+            g_current = g_forward[current]
+            base = current * 8
+            for k in range(8):
+                climb = climbs[base + k]
+                if climb == INF:
+                    continue
+                neighbor = current + offsets[k]
+                tentative = g_current + steps[k] + climb
+                if tentative < g_forward[neighbor]:
+                    g_forward[neighbor] = tentative
+                    parent[neighbor] = current
+                    heapq.heappush(heap_forward, (tentative + potential(neighbor), neighbor))
+                    pushes += 1
+                    if tentative + g_backward[neighbor] < best:
+                        best = tentative + g_backward[neighbor]
+                        meeting = neighbor
+        else:
+            _, current = heapq.heappop(heap_backward)
+            closed_backward[current] = 1
+            expanded_backward += 1
+            g_current = g_backward[current]
+            for k in range(8):
+                # The edge from the predecessor into current, in its direction of travel
+                neighbor = current - offsets[k]
+                if neighbor < 0:
+                    continue
+                climb = climbs[neighbor * 8 + k]
+                if climb == INF:
+                    continue
+                tentative = g_current + steps[k] + climb
+                if tentative < g_backward[neighbor]:
+                    g_backward[neighbor] = tentative
+                    successor[neighbor] = current
+                    heapq.heappush(heap_backward, (tentative - potential(neighbor), neighbor))
+                    pushes += 1
+                    if tentative + g_forward[neighbor] < best:
+                        best = tentative + g_forward[neighbor]
+                        meeting = neighbor
+        open_size = len(heap_forward) + len(heap_backward)
+        if open_size > max_open:
+            max_open = open_size
+
+    _record(stats, expanded_forward + expanded_backward, pushes, max_open)
+    if stats is not None:
+        stats["expanded_per_side"] = {"forward": expanded_forward, "backward": expanded_backward}
+    if meeting == -1:
+        return []
+    path = grid.trace(parent, meeting)
+    current = successor[meeting]
+    while current != -1:
+        path.append(grid.cell(current))
+        current = successor[current]
+    return path
@@ -0,0 +1,159 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from utils.optimal_path import get_elevation_grid
+from utils.search import dijkstra_field
+from utils.graph_search import csgraph_field
+from utils.executor import register_worker_stats
+from utils.routing import has_turn_limit, grid_cell, path_to_points, path_response
+
+COST_FIELD_CACHE_SIZE = 8
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def closest_cell(xx, yy, x, y):
+    ix = (abs(xx[0] - x)).argmin()
+    iy = (abs(yy[:, 0] - y)).argmin()
+    return int(iy), int(ix)
+
+
+def get_cost_field(
+    origin,
+    bounds,
+    grid_size=100,
+    max_slope=None,
+    forbidden_mask=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    max_angle=None,
+    interpolation="nearest",
+    reducer="mean",
+):
+    """
+    Returns the cost-distance field of the constrained grid from the cell closest to origin, as a dict
+    with xx, yy, elevations, origin_cell, costs and parents (flat row * cols + col index, -1 for none).
+    Fields are cached per origin cell, bounds, grid settings and constraints; the "cached" key tells
+    whether this call was served from the cache.
+    """
+    bounds = tuple(float(v) for v in bounds)
+    origin_cell = grid_cell(bounds, grid_size, origin[0], origin[1])
+    key = (
+        origin_cell, bounds, grid_size, interpolation, reducer,
+        max_slope, min_elev, max_elev, max_step, max_angle if has_turn_limit(max_angle) else None,
+        None if forbidden_mask is None else np.asarray(forbidden_mask, dtype=bool).tobytes(),
+    )
+    with _lock:
+        field = _cache.get(key)
+        if field is not None:
+            _cache.move_to_end(key)
+            _cache_stats["hits"] += 1
+            return {**field, "cached": True}
+        _cache_stats["misses"] += 1
+
+    xx, yy, elevations = get_elevation_grid(bounds, grid_size=grid_size, interpolation=interpolation, reducer=reducer)
+    constraints = dict(
+        max_slope=max_slope, forbidden_mask=forbidden_mask, min_elev=min_elev, max_elev=max_elev, max_step=max_step
+    )
+    stats = {}
+    if has_turn_limit(max_angle):
+        costs, parents = dijkstra_field(elevations, origin_cell, max_angle=max_angle, stats=stats, **constraints)
+    else:
+        costs, parents = csgraph_field(elevations, origin_cell, stats=stats, **constraints)
+    field = {
+        "xx": xx,
+        "yy": yy,
+        "elevations": elevations,
+        "origin_cell": origin_cell,
+        "costs": costs,
+        "parents": parents,
+        "expanded": stats.get("expanded", 0),
+    }
+    with _lock:
+        _cache[key] = field
+        while len(_cache) > COST_FIELD_CACHE_SIZE:
+            _cache.popitem(last=False)
+            _cache_stats["evictions"] += 1
+    return {**field, "cached": False}
+
+
+def cost_field_cache_stats() -> dict:
+    with _lock:
+        return {"entries": len(_cache), **_cache_stats}
+
+
+register_worker_stats("cost_fields", cost_field_cache_stats)
+
+
+def trace_field(field, goal_cell):
+    """
+    Follows the stored parents from goal_cell back to the origin.
+    Returns a list of (i, j) indices from origin to goal, or [] if the goal is unreachable.
+    """
+    costs = field["costs"]
+    if not np.isfinite(costs[goal_cell]):
+        return []
+    cols = costs.shape[1]
+    parents = field["parents"].ravel()
+    current = goal_cell[0] * cols + goal_cell[1]
+    path = []
+    while current != -1:
+        path.append(divmod(int(current), cols))
+        current = parents[current]
+    path.reverse()
+    return path
+
+
+def cost_distance_job(
+    origin,
+    goals,
+    bounds,
+    grid_size=100,
+    max_slope=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    max_angle=None,
+    interpolation="nearest",
+    reducer="mean",
+    include_surface=False,
+):
+    """
+    The /cost-distance pipeline: gets (or reuses) the field of origin and returns the response dict
+    with the path and statistics to every goal. Runs in the worker pool.
+    """
+    field = get_cost_field(
+        origin, bounds,
+        grid_size=grid_size,
+        max_slope=max_slope,
+        min_elev=min_elev,
+        max_elev=max_elev,
+        max_step=max_step,
+        max_angle=max_angle,
+        interpolation=interpolation,
+        reducer=reducer,
+    )
+    xx, yy, elevations, costs = field["xx"], field["yy"], field["elevations"], field["costs"]
+    paths = []
+    for goal in goals:
+        goal_cell = closest_cell(xx, yy, goal[0], goal[1])
+        path_points = path_to_points(trace_field(field, goal_cell), xx, yy, elevations)
+        cost = float(costs[goal_cell]) if len(path_points) else None
+        paths.append({"goal": goal, "cost": cost, **path_response(path_points)})
+
+    response = {
+        "bounds": list(bounds),
+        "origin_cell": list(field["origin_cell"]),
+        "cached": field["cached"],
+        "expanded": field["expanded"],
+        "paths": paths,
+    }
+    if include_surface:
+        # Unreachable cells are inf, which JSON cannot carry
+        surface = costs.astype(object)
+        surface[~np.isfinite(costs)] = None
+        response["surface"] = {"x": xx[0].tolist(), "y": yy[:, 0].tolist(), "cost": surface.tolist()}
+    return response
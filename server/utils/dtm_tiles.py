@@ -0,0 +1,296 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from typing import Optional, Tuple
+from utils.ept import EPT_PATH, load_ept_metadata, load_hierarchy, node_bounds
+from utils.point_cache import read_ept_points
+from utils.rasterize import rasterize_points, bilinear_sample
+from utils.terrain_store import terrain_store
+
+DTM_CACHE_DIR = os.environ.get("DTM_CACHE_DIR", os.path.join("cache", "dtm"))
+DTM_RESOLUTION = 1.0  # metres per raster cell
+DTM_TILE_CELLS = 256  # cells per tile side
+DTM_TILE_MARGIN = 4  # extra cells read around a tile so edges interpolate from real neighbours
+MANIFEST_NAME = "manifest.json"
+
+_lock = threading.Lock()
+_manifest_cache = {"path": None, "mtime": None, "manifest": None}
+_tile_cache = {}
+
+
+def _tile_key(tx: int, ty: int) -> str:
+    return f"{tx}_{ty}"
+
+
+def tile_bounds(tx: int, ty: int, resolution: float = DTM_RESOLUTION, tile_cells: int = DTM_TILE_CELLS):
+    """
+    Returns the (min_x, max_x, min_y, max_y) extent of tile (tx, ty).
+    Tiles are aligned to a global grid so their indices stay stable when the dataset grows.
+    """
+    span = resolution * tile_cells
+    return tx * span, (tx + 1) * span, ty * span, (ty + 1) * span
+
+
+def node_file_stats(ept_path: str = EPT_PATH) -> dict:
+    """
+    Returns {"D-X-Y-Z": [size, mtime_ns]} for the point data file of every EPT node, from one
+    listing of the ept-data directory.
+    """
+    stats = {}
+    data_dir = os.path.join(os.path.dirname(ept_path), "ept-data")
+    if os.path.isdir(data_dir):
+        with os.scandir(data_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    stats[entry.name.split(".")[0]] = [stat.st_size, stat.st_mtime_ns]
+    return stats
+
+
+def tile_fingerprint(
+    metadata: dict, hierarchy: dict, bounds: Tuple[float, float, float, float], node_files: dict
+) -> str:
+    """
+    Hashes everything in the EPT dataset that can change the content of a tile: the coordinate
+    encoding, and the point count and data file size and mtime (node_file_stats) of every hierarchy
+    node overlapping it, so points reclassified or edited in place also mark the tile stale.
+    """
+    min_x, max_x, min_y, max_y = bounds
+    encoding = [
+        (d["name"], d.get("scale"), d.get("offset"))
+        for d in metadata["schema"] if d["name"] in ("X", "Y", "Z", "Classification")
+    ]
+    nodes = []
+    for key, count in hierarchy.items():
+        n_min_x, n_max_x, n_min_y, n_max_y = node_bounds(metadata, key)
+        if n_min_x < max_x and n_max_x > min_x and n_min_y < max_y and n_max_y > min_y:
+            nodes.append((key, count, node_files.get(key)))
+    nodes.sort()
+    payload = json.dumps({"dataType": metadata.get("dataType"), "encoding": encoding, "nodes": nodes})
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _read_ground_points(ept_path: str, bounds: Tuple[float, float, float, float]) -> np.ndarray:
+    # Tile builds read large areas once, so they bypass the in-memory point cache
+    cloud = read_ept_points(bounds, ept_path, classification=2)
+    return np.column_stack([cloud['X'], cloud['Y'], cloud['Z']])
+
+
+def _build_tile(ept_path: str, tx: int, ty: int, resolution: float, tile_cells: int, out_path: str) -> bool:
+    """
+    Rasterizes the ground points of one tile into a float32 .npy file.
+    Returns False when the tile holds no ground points.
+    """
+    min_x, max_x, min_y, max_y = tile_bounds(tx, ty, resolution, tile_cells)
+    margin = DTM_TILE_MARGIN * resolution
+    ground_points = _read_ground_points(ept_path, (min_x - margin, max_x + margin, min_y - margin, max_y + margin))
+    if ground_points.shape[0] == 0:
+        return False
+
+    # Rasterize the tile plus its margin onto cell centres, then keep the tile itself
+    m = DTM_TILE_MARGIN
+    half = resolution / 2
+    window = rasterize_points(
+        ground_points[:, 0], ground_points[:, 1], ground_points[:, 2],
+        (min_x - margin + half, max_x + margin - half, min_y - margin + half, max_y + margin - half),
+        (tile_cells + 2 * m, tile_cells + 2 * m),
+        reducer="mean", fill="nearest",
+    )
+    tmp_path = out_path + ".tmp.npy"
+    raster = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(tile_cells, tile_cells))
+    raster[:] = window[m:m + tile_cells, m:m + tile_cells]
+    raster.flush()
+    del raster
+    os.replace(tmp_path, out_path)
+    return True
+
+
+def build_dtm_tiles(
+    ept_path: str = EPT_PATH,
+    cache_dir: str = DTM_CACHE_DIR,
+    resolution: float = DTM_RESOLUTION,
+    tile_cells: int = DTM_TILE_CELLS,
+    force: bool = False,
+) -> dict:
+    """
+    Builds (or updates) the tiled ground raster of an EPT dataset on disk.
+    Only tiles whose fingerprint changed since the last build are re-read from the point cloud.
+    Returns a summary with the number of built, unchanged and removed tiles.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    metadata = load_ept_metadata(ept_path)
+    hierarchy = load_hierarchy(ept_path)
+    node_files = node_file_stats(ept_path)
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+
+    previous = {}
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            old_manifest = json.load(f)
+        if old_manifest.get("resolution") == resolution and old_manifest.get("tile_cells") == tile_cells:
+            previous = old_manifest.get("tiles", {})
+
+    min_x, min_y, _, max_x, max_y, _ = metadata.get("boundsConforming", metadata["bounds"])
+    span = resolution * tile_cells
+    tx_range = range(int(np.floor(min_x / span)), int(np.floor(max_x / span)) + 1)
+    ty_range = range(int(np.floor(min_y / span)), int(np.floor(max_y / span)) + 1)
+
+    tiles = {}
+    summary = {"built": 0, "unchanged": 0, "removed": 0}
+    for ty in ty_range:
+        for tx in tx_range:
+            key = _tile_key(tx, ty)
+            t_min_x, t_max_x, t_min_y, t_max_y = tile_bounds(tx, ty, resolution, tile_cells)
+            margin = DTM_TILE_MARGIN * resolution
+            fingerprint = tile_fingerprint(
+                metadata, hierarchy, (t_min_x - margin, t_max_x + margin, t_min_y - margin, t_max_y + margin),
+                node_files,
+            )
+            file_name = f"tile_{key}.npy"
+            old = previous.get(key)
+            if old is not None and old["fingerprint"] == fingerprint and (
+                old["empty"] or os.path.exists(os.path.join(cache_dir, file_name))
+            ):
+                tiles[key] = old
+                summary["unchanged"] += 1
+                continue
+            has_data = _build_tile(ept_path, tx, ty, resolution, tile_cells, os.path.join(cache_dir, file_name))
+            tiles[key] = {"fingerprint": fingerprint, "file": file_name, "empty": not has_data}
+            summary["built"] += 1
+
+    for key, old in previous.items():
+        if key not in tiles:
+            stale = os.path.join(cache_dir, old["file"])
+            if os.path.exists(stale):
+                os.remove(stale)
+            summary["removed"] += 1
+
+    manifest = {
+        "ept_path": os.path.abspath(ept_path),
+        "resolution": resolution,
+        "tile_cells": tile_cells,
+        "tiles": tiles,
+    }
+    tmp_manifest = manifest_path + ".tmp"
+    with open(tmp_manifest, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_manifest, manifest_path)
+    return summary
+
+
+def start_background_build(ept_path: str = EPT_PATH, cache_dir: str = DTM_CACHE_DIR) -> threading.Thread:
+    """
+    Runs build_dtm_tiles in a daemon thread. Requests keep using the live point cloud until it finishes.
+    """
+    def _run():
+        try:
+            summary = build_dtm_tiles(ept_path, cache_dir)
+            print(f"DTM tiles ready in {cache_dir}: {summary}")
+        except Exception as e:
+            print(f"DTM tile build failed: {e}")
+
+    thread = threading.Thread(target=_run, name="dtm-build", daemon=True)
+    thread.start()
+    return thread
+
+
+def _load_manifest(cache_dir: str) -> Optional[dict]:
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    try:
+        mtime = os.path.getmtime(manifest_path)
+    except OSError:
+        return None
+    with _lock:
+        if _manifest_cache["path"] != manifest_path or _manifest_cache["mtime"] != mtime:
+            with open(manifest_path, "r") as f:
+                _manifest_cache.update(path=manifest_path, mtime=mtime, manifest=json.load(f))
+            _tile_cache.clear()
+        return _manifest_cache["manifest"]
+
+
+def _open_tile(cache_dir: str, manifest: dict, tx: int, ty: int) -> Optional[np.ndarray]:
+    entry = manifest["tiles"].get(_tile_key(tx, ty))
+    if entry is None or entry["empty"]:
+        return None
+    path = os.path.join(cache_dir, entry["file"])
+    with _lock:
+        tile = _tile_cache.get(path)
+        if tile is None:
+            tile = np.load(path, mmap_mode="r")
+            _tile_cache[path] = tile
+    return tile
+
+
+def _mosaic(cache_dir: str, manifest: dict, c0: int, c1: int, r0: int, r1: int) -> Optional[np.ndarray]:
+    """
+    Assembles the global raster window [r0, r1] x [c0, c1] (inclusive cell indices) from the tiles.
+    Returns None if any part of the window is not covered.
+    """
+    cells = manifest["tile_cells"]
+    window = np.empty((r1 - r0 + 1, c1 - c0 + 1), dtype=np.float32)
+    for ty in range(r0 // cells, r1 // cells + 1):
+        for tx in range(c0 // cells, c1 // cells + 1):
+            tile = _open_tile(cache_dir, manifest, tx, ty)
+            if tile is None:
+                return None
+            tr0, tr1 = max(r0, ty * cells), min(r1, (ty + 1) * cells - 1)
+            tc0, tc1 = max(c0, tx * cells), min(c1, (tx + 1) * cells - 1)
+            window[tr0 - r0:tr1 - r0 + 1, tc0 - c0:tc1 - c0 + 1] = tile[
+                tr0 - ty * cells:tr1 - ty * cells + 1, tc0 - tx * cells:tc1 - tx * cells + 1
+            ]
+    return window
+
+
+def sample_dtm(x: np.ndarray, y: np.ndarray, cache_dir: str = DTM_CACHE_DIR) -> Optional[np.ndarray]:
+    """
+    Bilinearly samples the tiled ground raster at the given coordinates, from the shared terrain
+    store (utils.terrain_store) when one is published. Returns None when no tiles are built or the
+    coordinates leave the covered area.
+    """
+    generation = terrain_store.current()
+    if generation is not None:
+        elevations = generation.sample(x, y)
+        if elevations is not None:
+            return elevations
+    manifest = _load_manifest(cache_dir)
+    if manifest is None:
+        return None
+    resolution = manifest["resolution"]
+    # Fractional global cell coordinates, relative to cell centres
+    fx = np.asarray(x, dtype=np.float64) / resolution - 0.5
+    fy = np.asarray(y, dtype=np.float64) / resolution - 0.5
+    c0, c1 = int(np.floor(fx.min())), int(np.floor(fx.max())) + 1
+    r0, r1 = int(np.floor(fy.min())), int(np.floor(fy.max())) + 1
+    window = _mosaic(cache_dir, manifest, c0, c1, r0, r1)
+    if window is None:
+        return None
+
+    return bilinear_sample(window, fx - c0, fy - r0)
+
+
+def get_dtm_grid(bounds: Tuple[float, float, float, float], grid_size: int = 100, cache_dir: str = DTM_CACHE_DIR):
+    """
+    Cuts a grid_size x grid_size elevation grid out of the tiled ground raster.
+    Returns (xx, yy, elevations) like get_elevation_grid, or None if the bounds are not covered.
+    """
+    min_x, max_x, min_y, max_y = bounds
+    xx, yy = np.meshgrid(np.linspace(min_x, max_x, grid_size), np.linspace(min_y, max_y, grid_size))
+    elevations = sample_dtm(xx, yy, cache_dir)
+    if elevations is None:
+        return None
+    return xx, yy, elevations
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the tiled ground raster used by get_elevation_grid.")
+    parser.add_argument("--ept", default=EPT_PATH)
+    parser.add_argument("--cache-dir", default=DTM_CACHE_DIR)
+    parser.add_argument("--resolution", type=float, default=DTM_RESOLUTION)
+    parser.add_argument("--tile-cells", type=int, default=DTM_TILE_CELLS)
+    parser.add_argument("--force", action="store_true", help="Rebuild every tile")
+    args = parser.parse_args()
+    print(build_dtm_tiles(args.ept, args.cache_dir, args.resolution, args.tile_cells, args.force))
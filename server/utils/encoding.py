@@ -0,0 +1,98 @@
+import io
+import json
+import struct
+import numpy as np
+from typing import Optional, Tuple
+
+JSON_MEDIA_TYPE = "application/json"
+PACKED_MEDIA_TYPE = "application/x-packed-array"
+NPY_MEDIA_TYPE = "application/x-npy"
+MEDIA_TYPES = (JSON_MEDIA_TYPE, PACKED_MEDIA_TYPE, NPY_MEDIA_TYPE)
+DTYPES = {"float32": "<f4", "float64": "<f8"}
+
+# Packed layout, all little-endian: magic, version, item size in bytes (4 or 8), reserved, rows, columns,
+# metadata length; then the UTF-8 JSON metadata, zero padding to a multiple of 8 bytes, and the
+# row-major array data (so it can be viewed directly as a Float32Array / Float64Array).
+PACKED_MAGIC = b"ARTA"
+PACKED_VERSION = 1
+PACKED_HEADER = struct.Struct("<4sBBHIII")
+
+
+def negotiate(accept: Optional[str]) -> Tuple[str, str]:
+    """
+    Picks the response media type and float dtype from an Accept header, e.g.
+    "application/x-packed-array; dtype=float32". Falls back to JSON for anything unsupported.
+    """
+    choices = []
+    for position, part in enumerate((accept or "").split(",")):
+        fields = [field.strip() for field in part.split(";")]
+        media_type = fields[0].lower()
+        params = dict(field.split("=", 1) for field in fields[1:] if "=" in field)
+        try:
+            quality = float(params.get("q", 1.0))
+        except ValueError:
+            quality = 0.0
+        if media_type in MEDIA_TYPES and quality > 0:
+            dtype = params.get("dtype", "float64")
+            choices.append((-quality, position, media_type, dtype if dtype in DTYPES else "float64"))
+    if not choices:
+        return JSON_MEDIA_TYPE, "float64"
+    _, _, media_type, dtype = min(choices)
+    return media_type, dtype
+
+
+def to_jsonable(value):
+    """
+    Converts NumPy arrays and scalars nested in dicts and lists to plain Python values.
+    """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    return value
+
+
+def encode_packed(array: np.ndarray, metadata: dict, dtype: str = "float64") -> bytes:
+    array = np.ascontiguousarray(np.atleast_2d(array), dtype=DTYPES[dtype])
+    meta = json.dumps(to_jsonable(metadata), separators=(",", ":")).encode()
+    header = PACKED_HEADER.pack(
+        PACKED_MAGIC, PACKED_VERSION, array.itemsize, 0, array.shape[0], array.shape[1], len(meta)
+    )
+    padding = b"\0" * (-(len(header) + len(meta)) % 8)
+    return header + meta + padding + array.tobytes()
+
+
+def decode_packed(body: bytes) -> Tuple[np.ndarray, dict]:
+    magic, version, itemsize, _, rows, cols, meta_length = PACKED_HEADER.unpack_from(body)
+    if magic != PACKED_MAGIC or version != PACKED_VERSION:
+        raise ValueError("Not a packed array body")
+    offset = PACKED_HEADER.size
+    metadata = json.loads(body[offset:offset + meta_length])
+    offset += meta_length
+    offset += -offset % 8
+    dtype = "<f4" if itemsize == 4 else "<f8"
+    array = np.frombuffer(body, dtype=dtype, count=rows * cols, offset=offset).reshape(rows, cols)
+    return array, metadata
+
+
+def encode_npy(array: np.ndarray, dtype: str = "float64") -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, np.ascontiguousarray(array, dtype=DTYPES[dtype]), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def encode_arrays(array: np.ndarray, metadata: dict, media_type: str, dtype: str = "float64"):
+    """
+    Encodes an (N, k) array plus JSON metadata as a packed or .npy body.
+    Returns (body, content_type, headers); .npy bodies carry the metadata in an X-Metadata header.
+    """
+    if media_type == PACKED_MEDIA_TYPE:
+        return encode_packed(array, metadata, dtype), f"{PACKED_MEDIA_TYPE}; dtype={dtype}", {}
+    if media_type == NPY_MEDIA_TYPE:
+        meta = json.dumps(to_jsonable(metadata), separators=(",", ":"))
+        return encode_npy(array, dtype), NPY_MEDIA_TYPE, {"X-Metadata": meta}
+    raise ValueError(f"Unsupported binary media type '{media_type}'")
@@ -0,0 +1,94 @@
+import os
+import json
+from typing import Dict, Optional, Tuple
+
+EPT_PATH = os.path.join("../client/public/pointclouds/markovec/ept.json")
+
+
+def load_ept_metadata(ept_path: str = EPT_PATH) -> dict:
+    """
+    Reads the ept.json metadata document of an EPT dataset.
+    """
+    with open(ept_path, "r") as f:
+        return json.load(f)
+
+
+def load_hierarchy(ept_path: str = EPT_PATH) -> Dict[str, int]:
+    """
+    Reads the full EPT hierarchy as a flat {"D-X-Y-Z": point_count} dict,
+    following sub-hierarchy files (nodes with a count of -1).
+    """
+    hierarchy_dir = os.path.join(os.path.dirname(ept_path), "ept-hierarchy")
+    hierarchy = {}
+    pending = ["0-0-0-0"]
+    while pending:
+        root = pending.pop()
+        with open(os.path.join(hierarchy_dir, f"{root}.json"), "r") as f:
+            nodes = json.load(f)
+        for key, count in nodes.items():
+            if count == -1:
+                if key != root:
+                    pending.append(key)
+                continue
+            hierarchy[key] = count
+    return hierarchy
+
+
+def node_bounds(metadata: dict, key: str) -> Tuple[float, float, float, float]:
+    """
+    Returns the (min_x, max_x, min_y, max_y) footprint of an EPT node key.
+    """
+    depth, x, y, _ = (int(v) for v in key.split("-"))
+    min_x, min_y, _, max_x, _, _ = metadata["bounds"]
+    width = (max_x - min_x) / (2 ** depth)
+    node_min_x = min_x + x * width
+    node_min_y = min_y + y * width
+    return node_min_x, node_min_x + width, node_min_y, node_min_y + width
+
+
+_metadata_cache = {}
+
+
+def get_ept_info(ept_path: str = EPT_PATH) -> dict:
+    """
+    Returns the metadata and hierarchy of an EPT dataset, re-reading them only when ept.json changes.
+    """
+    mtime = os.path.getmtime(ept_path)
+    cached = _metadata_cache.get(ept_path)
+    if cached is None or cached["mtime"] != mtime:
+        hierarchy = load_hierarchy(ept_path)
+        cached = {
+            "mtime": mtime,
+            "metadata": load_ept_metadata(ept_path),
+            "hierarchy": hierarchy,
+            "max_depth": max(int(key.split("-")[0]) for key in hierarchy),
+        }
+        _metadata_cache[ept_path] = cached
+    return cached
+
+
+def depth_for_cell_size(cell_size: float, ept_path: str = EPT_PATH, oversample: float = 2.0) -> Optional[int]:
+    """
+    Returns the shallowest EPT depth whose point spacing is at most cell_size / oversample,
+    or None when only the full-density data is fine enough.
+    """
+    info = get_ept_info(ept_path)
+    metadata = info["metadata"]
+    min_x, _, _, max_x, _, _ = metadata["bounds"]
+    root_spacing = (max_x - min_x) / metadata["span"]
+    target = cell_size / oversample
+    depth = 0
+    while root_spacing / (2 ** depth) > target:
+        depth += 1
+        if depth >= info["max_depth"]:
+            return None
+    return depth
+
+
+def depth_spacing(depth: int, ept_path: str = EPT_PATH) -> float:
+    """
+    Returns the nominal point spacing of an EPT depth, as used by the readers.ept resolution option.
+    """
+    metadata = get_ept_info(ept_path)["metadata"]
+    min_x, _, _, max_x, _, _ = metadata["bounds"]
+    return (max_x - min_x) / metadata["span"] / (2 ** depth)
@@ -0,0 +1,276 @@
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# "process" runs jobs in worker processes (the searches are pure Python and hold the GIL);
+# "thread" keeps them in the server process, which only helps for work that releases the GIL
+WORKER_POOL = os.environ.get("WORKER_POOL", "process")
+WORKER_COUNT = int(os.environ.get("WORKER_COUNT", os.cpu_count() or 1))
+MAX_QUEUED_JOBS = int(os.environ.get("MAX_QUEUED_JOBS", 32))  # jobs waiting for a worker before requests are rejected
+JOB_TIMEOUT = float(os.environ.get("JOB_TIMEOUT", 120.0))  # seconds
+DISCONNECT_POLL_INTERVAL = 0.25  # seconds
+
+
+class PoolBusy(RuntimeError):
+    pass
+
+
+class JobTimeout(RuntimeError):
+    pass
+
+
+class JobCancelled(RuntimeError):
+    pass
+
+
+# One cancel flag per worker slot, shared with the worker processes. A job owns its slot until it has
+# actually finished running, so a flag is never reset while a cancelled job could still read it.
+_cancel_flags = None
+_job_slot = threading.local()
+# Per-process state (the caches) whose stats() each worker process reports back with its job results
+_worker_stats = {}
+
+
+def register_worker_stats(name, stats):
+    """
+    Registers a module-level stats() function, such as that of a cache, under name. Worker processes
+    return the stats of everything registered in them with each job, see JobExecutor.cache_stats().
+    """
+    _worker_stats[name] = stats
+
+
+def _worker_snapshot():
+    return os.getpid(), {name: stats() for name, stats in _worker_stats.items()}
+
+
+def _init_worker(flags, warmup=None, warmed=None, claimed=None):
+    global _cancel_flags
+    _cancel_flags = flags
+    if warmup is not None:
+        # Each worker claims an index, so the warm-up can split its work between the workers
+        with claimed.get_lock():
+            index = claimed.value
+            claimed.value += 1
+        try:
+            warmup(index, len(flags))
+        except Exception as e:
+            print(f"Worker warm-up failed: {e}")
+    if warmed is not None:
+        with warmed.get_lock():
+            warmed.value += 1
+
+
+def _run_in_slot(slot, func, args, kwargs, flags=None):
+    # Thread pools pass their own flags, so several of them can share the server process
+    _job_slot.index = slot
+    _job_slot.flags = _cancel_flags if flags is None else flags
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _job_slot.index = None
+
+
+def _run_in_worker(slot, func, args, kwargs):
+    # Process pools: the caches live in the worker, so their stats travel back with the result
+    return _run_in_slot(slot, func, args, kwargs), _worker_snapshot()
+
+
+def check_cancelled():
+    """
+    Raises JobCancelled when the job running on this worker was cancelled (timeout or client
+    disconnect). Long-running loops call it periodically; outside a pool job it does nothing.
+    """
+    slot = getattr(_job_slot, "index", None)
+    flags = getattr(_job_slot, "flags", None)
+    if slot is not None and flags is not None and flags[slot]:
+        raise JobCancelled("Job was cancelled")
+
+
+class JobExecutor:
+    """
+    Runs blocking jobs in a process or thread pool on behalf of async request handlers, with at most
+    `workers` jobs running and `max_queued` waiting; further jobs are rejected with PoolBusy.
+    """
+
+    def __init__(self, kind=WORKER_POOL, workers=WORKER_COUNT, max_queued=MAX_QUEUED_JOBS, timeout=JOB_TIMEOUT):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Unknown worker pool '{kind}', expected 'process' or 'thread'")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.flags = multiprocessing.RawArray("b", self.workers)
+        self.warmed = multiprocessing.Value("i", 0)  # worker processes that finished their initializer
+        self.claimed = multiprocessing.Value("i", 0)  # warm-up indexes handed out to worker processes
+        self._warmup = None
+        self._pool = None
+        self._slots = None
+        self._loop = None
+        self._snapshots = {}  # worker pid -> stats of its registered caches after its last job
+        self.running = 0
+        self.queued = 0
+        self.counters = {"completed": 0, "failed": 0, "rejected": 0, "timeouts": 0, "cancelled": 0}
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Slots are bound to the event loop they were created on
+            self._loop = loop
+            self._slots = asyncio.Queue()
+            for slot in range(self.workers):
+                self._slots.put_nowait(slot)
+        self._start_pool()
+
+    def _start_pool(self):
+        if self._pool is None:
+            if self.kind == "process":
+                self.warmed.value = 0
+                self.claimed.value = 0
+                self._pool = ProcessPoolExecutor(
+                    self.workers, initializer=_init_worker,
+                    initargs=(self.flags, self._warmup, self.warmed, self.claimed),
+                )
+            else:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="job")
+
+    def start(self, warmup=None):
+        """
+        Starts the pool now instead of on the first job. Each worker process runs warmup(index, workers)
+        (a picklable module-level function; index is 0 to workers - 1, one per process) before taking
+        jobs; warmed_up() reports when all of them have.
+        """
+        if self._pool is not None:
+            return
+        self._warmup = warmup
+        self._start_pool()
+        if self.kind == "process":
+            for _ in range(self.workers):
+                # Makes the pool spawn every worker process and records its caches after the warm-up
+                self._pool.submit(_worker_snapshot).add_done_callback(self._record_snapshot)
+
+    def warmed_up(self) -> bool:
+        return self.kind == "thread" or (self._pool is not None and self.warmed.value >= self.workers)
+
+    def _record_snapshot(self, future):
+        if not future.cancelled() and future.exception() is None:
+            pid, snapshot = future.result()
+            self._snapshots[pid] = snapshot
+
+    def _release(self, slot):
+        self.running -= 1
+        self._slots.put_nowait(slot)
+
+    async def _wait(self, future, deadline, timeout, is_disconnected):
+        while not future.done():
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                self.counters["timeouts"] += 1
+                raise JobTimeout(f"Job did not finish within {timeout:g} seconds")
+            await asyncio.wait({future}, timeout=min(remaining, DISCONNECT_POLL_INTERVAL))
+            if not future.done() and is_disconnected is not None and await is_disconnected():
+                self.counters["cancelled"] += 1
+                raise JobCancelled("Client disconnected")
+
+    async def run(self, func, *args, is_disconnected=None, timeout=None, **kwargs):
+        """
+        Runs func(*args, **kwargs) in the pool and returns its result. Raises PoolBusy when the queue
+        is full, JobTimeout after `timeout` seconds and JobCancelled when the is_disconnected coroutine
+        function reports that the client went away; the worker then stops at its next check_cancelled().
+        """
+        self._ensure_started()
+        timeout = self.timeout if timeout is None else timeout
+        # Jobs already waiting for a slot may not have taken one yet, so compare against the free slots
+        if self.queued - self._slots.qsize() >= self.max_queued:
+            self.counters["rejected"] += 1
+            raise PoolBusy("Too many pending jobs, try again later")
+
+        loop = self._loop
+        deadline = loop.time() + timeout
+        self.queued += 1
+        waiting = loop.create_task(self._slots.get())
+        try:
+            await self._wait(waiting, deadline, timeout, is_disconnected)
+        except BaseException:
+            waiting.cancel()
+            if waiting.done() and not waiting.cancelled():
+                self._slots.put_nowait(waiting.result())
+            raise
+        finally:
+            self.queued -= 1
+        slot = waiting.result()
+
+        self.running += 1
+        self.flags[slot] = 0
+        try:
+            if self.kind == "thread":
+                job = self._pool.submit(_run_in_slot, slot, func, args, kwargs, self.flags)
+            else:
+                job = self._pool.submit(_run_in_worker, slot, func, args, kwargs)
+        except BaseException:
+            self._release(slot)
+            raise
+        job.add_done_callback(lambda _: loop.is_closed() or loop.call_soon_threadsafe(self._release, slot))
+        result = asyncio.wrap_future(job)
+        try:
+            await self._wait(result, deadline, timeout, is_disconnected)
+        except BaseException:
+            # Also covers the handler itself being cancelled: stop the worker instead of letting it run on
+            job.cancel()
+            self.flags[slot] = 1
+            result.add_done_callback(lambda done: done.cancelled() or done.exception())
+            raise
+
+        try:
+            value = result.result()
+        except JobCancelled:
+            self.counters["cancelled"] += 1
+            raise
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+        self.counters["completed"] += 1
+        if self.kind == "process":
+            value, (pid, snapshot) = value
+            self._snapshots[pid] = snapshot
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "pool": self.kind,
+            "workers": self.workers,
+            "running": self.running,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "timeout": self.timeout,
+            **self.counters,
+        }
+
+    def cache_stats(self) -> dict:
+        """
+        The stats of every registered cache. A thread pool shares the caches of the server process;
+        with a process pool each worker has its own, so the counters, sizes and budgets are summed
+        over the workers (as of their last job) and also listed per worker pid under "per_worker".
+        """
+        if self.kind == "thread":
+            return {name: stats() for name, stats in _worker_stats.items()}
+        snapshots = dict(self._snapshots)
+        totals = {}
+        for snapshot in snapshots.values():
+            for name, stats in snapshot.items():
+                total = totals.setdefault(name, {})
+                for key, value in stats.items():
+                    total[key] = total.get(key, 0) + value
+        return {**totals, "per_worker": {str(pid): snapshot for pid, snapshot in snapshots.items()}}
+
+    def shutdown(self, wait=False):
+        if self._pool is not None:
+            for slot in range(self.workers):
+                self.flags[slot] = 1
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+            self._snapshots = {}
+
+
+executor = JobExecutor()
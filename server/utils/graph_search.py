@@ -0,0 +1,70 @@
+import numpy as np
+from utils.traversability import edge_tables
+
+
+def csgraph_dijkstra(
+    elevations,
+    start_idx,
+    goal_idx,
+    max_slope=None,
+    forbidden_mask=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    stats=None,
+):
+    """
+    Shortest path with scipy.sparse.csgraph on the CSR form of the constrained grid graph.
+    Uses the same edge costs as dijkstra (step length + |dz|) but runs entirely in compiled code.
+    Only valid without a turning limit, since the cost of a step must not depend on the previous one.
+    Returns a list of (i, j) indices for the path, or [] if the goal is unreachable.
+    """
+    from scipy.sparse.csgraph import dijkstra as sparse_dijkstra
+
+    tables = edge_tables(elevations, max_slope, forbidden_mask, min_elev, max_elev, max_step)
+    graph = tables.csr_graph()
+    start = tables.index(start_idx)
+    goal = tables.index(goal_idx)
+    distances, predecessors = sparse_dijkstra(graph, directed=True, indices=start, return_predecessors=True)
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + int(np.isfinite(distances).sum())
+        stats["edges"] = int(graph.nnz)
+    if not np.isfinite(distances[goal]):
+        return []
+
+    path = []
+    current = goal
+    while current != start:
+        path.append(tables.cell(current))
+        current = int(predecessors[current])
+    path.append(tables.cell(start))
+    path.reverse()
+    return path
+
+
+def csgraph_field(
+    elevations,
+    start_idx,
+    max_slope=None,
+    forbidden_mask=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    stats=None,
+):
+    """
+    Full single-source expansion with scipy.sparse.csgraph, with the same output as
+    utils.search.dijkstra_field: (costs, parents) arrays shaped like elevations.
+    """
+    from scipy.sparse.csgraph import dijkstra as sparse_dijkstra
+
+    tables = edge_tables(elevations, max_slope, forbidden_mask, min_elev, max_elev, max_step)
+    distances, predecessors = sparse_dijkstra(
+        tables.csr_graph(), directed=True, indices=tables.index(start_idx), return_predecessors=True
+    )
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + int(np.isfinite(distances).sum())
+    shape = (tables.rows + 2, tables.width)
+    parent_rows, parent_cols = np.divmod(predecessors, tables.width)
+    parents = np.where(predecessors >= 0, (parent_rows - 1) * tables.cols + parent_cols - 1, -1)
+    return distances.reshape(shape)[1:-1, 1:-1], parents.reshape(shape)[1:-1, 1:-1]
@@ -0,0 +1,126 @@
+import numpy as np
+from utils.search import grid_search
+
+PYRAMID_FACTOR = 2
+MIN_COARSE_SIZE = 64  # stop downsampling before a level gets smaller than this many cells per side
+CORRIDOR_WIDTH = 3  # cells added on each side of the path at the level it was found
+
+
+def _downsample(array, factor, reducer):
+    rows, cols = array.shape
+    pad_rows, pad_cols = (-rows) % factor, (-cols) % factor
+    padded = np.pad(array, ((0, pad_rows), (0, pad_cols)), mode="edge")
+    blocks = padded.reshape(padded.shape[0] // factor, factor, padded.shape[1] // factor, factor)
+    return reducer(blocks, axis=(1, 3))
+
+
+def build_pyramid(elevations, forbidden_mask=None, factor=PYRAMID_FACTOR, min_size=MIN_COARSE_SIZE):
+    """
+    Returns [(elevations, forbidden_mask, scale), ...] from the full-resolution grid (scale 1) to the
+    coarsest level. Coarse cells hold the block mean elevation and are forbidden when any fine cell
+    in the block is, so coarse paths do not cut through thin forbidden strips; a gap narrower than a
+    coarse cell is recovered by the fallback in hierarchical_search.
+    """
+    levels = [(np.asarray(elevations, dtype=np.float64), forbidden_mask, 1)]
+    while min(levels[-1][0].shape) // factor >= min_size:
+        coarse_elev, coarse_mask, scale = levels[-1]
+        next_mask = None if coarse_mask is None else _downsample(np.asarray(coarse_mask, dtype=bool), factor, np.any)
+        levels.append((_downsample(coarse_elev, factor, np.mean), next_mask, scale * factor))
+    return levels
+
+
+def _corridor(path, coarse_shape, fine_shape, factor, width):
+    from scipy.ndimage import binary_dilation
+
+    mask = np.zeros(coarse_shape, dtype=bool)
+    rows, cols = zip(*path)
+    mask[list(rows), list(cols)] = True
+    if width > 0:
+        mask = binary_dilation(mask, structure=np.ones((3, 3), dtype=bool), iterations=width)
+    fine = np.repeat(np.repeat(mask, factor, axis=0), factor, axis=1)
+    return fine[:fine_shape[0], :fine_shape[1]]
+
+
+def _search_in_corridor(elevations, forbidden_mask, corridor, start_idx, goal_idx, spacing, stats, **constraints):
+    # Crop to the corridor's bounding box so the edge tables only cover the cells that can be used
+    rows = np.flatnonzero(corridor.any(axis=1))
+    cols = np.flatnonzero(corridor.any(axis=0))
+    r0, r1, c0, c1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    blocked = ~corridor[r0:r1, c0:c1]
+    if forbidden_mask is not None:
+        blocked |= np.asarray(forbidden_mask, dtype=bool)[r0:r1, c0:c1]
+    path = grid_search(
+        elevations[r0:r1, c0:c1],
+        (start_idx[0] - r0, start_idx[1] - c0),
+        (goal_idx[0] - r0, goal_idx[1] - c0),
+        mode="astar",
+        forbidden_mask=blocked,
+        stats=stats,
+        spacing=spacing,
+        **constraints,
+    )
+    return [(int(r + r0), int(c + c0)) for r, c in path]
+
+
+def hierarchical_search(
+    elevations,
+    start_idx,
+    goal_idx,
+    max_slope=None,
+    forbidden_mask=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    max_angle=None,
+    stats=None,
+    corridor_width=CORRIDOR_WIDTH,
+    min_coarse_size=MIN_COARSE_SIZE,
+):
+    """
+    Coarse-to-fine A*: solves on the coarsest level of a downsampled pyramid, widens the path into
+    a corridor and refines only inside it at each finer level until full resolution.
+    If a corridor holds no feasible path it is doubled until it covers the whole level, and if a coarse
+    level finds no path at all the next finer level is searched without a corridor.
+    Returns a list of (i, j) indices for the path; stats["levels"] lists the grid shape, corridor
+    size and expanded nodes of every level, coarsest first.
+    """
+    constraints = dict(max_slope=max_slope, min_elev=min_elev, max_elev=max_elev, max_step=max_step, max_angle=max_angle)
+    pyramid = build_pyramid(elevations, forbidden_mask, PYRAMID_FACTOR, min_coarse_size)
+    reports = []
+    path = []
+    for level in range(len(pyramid) - 1, -1, -1):
+        level_elev, level_mask, scale = pyramid[level]
+        level_start = (int(start_idx[0]) // scale, int(start_idx[1]) // scale)
+        level_goal = (int(goal_idx[0]) // scale, int(goal_idx[1]) // scale)
+        level_stats = {}
+        width = corridor_width
+        if path:
+            corridor = _corridor(path, pyramid[level + 1][0].shape, level_elev.shape, PYRAMID_FACTOR, width)
+        else:
+            corridor = np.ones(level_elev.shape, dtype=bool)
+        while True:
+            path = _search_in_corridor(
+                level_elev, level_mask, corridor, level_start, level_goal, scale, level_stats, **constraints
+            )
+            if path or corridor.all():
+                break
+            width *= 2
+            corridor = _corridor(previous_path, pyramid[level + 1][0].shape, level_elev.shape, PYRAMID_FACTOR, width)
+        reports.append({
+            "level": level,
+            "shape": list(level_elev.shape),
+            "cell_scale": scale,
+            "corridor_cells": int(corridor.sum()),
+            "corridor_width": width if level < len(pyramid) - 1 else None,
+            "expanded": level_stats.get("expanded", 0),
+        })
+        if stats is not None:
+            for key in ("expanded", "pushes"):
+                stats[key] = stats.get(key, 0) + level_stats.get(key, 0)
+            stats["max_open"] = max(stats.get("max_open", 0), level_stats.get("max_open", 0))
+        # A coarse level can miss a path that only exists at finer detail; the next level then searches everywhere
+        previous_path = path
+
+    if stats is not None:
+        stats["levels"] = reports
+    return path
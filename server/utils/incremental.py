@@ -0,0 +1,184 @@
+import heapq
+import math
+import numpy as np
+from utils.executor import check_cancelled
+from utils.search import CANCEL_CHECK_INTERVAL
+from utils.traversability import INF
+
+MAX_CHANGED_CELLS = 0.03  # share of the searched cells whose edges may change before planning again is faster
+
+
+class IncrementalPlanner:
+    """
+    Lifelong Planning A* over EdgeTables, with the D* Lite key modifier so the target can move.
+
+    The search tree is rooted at one endpoint (root) and keeps g and rhs values for every cell it
+    touched. Moving the target only shifts the heuristic (km grows by the distance moved) and edge
+    cost changes only update the cells whose edges changed; compute() then repairs just the part of
+    the tree that became inconsistent instead of searching again. With forward=True the root is the
+    path's first cell and costs are those of leaving each cell towards the target; with forward=False
+    the root is the last cell. Costs are those of astar (step length + |dz|), without a turning limit.
+    """
+
+    def __init__(self, tables, root, target, forward=True):
+        self.forward = forward
+        self.root = root
+        self.target = target
+        self.km = 0.0
+        self.expanded = 0
+        self._bind(tables)
+        size = tables.size
+        self.g = [INF] * size
+        self.rhs = [INF] * size
+        self.rhs[root] = 0.0
+        self.queue = []
+        self.queued = {}  # cell -> key of its live heap entry
+        self._push(root)
+
+    def _bind(self, tables):
+        self.tables = tables
+        self.climbs = tables.flat_climbs()
+        self.steps = tables.step_lengths
+        self.offsets = tables.offsets
+        self.width = tables.width
+        self.spacing = tables.spacing
+
+    def h(self, a, b):
+        a_row, a_col = divmod(a, self.width)
+        b_row, b_col = divmod(b, self.width)
+        return math.sqrt((a_row - b_row) ** 2 + (a_col - b_col) ** 2) * self.spacing
+
+    def key(self, cell):
+        best = min(self.g[cell], self.rhs[cell])
+        return (best + self.h(cell, self.target) + self.km, best)
+
+    def _push(self, cell):
+        key = self.key(cell)
+        self.queued[cell] = key
+        heapq.heappush(self.queue, (key, cell))
+
+    def _sources(self, cell):
+        # (neighbour, edge cost) pairs rhs(cell) is computed from
+        climbs, steps, offsets = self.climbs, self.steps, self.offsets
+        if self.forward:
+            for k in range(8):
+                source = cell - offsets[k]
+                climb = climbs[source * 8 + k] if source >= 0 else INF
+                if climb != INF:
+                    yield source, steps[k] + climb
+        else:
+            base = cell * 8
+            for k in range(8):
+                climb = climbs[base + k]
+                if climb != INF:
+                    yield cell + offsets[k], steps[k] + climb
+
+    def _dependents(self, cell):
+        # Neighbours whose rhs may use cell
+        climbs, offsets = self.climbs, self.offsets
+        if self.forward:
+            base = cell * 8
+            for k in range(8):
+                if climbs[base + k] != INF:
+                    yield cell + offsets[k]
+        else:
+            for k in range(8):
+                source = cell - offsets[k]
+                if source >= 0 and climbs[source * 8 + k] != INF:
+                    yield source
+
+    def _update(self, cell):
+        if cell != self.root:
+            g = self.g
+            best = INF
+            for source, cost in self._sources(cell):
+                candidate = g[source] + cost
+                if candidate < best:
+                    best = candidate
+            self.rhs[cell] = best
+        if self.g[cell] != self.rhs[cell]:
+            self._push(cell)
+        else:
+            self.queued.pop(cell, None)
+
+    def move_target(self, target):
+        """
+        Points the search at a new target; the queue keys stay valid through km (D* Lite).
+        """
+        self.km += self.h(self.target, target)
+        self.target = target
+
+    def update_tables(self, tables):
+        """
+        Switches to new edge tables for the same grid (e.g. after a constraint change) and marks the
+        cells whose rhs depends on a changed edge. Returns False without changing anything when the
+        change reaches too much of the searched area: a global change such as a slightly different
+        max_slope touches edges all over the tree, and repairing it costs more than a new search.
+        """
+        changed_sources, directions = np.nonzero(self.tables.cost.reshape(-1, 8) != tables.cost.reshape(-1, 8))
+        if self.forward:
+            cells = np.unique(changed_sources + np.asarray(self.offsets)[directions])
+        else:
+            cells = np.unique(changed_sources)
+        searched = np.isfinite(np.asarray(self.g))
+        if searched[cells].sum() > MAX_CHANGED_CELLS * max(searched.sum(), 1):
+            return False
+        self._bind(tables)
+        for cell in cells.tolist():
+            self._update(cell)
+        return True
+
+    def compute(self):
+        """
+        Repairs the tree until the target is consistent. Returns the path as padded cell indices
+        from the first to the last cell, or [] when the target cannot be reached.
+        """
+        g, rhs, queue, queued = self.g, self.rhs, self.queue, self.queued
+        target = self.target
+        while queue:
+            key, cell = queue[0]
+            if queued.get(cell) != key:
+                heapq.heappop(queue)  # stale entry
+                continue
+            if not (key < self.key(target) or rhs[target] != g[target]):
+                break
+            # Checked before popping so a cancelled repair leaves a state the next call can resume
+            if (self.expanded + 1) % CANCEL_CHECK_INTERVAL == 0:
+                check_cancelled()
+            heapq.heappop(queue)
+            del queued[cell]
+            self.expanded += 1
+            new_key = self.key(cell)
+            if key < new_key:
+                self._push(cell)
+            elif g[cell] > rhs[cell]:
+                g[cell] = rhs[cell]
+                for dependent in self._dependents(cell):
+                    self._update(dependent)
+            else:
+                g[cell] = INF
+                self._update(cell)
+                for dependent in self._dependents(cell):
+                    self._update(dependent)
+        if g[target] == INF:
+            return []
+        return self._trace()
+
+    def _trace(self):
+        # Walks from the target back to the root along the cheapest consistent edges
+        g = self.g
+        path = [self.target]
+        current = self.target
+        while current != self.root:
+            best, best_cost = -1, INF
+            for source, cost in self._sources(current):
+                candidate = g[source] + cost
+                if candidate < best_cost:
+                    best, best_cost = source, candidate
+            if best == -1 or len(path) > self.tables.size:
+                return []
+            path.append(best)
+            current = best
+        if self.forward:
+            path.reverse()
+        return path
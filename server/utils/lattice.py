@@ -0,0 +1,120 @@
+import heapq
+import math
+from utils.executor import check_cancelled
+from utils.search import CANCEL_CHECK_INTERVAL, TURN_ANGLES, _record, grid_search
+from utils.traversability import INF, edge_tables
+
+HEADINGS = 9  # the 8 arrival directions plus "no heading yet" for the start
+NO_HEADING = 8
+
+
+def allowed_turns(max_angle):
+    """
+    allowed_turns(max_angle)[k_in]: the directions that may follow arriving along k_in (the last
+    entry, for the start, allows all 8), read off the precomputed TURN_ANGLES table.
+    """
+    rows = [tuple(k for k, angle in enumerate(row) if not angle > max_angle) for row in TURN_ANGLES]
+    return tuple(rows) + (tuple(range(8)),)
+
+
+def lattice_search(
+    elevations,
+    start_idx,
+    goal_idx,
+    max_slope=None,
+    forbidden_mask=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    max_angle=None,
+    stats=None,
+):
+    """
+    A* over (cell, arrival direction) states: a cell reached along different headings is a different
+    state, so the turning limit no longer depends on which parent happened to reach a cell first, and
+    the path is the cheapest one that respects it. Costs are those of astar (step length + |dz|).
+    Without a turning limit every heading allows every move and plain astar is run instead.
+    Returns a list of (i, j) indices for the path, or [] if the goal is unreachable.
+    """
+    if max_angle is None or max_angle >= 180.0:
+        return grid_search(
+            elevations, start_idx, goal_idx, mode="astar",
+            max_slope=max_slope, forbidden_mask=forbidden_mask, min_elev=min_elev, max_elev=max_elev,
+            max_step=max_step, stats=stats,
+        )
+    grid = edge_tables(elevations, max_slope, forbidden_mask, min_elev, max_elev, max_step)
+    climbs = grid.flat_climbs()
+    steps = grid.step_lengths
+    offsets = grid.offsets
+    width = grid.width
+    turns = allowed_turns(max_angle)
+    turn_masks = tuple(sum(1 << k for k in row) for row in turns)
+    sqrt = math.sqrt
+
+    start = grid.index(start_idx)
+    goal = grid.index(goal_idx)
+    goal_row, goal_col = divmod(goal, width)
+
+    def h(index):
+        row, col = divmod(index, width)
+        return sqrt((row - goal_row) ** 2 + (col - goal_col) ** 2)
+
+    states = grid.size * HEADINGS
+    g = [INF] * states
+    parent = [-1] * states
+    closed = bytearray(states)
+    # Moves out of a cell already relaxed by an expansion of that cell. A move's target state and cost
+    # only depend on the cell and direction, and states of one cell pop in order of g, so relaxing the
+    # same move again from a later heading can never help: such moves (and states left with none) are skipped.
+    relaxed = bytearray(grid.size)
+    start_state = start * HEADINGS + NO_HEADING
+    g[start_state] = 0.0
+    heap = [(h(start), start_state)]
+    expanded = pushes = 0
+    max_open = 1
+
+    while heap:
+        _, state = heapq.heappop(heap)
+        if closed[state]:
+            continue  # stale entry; the heuristic is consistent, so the first pop was the cheapest
+        current, heading = divmod(state, HEADINGS)
+        if current == goal:
+            _record(stats, expanded, pushes, max_open)
+            path = []
+            while state != -1:
+                path.append(grid.cell(state // HEADINGS))
+                state = parent[state]
+            path.reverse()
+            return path
+        closed[state] = 1
+        done = relaxed[current]
+        if turn_masks[heading] & ~done == 0:
+            continue
+        relaxed[current] = done | turn_masks[heading]
+        expanded += 1
+        if expanded % CANCEL_CHECK_INTERVAL == 0:
+            check_cancelled()
+
+        g_current = g[state]
+        base = current * 8
+        for k in turns[heading]:
+            if done >> k & 1:
+                continue
+            climb = climbs[base + k]
+            if climb == INF:
+                continue
+            neighbor = current + offsets[k]
+            if turn_masks[k] & ~relaxed[neighbor] == 0:
+                continue
+            next_state = neighbor * HEADINGS + k
+            tentative = g_current + steps[k] + climb
+            if tentative < g[next_state]:
+                g[next_state] = tentative
+                parent[next_state] = state
+                heapq.heappush(heap, (tentative + h(neighbor), next_state))
+                pushes += 1
+        if len(heap) > max_open:
+            max_open = len(heap)
+
+    _record(stats, expanded, pushes, max_open)
+    return []
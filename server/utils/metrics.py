@@ -0,0 +1,160 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+METRICS_PREFIX = "accessroad"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # seconds
+SIZE_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)  # nodes, e.g. the peak open-set size
+
+
+@contextmanager
+def stage(timings, name):
+    """
+    Adds the wall time of the block to timings[name] (seconds). Does nothing when timings is None.
+    """
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """
+    Counters, gauges and histograms kept in the server process and rendered in the Prometheus
+    text exposition format. Metrics are created on first use; names get the METRICS_PREFIX.
+    """
+
+    def __init__(self, prefix: str = METRICS_PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._kinds = {}  # name -> (type, help)
+        self._values = {}  # name -> {labels: value} for counters and gauges
+        self._histograms = {}  # name -> (buckets, {labels: [bucket counts, sum, count]})
+
+    def _declare(self, name, kind, help_text):
+        if name not in self._kinds:
+            self._kinds[name] = (kind, help_text)
+            if kind == "histogram":
+                self._histograms[name] = (None, {})
+            else:
+                self._values[name] = {}
+        elif self._kinds[name][0] != kind:
+            raise ValueError(f"Metric '{name}' is a {self._kinds[name][0]}, not a {kind}")
+
+    def inc(self, name, value=1, help_text="", **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._declare(name, "counter", help_text)
+            series = self._values[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, help_text="", kind="gauge", **labels):
+        """
+        Sets a gauge, or with kind="counter" copies a running total kept elsewhere (e.g. pool counters).
+        """
+        with self._lock:
+            self._declare(name, kind, help_text)
+            self._values[name][tuple(sorted(labels.items()))] = value
+
+    def observe(self, name, value, help_text="", buckets=LATENCY_BUCKETS, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._declare(name, "histogram", help_text)
+            bounds, series = self._histograms[name]
+            if bounds is None:
+                bounds = tuple(buckets) + (math.inf,)
+                self._histograms[name] = (bounds, series)
+            entry = series.get(key)
+            if entry is None:
+                entry = series[key] = [[0] * len(bounds), 0.0, 0]
+            for position, bound in enumerate(bounds):
+                if value <= bound:
+                    entry[0][position] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> str:
+        """
+        The text exposition format served by /metrics; histogram buckets are cumulative.
+        """
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in sorted(self._kinds.items()):
+                full_name = f"{self.prefix}_{name}"
+                if help_text:
+                    lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                if kind != "histogram":
+                    for labels, value in sorted(self._values[name].items()):
+                        lines.append(f"{full_name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                bounds, series = self._histograms[name]
+                for labels, (counts, total, count) in sorted(series.items()):
+                    cumulative = 0
+                    for bound, bucket_count in zip(bounds, counts):
+                        cumulative += bucket_count
+                        bucket_labels = labels + (("le", _format_value(float(bound))),)
+                        lines.append(f"{full_name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                    lines.append(f"{full_name}_sum{_format_labels(labels)} {_format_value(float(total))}")
+                    lines.append(f"{full_name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._kinds.clear()
+            self._values.clear()
+            self._histograms.clear()
+
+
+def record_search(endpoint, algorithm, report):
+    """
+    Records the debug report of one path job (see routing.route_on_grid): stage timings,
+    search counters and the cache hits and misses inside the worker.
+    """
+    for name, seconds in report.get("stages", {}).items():
+        metrics.observe(
+            "stage_seconds", seconds, "Time spent in each pipeline stage of a job", endpoint=endpoint, stage=name
+        )
+    search = report.get("search", {})
+    for counter, help_text in (
+        ("expanded", "Nodes expanded by the searches"),
+        ("pushes", "Heap pushes made by the searches"),
+        ("line_of_sight", "Line-of-sight checks computed by theta_star"),
+        ("line_of_sight_memo_hits", "Line-of-sight checks answered from the per-search memo"),
+    ):
+        if counter in search:
+            metrics.inc(f"search_{counter}_total", search[counter], help_text, algorithm=algorithm)
+    if "max_open" in search:
+        metrics.observe(
+            "search_max_open", search["max_open"], "Peak open-set size per search",
+            buckets=SIZE_BUCKETS, algorithm=algorithm,
+        )
+    metrics.inc("searches_total", 1, "Searches run", algorithm=algorithm)
+    for cache, counts in report.get("caches", {}).items():
+        for outcome in ("hits", "misses"):
+            if counts.get(outcome):
+                metrics.inc(f"cache_{outcome}_total", counts[outcome], f"Cache {outcome}", cache=cache)
+
+
+metrics = Metrics()
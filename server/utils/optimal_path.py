@@ -1,63 +1,76 @@
-import os
-import json
-import pdal
 import numpy as np
 from typing import Tuple
-
-EPT_PATH = os.path.join("../client/public/pointclouds/markovec/ept.json")
-
-def get_elevation_grid(bounds: Tuple[float, float, float, float], grid_size: int = 100):
+from utils.dtm_tiles import get_dtm_grid
+from utils.ept import EPT_PATH, depth_for_cell_size
+from utils.point_cache import read_points
+from utils.rasterize import rasterize_points
+from utils.executor import check_cancelled
+from utils.metrics import stage
+from utils.search import angle_between, heuristic, line_of_sight, grid_search, theta_search
+
+def get_elevation_grid(
+    bounds: Tuple[float, float, float, float],
+    grid_size: int = 100,
+    use_dtm: bool = True,
+    full_density: bool = False,
+    interpolation: str = "nearest",
+    reducer: str = "mean",
+    timings: dict = None,
+    ept_path: str = EPT_PATH,
+):
     """
     Reads a grid of elevation points from the EPT point cloud within the given bounds.
     Returns a 2D numpy array of elevations and the x/y coordinates, using only ground points (classification 2).
+    When the tiled ground raster (utils.dtm_tiles) covers the bounds it is sampled instead of the point cloud.
+    The tiles are built with the default reducer and fill ("mean", "nearest"), so any other
+    reducer or interpolation reads the point cloud, where they apply.
+
+    The ground filter runs inside PDAL and, unless full_density is set, only the EPT depths whose
+    point spacing is at most half the grid cell size are decoded. The nearest ground point is then
+    at most about one cell away from each grid node, so elevations differ from the full-density grid
+    by no more than the terrain relief over one cell.
+
+    Points are binned per grid cell (reducer: min, mean or max Z) and empty cells are filled by
+    interpolation ("nearest" or "idw"); interpolation="griddata" keeps the KD-tree based
+    scipy.interpolate.griddata(method='nearest') path.
+    Pass a timings dict to collect the seconds spent in the "dtm", "read" and "grid" stages.
     """
+    if use_dtm and reducer == "mean" and interpolation == "nearest":
+        with stage(timings, "dtm"):
+            dtm_grid = get_dtm_grid(bounds, grid_size=grid_size)
+        if dtm_grid is not None:
+            return dtm_grid
+
     min_x, max_x, min_y, max_y = bounds
     x_coords = np.linspace(min_x, max_x, grid_size)
     y_coords = np.linspace(min_y, max_y, grid_size)
     xx, yy = np.meshgrid(x_coords, y_coords)
-    points = np.column_stack([xx.ravel(), yy.ravel()])
-
-    # Build PDAL pipeline to get all points in the bounding box
-    pipeline_def = {
-        "pipeline": [
-            {
-                "type": "readers.ept",
-                "filename": EPT_PATH,
-                "bounds": f"([{min_x}, {max_x}], [{min_y}, {max_y}])"
-            }
-        ]
-    }
-    pipeline = pdal.Pipeline(json.dumps(pipeline_def))
-    pipeline.execute()
-    if len(pipeline.arrays) == 0:
-        raise RuntimeError("No points found in the specified bounds.")
-
-    cloud = pipeline.arrays[0]
 
-    # Filter only ground points (classification == 2)
-    ground_mask = (cloud['Classification'] == 2)
-    ground_points = np.column_stack([cloud['X'][ground_mask], cloud['Y'][ground_mask], cloud['Z'][ground_mask]])
+    # Ground points (classification == 2) in the bounding box, filtered and thinned by PDAL
+    cell_size = min(max_x - min_x, max_y - min_y) / max(grid_size - 1, 1)
+    depth = None if full_density else depth_for_cell_size(cell_size, ept_path)
+    with stage(timings, "read"):
+        cloud = read_points(bounds, ept_path, classification=2, depth=depth)
+        ground_points = np.column_stack([cloud['X'], cloud['Y'], cloud['Z']])
+    check_cancelled()
 
     if ground_points.shape[0] == 0:
         raise RuntimeError("No ground points found in the specified bounds.")
 
     # Interpolate elevations onto the grid using only ground points
-    from scipy.interpolate import griddata
-    elevations = griddata(
-        ground_points[:, :2], ground_points[:, 2], (xx, yy), method='nearest'
-    )
+    with stage(timings, "grid"):
+        if interpolation == "griddata":
+            from scipy.interpolate import griddata
+            elevations = griddata(
+                ground_points[:, :2], ground_points[:, 2], (xx, yy), method='nearest'
+            )
+        else:
+            elevations = rasterize_points(
+                ground_points[:, 0], ground_points[:, 1], ground_points[:, 2],
+                bounds, xx.shape, reducer=reducer, fill=interpolation,
+            )
     return xx, yy, elevations
 
-def angle_between(v1, v2):
-    v1 = np.array(v1)
-    v2 = np.array(v2)
-    cos_theta = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
-    cos_theta = np.clip(cos_theta, -1.0, 1.0)
-    return np.degrees(np.arccos(cos_theta))
-
-def heuristic(a, b):
-    return np.linalg.norm(np.array(a) - np.array(b))
-
 def a_star(
     elevations,
     start_idx,
@@ -68,80 +81,17 @@ def a_star(
     max_elev=None,
     max_step = None,
     max_angle = None,
-
+    stats=None,
 ):
     """
     A* pathfinding on a 2D grid of elevations with constraints.
     Returns a list of (i, j) indices for the path.
     """
-    from queue import PriorityQueue
-
-    neighbors = [(-1,0),(1,0),(0,-1),(0,1), (-1,-1), (-1,1), (1,-1), (1,1)]
-    grid_shape = elevations.shape
-    close_set = set()
-    came_from = {}
-    gscore = {start_idx: 0}
-    fscore = {start_idx: heuristic(start_idx, goal_idx)}
-    oheap = PriorityQueue()
-    oheap.put((fscore[start_idx], start_idx))
-
-    while not oheap.empty():
-        current = oheap.get()[1]
-        if current == goal_idx:
-            # reconstruct path
-            path = []
-            while current in came_from:
-                path.append(current)
-                current = came_from[current]
-            path.append(start_idx)
-            path.reverse()
-            return path
-
-        close_set.add(current)
-        for dx, dy in neighbors:
-            neighbor = (current[0] + dx, current[1] + dy)
-            if 0 <= neighbor[0] < grid_shape[0] and 0 <= neighbor[1] < grid_shape[1]:
-                # --- Forbidden zone constraint ---
-                if forbidden_mask is not None and forbidden_mask[neighbor]:
-                    continue
-                # --- Elevation constraint ---
-                if min_elev is not None and elevations[neighbor] < min_elev:
-                    continue
-                if max_elev is not None and elevations[neighbor] > max_elev:
-                    continue
-                # --- Slope constraint ---
-                if max_slope is not None:
-                    dz = elevations[neighbor] - elevations[current]
-                    dx_dist = heuristic(current, neighbor)
-                    slope = abs(dz / dx_dist) if dx_dist != 0 else 0
-                    if slope > max_slope:
-                        continue
-                
-                # --- Step constraint ---
-                dx_dist = heuristic(current, neighbor)
-                if max_step is not None and dx_dist > max_step:
-                    continue
-
-                # --- Angle constraint ---
-                prev = came_from.get(current)
-                if prev is not None and max_angle is not None:
-                    v1 = (current[0] - prev[0], current[1] - prev[1])
-                    v2 = (neighbor[0] - current[0], neighbor[1] - current[1])
-                    angle = angle_between(v1, v2)
-                    if angle > max_angle:
-                        continue
-
-                tentative_g_score = gscore[current] + heuristic(current, neighbor) + abs(elevations[neighbor] - elevations[current])
-                if neighbor in close_set and tentative_g_score >= gscore.get(neighbor, float('inf')):
-                    continue
-                if tentative_g_score < gscore.get(neighbor, float('inf')):
-                    came_from[neighbor] = current
-                    gscore[neighbor] = tentative_g_score
-                    fscore[neighbor] = tentative_g_score + heuristic(neighbor, goal_idx)
-                    oheap.put((fscore[neighbor], neighbor))
-    return []
-
-import heapq
+    return grid_search(
+        elevations, start_idx, goal_idx, mode="astar",
+        max_slope=max_slope, forbidden_mask=forbidden_mask, min_elev=min_elev, max_elev=max_elev,
+        max_step=max_step, max_angle=max_angle, stats=stats,
+    )
 
 def dijkstra(
     elevations,
@@ -152,65 +102,14 @@ def dijkstra(
     min_elev=None,
     max_elev=None,
     max_step=None,
-    max_angle=None
+    max_angle=None,
+    stats=None,
 ):
-    neighbors = [(-1,0),(1,0),(0,-1),(0,1), (-1,-1), (-1,1), (1,-1), (1,1)]
-    grid_shape = elevations.shape
-    visited = set()
-    came_from = {}
-    gscore = {start_idx: 0}
-    heap = [(0, start_idx)]
-
-    while heap:
-        cost, current = heapq.heappop(heap)
-        if current == goal_idx:
-            path = []
-            while current in came_from:
-                path.append(current)
-                current = came_from[current]
-            path.append(start_idx)
-            path.reverse()
-            return path
-
-        if current in visited:
-            continue
-        visited.add(current)
-
-        for dx, dy in neighbors:
-            neighbor = (current[0] + dx, current[1] + dy)
-            if 0 <= neighbor[0] < grid_shape[0] and 0 <= neighbor[1] < grid_shape[1]:
-                # Constraints (same as in A*)
-                if max_slope is not None:
-                    dz = elevations[neighbor] - elevations[current]
-                    dx_dist = np.linalg.norm(np.array(current) - np.array(neighbor))
-                    slope = abs(dz / dx_dist) if dx_dist != 0 else 0
-                    if slope > max_slope:
-                        continue
-                if forbidden_mask is not None and forbidden_mask[neighbor]:
-                    continue
-                if min_elev is not None and elevations[neighbor] < min_elev:
-                    continue
-                if max_elev is not None and elevations[neighbor] > max_elev:
-                    continue
-                # --- Step constraint ---
-                dx_dist = np.linalg.norm(np.array(current) - np.array(neighbor))
-                if max_step is not None and dx_dist > max_step:
-                    continue
-                # --- Angle constraint ---
-                prev = came_from.get(current)
-                if prev is not None and max_angle is not None:
-                    v1 = (current[0] - prev[0], current[1] - prev[1])
-                    v2 = (neighbor[0] - current[0], neighbor[1] - current[1])
-                    angle = angle_between(v1, v2)
-                    if angle > max_angle:
-                        continue
-
-                tentative_g_score = gscore[current] + np.linalg.norm(np.array(current) - np.array(neighbor)) + abs(elevations[neighbor] - elevations[current])
-                if tentative_g_score < gscore.get(neighbor, float('inf')):
-                    came_from[neighbor] = current
-                    gscore[neighbor] = tentative_g_score
-                    heapq.heappush(heap, (tentative_g_score, neighbor))
-    return []
+    return grid_search(
+        elevations, start_idx, goal_idx, mode="dijkstra",
+        max_slope=max_slope, forbidden_mask=forbidden_mask, min_elev=min_elev, max_elev=max_elev,
+        max_step=max_step, max_angle=max_angle, stats=stats,
+    )
 
 def greedy_best_first(
     elevations,
@@ -221,125 +120,14 @@ def greedy_best_first(
     min_elev=None,
     max_elev=None,
     max_step=None,
-    max_angle=None
-):
-    from queue import PriorityQueue
-
-    neighbors = [(-1,0),(1,0),(0,-1),(0,1), (-1,-1), (-1,1), (1,-1), (1,1)]
-    grid_shape = elevations.shape
-    visited = set()
-    came_from = {}
-    pq = PriorityQueue()
-    pq.put((heuristic(start_idx, goal_idx), start_idx))
-
-    while not pq.empty():
-        _, current = pq.get()
-        if current == goal_idx:
-            path = []
-            while current in came_from:
-                path.append(current)
-                current = came_from[current]
-            path.append(start_idx)
-            path.reverse()
-            return path
-
-        if current in visited:
-            continue
-        visited.add(current)
-
-        for dx, dy in neighbors:
-            neighbor = (current[0] + dx, current[1] + dy)
-            if 0 <= neighbor[0] < grid_shape[0] and 0 <= neighbor[1] < grid_shape[1]:
-                # Constraints
-                if max_slope is not None:
-                    dz = elevations[neighbor] - elevations[current]
-                    dx_dist = heuristic(current, neighbor)
-                    slope = abs(dz / dx_dist) if dx_dist != 0 else 0
-                    if slope > max_slope:
-                        continue
-                if forbidden_mask is not None and forbidden_mask[neighbor]:
-                    continue
-                if min_elev is not None and elevations[neighbor] < min_elev:
-                    continue
-                if max_elev is not None and elevations[neighbor] > max_elev:
-                    continue
-                # --- Step constraint ---
-                dx_dist = heuristic(current, neighbor)
-                if max_step is not None and dx_dist > max_step:
-                    continue
-                # --- Angle constraint ---
-                prev = came_from.get(current)
-                if prev is not None and max_angle is not None:
-                    v1 = (current[0] - prev[0], current[1] - prev[1])
-                    v2 = (neighbor[0] - current[0], neighbor[1] - current[1])
-                    angle = angle_between(v1, v2)
-                    if angle > max_angle:
-                        continue
-
-                if neighbor not in visited:
-                    came_from[neighbor] = current
-                    pq.put((heuristic(neighbor, goal_idx), neighbor))
-    return []
-
-import numpy as np
-from queue import PriorityQueue
-
-def line_of_sight(
-    elevations,
-    p1,
-    p2,
-    max_slope=None,
-    forbidden_mask=None,
-    min_elev=None,
-    max_elev=None,
-    max_step=None,
     max_angle=None,
-    prev=None  # previous point for angle constraint
+    stats=None,
 ):
-    """
-    Checks if all points between p1 and p2 are traversable, including all constraints.
-    """
-    x0, y0 = p1
-    x1, y1 = p2
-    x0, y0, x1, y1 = int(x0), int(y0), int(x1), int(y1)
-    points = np.linspace([x0, y0], [x1, y1], num=int(np.hypot(x1-x0, y1-y0))+1)
-    points = np.round(points).astype(int)
-    prev_x, prev_y = points[0]
-    prev_elev = elevations[prev_x, prev_y]
-
-    for idx, (x, y) in enumerate(points[1:], start=1):
-        # Forbidden zone
-        if forbidden_mask is not None and forbidden_mask[x, y]:
-            return False
-        # Elevation constraints
-        elev = elevations[x, y]
-        if min_elev is not None and elev < min_elev:
-            return False
-        if max_elev is not None and elev > max_elev:
-            return False
-        # Slope constraint
-        if max_slope is not None:
-            dz = elev - prev_elev
-            dist = np.hypot(x - prev_x, y - prev_y)
-            slope = abs(dz / dist) if dist != 0 else 0
-            if slope > max_slope:
-                return False
-        # Step constraint
-        if max_step is not None:
-            dist = np.hypot(x - prev_x, y - prev_y)
-            if dist > max_step:
-                return False
-        # Angle constraint
-        if max_angle is not None and prev is not None and idx == 1:
-            v1 = (prev_x - prev[0], prev_y - prev[1])
-            v2 = (x - prev_x, y - prev_y)
-            angle = angle_between(v1, v2)
-            if angle > max_angle:
-                return False
-
-        prev_x, prev_y = x, y
-        prev_elev = elev
-    return True
+    return grid_search(
+        elevations, start_idx, goal_idx, mode="greedy",
+        max_slope=max_slope, forbidden_mask=forbidden_mask, min_elev=min_elev, max_elev=max_elev,
+        max_step=max_step, max_angle=max_angle, stats=stats,
+    )
 
 def theta_star(
     elevations,
@@ -350,79 +138,11 @@ def theta_star(
     min_elev=None,
     max_elev=None,
     max_step=None,
-    max_angle=None
+    max_angle=None,
+    stats=None,
 ):
-    neighbors = [(-1,0),(1,0),(0,-1),(0,1), (-1,-1), (-1,1), (1,-1), (1,1)]
-    grid_shape = elevations.shape
-    close_set = set()
-    came_from = {}
-    gscore = {start_idx: 0}
-    fscore = {start_idx: np.linalg.norm(np.array(start_idx) - np.array(goal_idx))}
-    oheap = PriorityQueue()
-    oheap.put((fscore[start_idx], start_idx))
-
-    while not oheap.empty():
-        current = oheap.get()[1]
-        if current == goal_idx:
-            path = []
-            while current in came_from:
-                path.append(current)
-                current = came_from[current]
-            path.append(start_idx)
-            path.reverse()
-            return path
-
-        close_set.add(current)
-        for dx, dy in neighbors:
-            neighbor = (current[0] + dx, current[1] + dy)
-            if 0 <= neighbor[0] < grid_shape[0] and 0 <= neighbor[1] < grid_shape[1]:
-                # Constraints
-                if forbidden_mask is not None and forbidden_mask[neighbor]:
-                    continue
-                if min_elev is not None and elevations[neighbor] < min_elev:
-                    continue
-                if max_elev is not None and elevations[neighbor] > max_elev:
-                    continue
-                dz = elevations[neighbor] - elevations[current]
-                dx_dist = np.linalg.norm(np.array(current) - np.array(neighbor))
-                if max_slope is not None:
-                    slope = abs(dz / dx_dist) if dx_dist != 0 else 0
-                    if slope > max_slope:
-                        continue
-                if max_step is not None and dx_dist > max_step:
-                    continue
-                prev = came_from.get(current)
-                if prev is not None and max_angle is not None:
-                    v1 = (current[0] - prev[0], current[1] - prev[1])
-                    v2 = (neighbor[0] - current[0], neighbor[1] - current[1])
-                    angle = angle_between(v1, v2)
-                    if angle > max_angle:
-                        continue
-
-                # Theta* shortcut
-                parent = came_from.get(current, current)
-                prev_of_parent = came_from.get(parent) if parent != current else None
-                if parent != current and line_of_sight(
-                    elevations, parent, neighbor,
-                    max_slope=max_slope,
-                    forbidden_mask=forbidden_mask,
-                    min_elev=min_elev,
-                    max_elev=max_elev,
-                    max_step=max_step,
-                    max_angle=max_angle,
-                    prev=prev_of_parent
-                ):                    
-                    tentative_g_score = gscore[parent] + np.linalg.norm(np.array(parent) - np.array(neighbor))
-                    if tentative_g_score < gscore.get(neighbor, float('inf')):
-                        came_from[neighbor] = parent
-                        gscore[neighbor] = tentative_g_score
-                        fscore[neighbor] = tentative_g_score + np.linalg.norm(np.array(neighbor) - np.array(goal_idx))
-                        oheap.put((fscore[neighbor], neighbor))
-                else:
-                    tentative_g_score = gscore[current] + dx_dist
-                    if tentative_g_score < gscore.get(neighbor, float('inf')):
-                        came_from[neighbor] = current
-                        gscore[neighbor] = tentative_g_score
-                        fscore[neighbor] = tentative_g_score + np.linalg.norm(np.array(neighbor) - np.array(goal_idx))
-                        oheap.put((fscore[neighbor], neighbor))
-    return []
\ No newline at end of file
+    return theta_search(
+        elevations, start_idx, goal_idx,
+        max_slope=max_slope, forbidden_mask=forbidden_mask, min_elev=min_elev, max_elev=max_elev,
+        max_step=max_step, max_angle=max_angle, stats=stats,
+    )
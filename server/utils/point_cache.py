@@ -0,0 +1,170 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+from typing import Optional, Tuple
+from utils.ept import EPT_PATH, depth_spacing
+from utils.executor import register_worker_stats
+
+POINT_FIELDS = ("X", "Y", "Z", "Classification")
+POINT_CACHE_TILE_SIZE = 50.0  # metres per cache tile side
+POINT_CACHE_MAX_BYTES = int(os.environ.get("POINT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+def read_ept_points(
+    bounds: Tuple[float, float, float, float],
+    ept_path: str = EPT_PATH,
+    classification: Optional[int] = None,
+    resolution: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Runs a readers.ept pipeline over the bounds and returns the X, Y, Z and Classification fields
+    as a structured array (uncached).
+    A resolution limits the EPT depth that is decoded and a classification filters points inside PDAL,
+    so neither the skipped depths nor the other classes are ever materialized in NumPy.
+    """
+    import pdal  # imported on first use, so importing the server does not load PDAL
+
+    min_x, max_x, min_y, max_y = bounds
+    reader = {
+        "type": "readers.ept",
+        "filename": ept_path,
+        "bounds": f"([{min_x}, {max_x}], [{min_y}, {max_y}])"
+    }
+    if resolution is not None:
+        reader["resolution"] = resolution
+    pipeline_def = {"pipeline": [reader]}
+    if classification is not None:
+        pipeline_def["pipeline"].append({
+            "type": "filters.range",
+            "limits": f"Classification[{classification}:{classification}]"
+        })
+    pipeline = pdal.Pipeline(json.dumps(pipeline_def))
+    pipeline.execute()
+    if len(pipeline.arrays) == 0:
+        return np.empty(0, dtype=[(name, np.float64) for name in POINT_FIELDS[:3]] + [("Classification", np.uint8)])
+    cloud = pipeline.arrays[0]
+    return np.ascontiguousarray(cloud[list(POINT_FIELDS)])
+
+
+def _depth_rank(depth: Optional[int]) -> float:
+    # None reads the full-density data, deeper than any depth limit
+    return float("inf") if depth is None else depth
+
+
+class PointCache:
+    """
+    In-process LRU cache of decoded points, keyed by square spatial tile and bounded by total bytes.
+    Requests for arbitrary bounds are assembled from cached tiles; only missing tiles are read from PDAL.
+    """
+
+    def __init__(self, max_bytes: int = POINT_CACHE_MAX_BYTES, tile_size: float = POINT_CACHE_TILE_SIZE):
+        self.max_bytes = max_bytes
+        self.tile_size = tile_size
+        self._tiles = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _tile_range(self, bounds):
+        min_x, max_x, min_y, max_y = bounds
+        tx0, tx1 = int(np.floor(min_x / self.tile_size)), int(np.floor(max_x / self.tile_size))
+        ty0, ty1 = int(np.floor(min_y / self.tile_size)), int(np.floor(max_y / self.tile_size))
+        return [(tx, ty) for ty in range(ty0, ty1 + 1) for tx in range(tx0, tx1 + 1)]
+
+    def _store(self, key, depth, points: np.ndarray):
+        with self._lock:
+            old = self._tiles.pop(key, None)
+            if old is not None:
+                if _depth_rank(old[0]) > _depth_rank(depth):
+                    # Another request stored a deeper read of the tile meanwhile; keep that one
+                    depth, points = old
+                self._bytes -= old[1].nbytes
+            self._tiles[key] = (depth, points)
+            self._bytes += points.nbytes
+            while self._bytes > self.max_bytes and len(self._tiles) > 1:
+                _, (_, evicted) = self._tiles.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def get(
+        self,
+        bounds: Tuple[float, float, float, float],
+        ept_path: str = EPT_PATH,
+        classification: Optional[int] = None,
+        depth: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Returns the points inside the bounds, reading missing tiles with one PDAL pipeline.
+        Tiles are cached separately per classification filter. A tile read down to some EPT depth
+        also serves requests for shallower depths (it holds all their points and more), so /profile
+        and /optimal-path share reads even though they ask for different depths; a request for a
+        deeper depth reads the tile again and replaces it.
+        """
+        keys = [(ept_path, classification, tx, ty) for tx, ty in self._tile_range(bounds)]
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._tiles.get(key)
+                if entry is not None and _depth_rank(entry[0]) >= _depth_rank(depth):
+                    self._tiles.move_to_end(key)
+                    found[key] = entry[1]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            ts = self.tile_size
+            read_bounds = (
+                min(k[2] for k in missing) * ts, (max(k[2] for k in missing) + 1) * ts,
+                min(k[3] for k in missing) * ts, (max(k[3] for k in missing) + 1) * ts,
+            )
+            resolution = depth_spacing(depth, ept_path) if depth is not None else None
+            cloud = read_ept_points(read_bounds, ept_path, classification=classification, resolution=resolution)
+            tx = np.floor(cloud["X"] / ts).astype(np.int64)
+            ty = np.floor(cloud["Y"] / ts).astype(np.int64)
+            for key in missing:
+                points = np.ascontiguousarray(cloud[(tx == key[2]) & (ty == key[3])])
+                self._store(key, depth, points)
+                found[key] = points
+
+        cloud = np.concatenate([found[key] for key in keys])
+        min_x, max_x, min_y, max_y = bounds
+        inside = (cloud["X"] >= min_x) & (cloud["X"] <= max_x) & (cloud["Y"] >= min_y) & (cloud["Y"] <= max_y)
+        return cloud[inside]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tiles": len(self._tiles),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+            self._bytes = 0
+
+
+point_cache = PointCache()
+register_worker_stats("points", point_cache.stats)
+
+
+def read_points(
+    bounds: Tuple[float, float, float, float],
+    ept_path: str = EPT_PATH,
+    classification: Optional[int] = None,
+    depth: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Returns X, Y, Z and Classification of the points inside the bounds, served from the shared point cache.
+    Pass a classification to keep a single class and a depth to stop at a coarser EPT level.
+    """
+    return point_cache.get(bounds, ept_path, classification=classification, depth=depth)
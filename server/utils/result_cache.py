@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 256))  # responses kept
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", 300.0))  # seconds
+
+
+def response_etag(value: dict) -> str:
+    """
+    A strong ETag for a response dict, derived from its content. NumPy arrays are hashed by
+    shape and raw bytes, so long paths are never converted to Python lists for this.
+    The "debug" report (timings that differ between runs) is left out.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    plain = {}
+    for key, item in sorted(value.items()):
+        if key == "debug":
+            continue
+        if isinstance(item, np.ndarray):
+            digest.update(f"{key}{item.shape}{item.dtype}".encode())
+            digest.update(np.ascontiguousarray(item).tobytes())
+        else:
+            plain[key] = item
+    digest.update(json.dumps(plain, sort_keys=True, separators=(",", ":"), default=float).encode())
+    return '"' + digest.hexdigest() + '"'
+
+
+class _Flight:
+    """
+    One in-progress computation and the disconnect checks of every request waiting for it.
+    """
+
+    def __init__(self):
+        self.subscribers = []
+        self.task = None
+
+    async def all_disconnected(self) -> bool:
+        # Nobody left to watch (e.g. handlers cancelled by the server): finish and cache the result
+        if not self.subscribers:
+            return False
+        for is_disconnected in list(self.subscribers):
+            if not await is_disconnected():
+                return False
+        return True
+
+
+class ResultCache:
+    """
+    In-process LRU cache of computed responses with a time-to-live, used from the event loop.
+    Concurrent requests for a key that is being computed wait for that computation (single flight)
+    instead of starting their own; the computation is only cancelled when all of them disconnect.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._flights = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def lookup(self, key):
+        """
+        Returns the cached (value, etag) for key, or None when it is missing or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value, etag = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            self.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return value, etag
+
+    def _store(self, key, value, etag):
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value, etag)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key, compute, is_disconnected=None):
+        """
+        Returns (value, etag, source) with source "hit", "coalesced" or "miss".
+        compute is an async function taking an is_disconnected coroutine function; errors are not cached.
+        """
+        cached = self.lookup(key)
+        if cached is not None:
+            self.hits += 1
+            return cached[0], cached[1], "hit"
+
+        flight = self._flights.get(key)
+        source = "coalesced"
+        if flight is None:
+            source = "miss"
+            flight = _Flight()
+            self._flights[key] = flight
+
+            async def run():
+                try:
+                    value = await compute(flight.all_disconnected)
+                    etag = response_etag(value)
+                    self._store(key, value, etag)
+                    return value, etag
+                finally:
+                    self._flights.pop(key, None)
+
+            flight.task = asyncio.ensure_future(run())
+            # Retrieve the error even if every waiting request has gone away
+            flight.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        if is_disconnected is not None:
+            flight.subscribers.append(is_disconnected)
+        if source == "miss":
+            self.misses += 1
+        else:
+            self.coalesced += 1
+        try:
+            value, etag = await asyncio.shield(flight.task)
+        finally:
+            if is_disconnected is not None and is_disconnected in flight.subscribers:
+                flight.subscribers.remove(is_disconnected)
+        return value, etag, source
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._flights),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        self._entries.clear()
+
+
+result_cache = ResultCache()
@@ -0,0 +1,256 @@
+import numpy as np
+from utils.optimal_path import get_elevation_grid, a_star, dijkstra, greedy_best_first, theta_star
+from utils.graph_search import csgraph_dijkstra
+from utils.hierarchical import hierarchical_search
+from utils.anytime import anytime_search
+from utils.lattice import lattice_search
+from utils.bidirectional import bidirectional_search
+from utils.functions import path_statistics
+from utils.metrics import stage
+from utils.point_cache import point_cache
+from utils.traversability import edge_table_cache_stats
+
+ALGORITHMS = {
+    "astar": a_star,
+    "dijkstra": dijkstra,
+    "greedy": greedy_best_first,
+    "theta_star": theta_star,
+    "csgraph": csgraph_dijkstra,
+    "hierarchical": hierarchical_search,
+    "anytime": anytime_search,
+    "lattice": lattice_search,
+    "bidirectional": bidirectional_search,
+}
+# Search stats that are part of the response rather than the debug report
+RESPONSE_STATS = ("levels", "suboptimality", "iterations", "expanded_per_side")
+
+
+def has_turn_limit(max_angle) -> bool:
+    # angle_between never exceeds 180 degrees, so 180 (the API default) means no limit
+    return max_angle is not None and max_angle < 180.0
+
+
+def find_path(
+    algorithm,
+    elevations,
+    start_idx,
+    goal_idx,
+    max_slope=None,
+    forbidden_mask=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    max_angle=None,
+    stats=None,
+    options=None,
+):
+    """
+    Runs the named search algorithm on an elevation grid.
+    csgraph requests with a turning limit fall back to the dijkstra engine, which enforces it.
+    options holds algorithm-specific settings (e.g. corridor_width for hierarchical, time_budget for anytime).
+    Returns a list of (i, j) indices for the path.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm '{algorithm}'")
+    constraints = dict(
+        max_slope=max_slope,
+        forbidden_mask=forbidden_mask,
+        min_elev=min_elev,
+        max_elev=max_elev,
+        max_step=max_step,
+    )
+    if algorithm == "csgraph":
+        if not has_turn_limit(max_angle):
+            return csgraph_dijkstra(elevations, start_idx, goal_idx, stats=stats, **constraints)
+        algorithm = "dijkstra"
+    return ALGORITHMS[algorithm](
+        elevations, start_idx, goal_idx, max_angle=max_angle, stats=stats, **constraints, **(options or {})
+    )
+
+
+def search_options(algorithm, corridor_width, coarse_size, time_budget, epsilon):
+    """
+    The algorithm-specific settings passed on to find_path.
+    """
+    if algorithm == "hierarchical":
+        return {"corridor_width": corridor_width, "min_coarse_size": coarse_size}
+    if algorithm == "anytime":
+        return {"time_budget": time_budget, "initial_epsilon": epsilon}
+    return None
+
+
+def path_bounds(points, buffer=10):
+    """
+    The (min_x, max_x, min_y, max_y) box around all points, grown by buffer on every side.
+    """
+    xs = [point[0] for point in points]
+    ys = [point[1] for point in points]
+    return (min(xs) - buffer, max(xs) + buffer, min(ys) - buffer, max(ys) + buffer)
+
+
+def grid_cell(bounds, grid_size, x, y):
+    """
+    The (i, j) index of the grid node closest to (x, y) on the grid_size x grid_size grid
+    that get_elevation_grid builds over bounds.
+    """
+    x_coords = np.linspace(bounds[0], bounds[1], grid_size)
+    y_coords = np.linspace(bounds[2], bounds[3], grid_size)
+    return int((abs(y_coords - y)).argmin()), int((abs(x_coords - x)).argmin())
+
+
+def _cache_counts(name):
+    stats = point_cache.stats() if name == "points" else edge_table_cache_stats()
+    return stats["hits"], stats["misses"]
+
+
+def _cache_report(name, before):
+    hits, misses = _cache_counts(name)
+    return {"hits": hits - before[0], "misses": misses - before[1]}
+
+
+def route_on_grid(
+    x_coords,
+    y_coords,
+    elevations,
+    point1,
+    point2,
+    algorithm="astar",
+    max_slope=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    max_angle=None,
+    options=None,
+    length_weighted_slope=False,
+):
+    """
+    Snaps both points to the grid, runs the search and returns the /optimal-path response dict.
+    x_coords and y_coords are the grid node coordinates along the columns and rows.
+    The dict also has a "debug" report with the stage timings, the search counters (expanded nodes,
+    heap pushes, peak open-set size, line-of-sight checks) and the edge-table cache hits of this job.
+    """
+    xx, yy = np.meshgrid(x_coords, y_coords)
+    def closest_idx(x, y):
+        ix = (abs(xx[0] - x)).argmin()
+        iy = (abs(yy[:,0] - y)).argmin()
+        return (iy, ix)
+    start_idx = closest_idx(point1[0], point1[1])
+    goal_idx = closest_idx(point2[0], point2[1])
+    forbidden_mask = None  # You can add logic to build this mask if needed
+
+    search_stats = {}
+    timings = {}
+    tables_before = _cache_counts("edge_tables")
+    with stage(timings, "search"):
+        path_indices = find_path(
+            algorithm, elevations, start_idx, goal_idx,
+            max_slope=max_slope,
+            forbidden_mask=forbidden_mask,
+            min_elev=min_elev,
+            max_elev=max_elev,
+            max_step=max_step,
+            max_angle=max_angle,
+            stats=search_stats,
+            options=options,
+        )
+    with stage(timings, "stats"):
+        path_points = path_to_points(path_indices, xx, yy, elevations)
+        response = path_response(path_points, length_weighted_slope)
+    extras = {key: search_stats.pop(key) for key in RESPONSE_STATS if key in search_stats}
+    debug = {
+        "stages": timings,
+        "search": search_stats,
+        "caches": {"edge_tables": _cache_report("edge_tables", tables_before)},
+    }
+    return {**extras, **response, "debug": debug}
+
+
+def optimal_path_job(
+    point1,
+    point2,
+    algorithm="astar",
+    max_slope=None,
+    min_elev=None,
+    max_elev=None,
+    grid_size=100,
+    max_step=None,
+    max_angle=None,
+    buffer=10,
+    interpolation="nearest",
+    reducer="mean",
+    options=None,
+    length_weighted_slope=False,
+):
+    """
+    The whole /optimal-path pipeline for one point pair: builds the elevation grid around both points
+    (plus buffer), runs the search and returns the response dict. Runs in the worker pool.
+    The "debug" report of route_on_grid is extended with the grid stages and point cache hits.
+    """
+    bounds = path_bounds([point1, point2], buffer)
+    timings = {}
+    points_before = _cache_counts("points")
+    xx, yy, elevations = get_elevation_grid(
+        bounds, grid_size=grid_size, interpolation=interpolation, reducer=reducer, timings=timings
+    )
+    points_report = _cache_report("points", points_before)
+    result = route_on_grid(
+        xx[0], yy[:, 0], elevations, point1, point2, algorithm,
+        max_slope=max_slope,
+        min_elev=min_elev,
+        max_elev=max_elev,
+        max_step=max_step,
+        max_angle=max_angle,
+        options=options,
+        length_weighted_slope=length_weighted_slope,
+    )
+    debug = result["debug"]
+    debug["stages"] = {**timings, **debug["stages"]}
+    debug["caches"] = {"points": points_report, **debug["caches"]}
+    return result
+
+
+def elevation_grid_job(bounds, grid_size=100, interpolation="nearest", reducer="mean"):
+    """
+    Builds the elevation grid for bounds and returns (x_coords, y_coords, elevations) for route_on_grid.
+    """
+    xx, yy, elevations = get_elevation_grid(bounds, grid_size=grid_size, interpolation=interpolation, reducer=reducer)
+    return xx[0].copy(), yy[:, 0].copy(), elevations
+
+
+def path_to_points(path_indices, xx, yy, elevations):
+    """
+    Converts (i, j) grid indices to an (N, 3) array of x, y, z coordinates.
+    """
+    if len(path_indices) == 0:
+        return np.empty((0, 3))
+    rows, cols = np.asarray(path_indices, dtype=np.int64).T
+    return np.column_stack([xx[rows, cols], yy[rows, cols], elevations[rows, cols]]).astype(np.float64)
+
+
+def path_response(path_points, length_weighted_slope=False):
+    """
+    The path together with its length and slope statistics, as returned by /optimal-path.
+    The path stays an (N, 3) array; the API turns it into JSON lists or a binary body.
+    """
+    if len(path_points) == 0:
+        return {
+            "path": np.empty((0, 3)),
+            "length": 0,
+            "average_slope": 0,
+            "min_slope": 0,
+            "max_slope": 0,
+            "local_average_slope": 0,
+            "local_min_slope": 0,
+            "local_max_slope": 0
+        }
+    stats = path_statistics(path_points, length_weighted=length_weighted_slope)
+    return {
+        "path": path_points,
+        "length": stats["length"],
+        "average_slope": stats["avg"],
+        "min_slope": stats["min"],
+        "max_slope": stats["max"],
+        "local_average_slope": stats["local_avg"],
+        "local_min_slope": stats["local_min"],
+        "local_max_slope": stats["local_max"]
+    }
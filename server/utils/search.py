@@ -0,0 +1,449 @@
+import heapq
+import math
+import numpy as np
+from utils.traversability import NEIGHBOR_OFFSETS, STEP_LENGTHS, INF, edge_tables
+from utils.executor import check_cancelled
+
+CANCEL_CHECK_INTERVAL = 4096  # expansions between checks for a cancelled job
+LOS_VECTOR_MIN_CELLS = 48  # longer lines of sight are checked with NumPy, shorter ones with edge-table lookups
+
+
+def angle_between(v1, v2):
+    v1 = np.array(v1)
+    v2 = np.array(v2)
+    cos_theta = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
+    cos_theta = np.clip(cos_theta, -1.0, 1.0)
+    return np.degrees(np.arccos(cos_theta))
+
+
+def heuristic(a, b):
+    return np.linalg.norm(np.array(a) - np.array(b))
+
+
+def _turn_angle(v1, v2):
+    """
+    angle_between for two 2D integer vectors without building arrays; the cosine is computed in
+    the same order and arccos/degrees are NumPy's, so the result is bit-identical.
+    """
+    norms = math.sqrt(v1[0] * v1[0] + v1[1] * v1[1]) * math.sqrt(v2[0] * v2[0] + v2[1] * v2[1])
+    if norms == 0:
+        return math.nan
+    cos_theta = min(max((v1[0] * v2[0] + v1[1] * v2[1]) / norms, -1.0), 1.0)
+    return float(np.degrees(np.arccos(cos_theta)))
+
+
+# TURN_ANGLES[k_in][k_out]: angle between arriving along direction k_in and leaving along k_out
+TURN_ANGLES = tuple(
+    tuple(float(angle_between(v_in, v_out)) for v_out in NEIGHBOR_OFFSETS) for v_in in NEIGHBOR_OFFSETS
+)
+
+
+def _blocked_turns(max_angle):
+    if max_angle is None:
+        return None
+    return tuple(tuple(angle > max_angle for angle in row) for row in TURN_ANGLES)
+
+
+def _record(stats, expanded, pushes, max_open, **counters):
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + expanded
+        stats["pushes"] = stats.get("pushes", 0) + pushes
+        stats["max_open"] = max(stats.get("max_open", 0), max_open)
+        for name, value in counters.items():
+            stats[name] = stats.get(name, 0) + value
+
+
+def grid_search(
+    elevations,
+    start_idx,
+    goal_idx,
+    mode="astar",
+    max_slope=None,
+    forbidden_mask=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    max_angle=None,
+    stats=None,
+    spacing=1.0,
+):
+    """
+    Shared 8-connected search over flat cell indices with a binary heap.
+    mode is "astar" (g + h, cost = step length + |dz|), "dijkstra" (g) or "greedy" (h only).
+    Returns a list of (i, j) indices for the path, or [] if the goal is unreachable.
+    If a stats dict is given, expanded nodes, heap pushes and the peak open-set size are added to it.
+
+    All per-edge constraints come from the (cached) edge tables of utils.traversability, so the
+    loop only does table lookups; the turning limit is checked against a precomputed turn table.
+    spacing is the cell size in base-grid cells, for searches on coarse pyramid levels.
+    """
+    grid = edge_tables(elevations, max_slope, forbidden_mask, min_elev, max_elev, max_step, spacing)
+    goal = grid.index(goal_idx)
+    _, parent, found = _search_core(grid, grid.index(start_idx), goal, mode, max_angle, stats)
+    return grid.trace(parent, goal) if found else []
+
+
+def dijkstra_field(
+    elevations,
+    start_idx,
+    max_slope=None,
+    forbidden_mask=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    max_angle=None,
+    stats=None,
+):
+    """
+    Runs Dijkstra from start_idx until every reachable cell is settled.
+    Returns (costs, parents) arrays shaped like elevations: the cost-distance from the start
+    (inf where unreachable) and the flat index (row * cols + col) of each cell's parent (-1 for none).
+    """
+    grid = edge_tables(elevations, max_slope, forbidden_mask, min_elev, max_elev, max_step)
+    g, parent, _ = _search_core(grid, grid.index(start_idx), -1, "dijkstra", max_angle, stats)
+    shape = (grid.rows + 2, grid.width)
+    costs = np.asarray(g).reshape(shape)[1:-1, 1:-1]
+    padded_parents = np.asarray(parent, dtype=np.int64)
+    parent_rows, parent_cols = np.divmod(padded_parents, grid.width)
+    parents = np.where(padded_parents >= 0, (parent_rows - 1) * grid.cols + parent_cols - 1, -1)
+    return costs, parents.reshape(shape)[1:-1, 1:-1]
+
+
+def _search_core(grid, start, goal, mode, max_angle, stats):
+    """
+    The heap loop shared by grid_search and dijkstra_field, over padded flat indices.
+    A goal of -1 expands every reachable cell. Returns (g, parent, goal_reached).
+    """
+    climbs = grid.flat_climbs()
+    steps = grid.step_lengths
+    offsets = grid.offsets
+    width = grid.width
+    spacing = grid.spacing
+    blocked = _blocked_turns(max_angle)
+
+    goal_row, goal_col = divmod(goal, width)
+    sqrt = math.sqrt
+
+    size = grid.size
+    g = [INF] * size
+    f = [INF] * size
+    parent = [-1] * size
+    parent_dir = [-1] * size
+    closed = bytearray(size)
+
+    use_g = mode != "greedy"
+    use_h = mode != "dijkstra"
+    lazy_closed = mode != "astar"
+
+    def h(index):
+        row, col = divmod(index, width)
+        return sqrt((row - goal_row) ** 2 + (col - goal_col) ** 2) * spacing
+
+    g[start] = 0.0
+    f[start] = h(start) if use_h else 0.0
+    heap = [(f[start], start)]
+    expanded = pushes = 0
+    max_open = 1
+
+    while heap:
+        priority, current = heapq.heappop(heap)
+        if current == goal:
+            _record(stats, expanded, pushes, max_open)
+            return g, parent, True
+        if lazy_closed:
+            if closed[current]:
+                continue
+        elif priority > f[current]:
+            continue  # stale entry, the node was re-queued with a better score
+        closed[current] = 1
+        expanded += 1
+        if expanded % CANCEL_CHECK_INTERVAL == 0:
+            check_cancelled()
+
+        g_current = g[current]
+        base = current * 8
+        turns = blocked[parent_dir[current]] if blocked is not None and parent_dir[current] != -1 else None
+        for k in range(8):
+            climb = climbs[base + k]
+            if climb == INF:
+                continue
+            if turns is not None and turns[k]:
+                continue
+            neighbor = current + offsets[k]
+
+            if not use_g:
+                # Greedy: re-parent every unvisited neighbour, as the original implementation did
+                if not closed[neighbor]:
+                    parent[neighbor] = current
+                    parent_dir[neighbor] = k
+                    heapq.heappush(heap, (h(neighbor), neighbor))
+                    pushes += 1
+                continue
+
+            tentative = g_current + steps[k] + climb
+            if tentative < g[neighbor]:
+                parent[neighbor] = current
+                parent_dir[neighbor] = k
+                g[neighbor] = tentative
+                f[neighbor] = tentative + h(neighbor) if use_h else tentative
+                heapq.heappush(heap, (f[neighbor], neighbor))
+                pushes += 1
+        if len(heap) > max_open:
+            max_open = len(heap)
+
+    _record(stats, expanded, pushes, max_open)
+    return g, parent, False
+
+
+def _line_cells(p1, p2):
+    """
+    The cells the original line_of_sight samples between p1 and p2: one point per unit of length,
+    np.linspace(p1, p2) rounded half-to-even. Computed with the same float operations as linspace,
+    so the cells are identical, but without allocating arrays for these short lines.
+    """
+    x0, y0 = int(p1[0]), int(p1[1])
+    x1, y1 = int(p2[0]), int(p2[1])
+    num = int(math.hypot(x1 - x0, y1 - y0)) + 1
+    div = num - 1
+    if div == 0:
+        return [(x0, y0)]
+    dx, dy = float(x1 - x0), float(y1 - y0)
+    step_x, step_y = dx / div, dy / div
+    if step_x == 0 or step_y == 0:
+        cells = [(round(i / div * dx + x0), round(i / div * dy + y0)) for i in range(div)]
+    else:
+        cells = [(round(i * step_x + x0), round(i * step_y + y0)) for i in range(div)]
+    cells.append((x1, y1))
+    return cells
+
+
+def _segment_clear(elevations, cell_ok, points, max_slope=None, max_step=None):
+    """
+    Checks every cell after the first on a sampled line at once: cell_ok (forbidden mask and
+    elevation range), the slope between consecutive samples and their distance.
+    """
+    if len(points) < 2:
+        return True
+    rows, cols = points[:, 0], points[:, 1]
+    if not cell_ok[rows[1:], cols[1:]].all():
+        return False
+    if max_slope is None and max_step is None:
+        return True
+    steps = np.diff(points, axis=0)
+    dist = np.hypot(steps[:, 0], steps[:, 1])
+    if max_step is not None and (dist > max_step).any():
+        return False
+    if max_slope is not None:
+        dz = np.diff(elevations[rows, cols])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(dist != 0, np.abs(dz / dist), 0.0)
+        # NaN slopes pass, like the scalar comparisons did
+        if (slope > max_slope).any():
+            return False
+    return True
+
+
+def line_of_sight(
+    elevations,
+    p1,
+    p2,
+    max_slope=None,
+    forbidden_mask=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    max_angle=None,
+    prev=None  # previous point for angle constraint
+):
+    """
+    Checks if all points between p1 and p2 are traversable, including all constraints.
+    """
+    elevations = np.asarray(elevations)
+    cell_ok = np.ones(elevations.shape, dtype=bool)
+    if forbidden_mask is not None:
+        cell_ok &= ~np.asarray(forbidden_mask, dtype=bool)
+    if min_elev is not None:
+        cell_ok &= ~(elevations < min_elev)
+    if max_elev is not None:
+        cell_ok &= ~(elevations > max_elev)
+    points = np.array(_line_cells(p1, p2))
+    if not _segment_clear(elevations, cell_ok, points, max_slope, max_step):
+        return False
+    # Angle constraint on the first step
+    if max_angle is not None and prev is not None and len(points) > 1:
+        v1 = (points[0][0] - prev[0], points[0][1] - prev[1])
+        v2 = (points[1][0] - points[0][0], points[1][1] - points[0][1])
+        if angle_between(v1, v2) > max_angle:
+            return False
+    return True
+
+
+def theta_search(
+    elevations,
+    start_idx,
+    goal_idx,
+    max_slope=None,
+    forbidden_mask=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    max_angle=None,
+    stats=None,
+):
+    """
+    Theta* on the shared flat-index core: like A*, but a neighbour is connected straight to the
+    current node's parent when there is line of sight, and costs are Euclidean distances.
+    Line-of-sight results are memoized per (parent, neighbour) for the duration of the search. Short
+    lines are checked with edge-table lookups, long ones with one vectorized pass over the segment;
+    turn angles are memoized per vector pair.
+    """
+    grid = edge_tables(elevations, max_slope, forbidden_mask, min_elev, max_elev, max_step)
+    elevations = grid.elevations
+    cell_ok = grid.cell_ok[1:-1, 1:-1]
+    passable = grid.flat_passable()
+    offsets = grid.offsets
+    width = grid.width
+    steps = STEP_LENGTHS
+    blocked = _blocked_turns(max_angle)
+
+    start = grid.index(start_idx)
+    goal = grid.index(goal_idx)
+    goal_row, goal_col = divmod(goal, width)
+    sqrt = math.sqrt
+
+    size = grid.size
+    g = [INF] * size
+    f = [INF] * size
+    parent = [-1] * size
+    expanded = pushes = 0
+    max_open = 1
+
+    directions = {offset: k for k, offset in enumerate(NEIGHBOR_OFFSETS)}
+    jump_lengths = {(dy, dx): float(np.hypot(dy, dx)) for dy in range(-3, 4) for dx in range(-3, 4)}
+    sight = {}  # (from, to) -> (clear, first step) for the line between two padded indices
+    too_sharp = {}  # (incoming, outgoing) -> angle exceeds max_angle
+    memo_hits = [0]
+
+    def distance(a, b):
+        a_row, a_col = divmod(a, width)
+        b_row, b_col = divmod(b, width)
+        return sqrt((a_row - b_row) ** 2 + (a_col - b_col) ** 2)
+
+    def turn_exceeds(v1, v2):
+        key = (v1, v2)
+        result = too_sharp.get(key)
+        if result is None:
+            result = too_sharp[key] = _turn_angle(v1, v2) > max_angle
+        return result
+
+    def clear_line(cells):
+        # Consecutive cells are mostly 8-neighbours, whose constraints the edge tables already hold
+        prev_row, prev_col = cells[0]
+        prev_elev = elevations.item(prev_row, prev_col)
+        for row, col in cells[1:]:
+            elev = elevations.item(row, col)
+            move = (row - prev_row, col - prev_col)
+            k = directions.get(move)
+            if k is not None:
+                if not passable[((prev_row + 1) * width + prev_col + 1) * 8 + k]:
+                    return False
+            else:
+                # Rounding skipped or repeated a cell: check the jump like the original line_of_sight
+                dist = jump_lengths[move]
+                if not cell_ok.item(row, col):
+                    return False
+                if max_step is not None and dist > max_step:
+                    return False
+                if max_slope is not None and dist != 0 and abs((elev - prev_elev) / dist) > max_slope:
+                    return False
+            prev_row, prev_col, prev_elev = row, col, elev
+        return True
+
+    def line_first_step(a, b):
+        # Returns (clear, first step) of the line of sight from padded index a to b
+        a_cell, b_cell = grid.cell(a), grid.cell(b)
+        if math.hypot(b_cell[0] - a_cell[0], b_cell[1] - a_cell[1]) + 1 >= LOS_VECTOR_MIN_CELLS:
+            points = np.round(np.linspace(a_cell, b_cell, num=int(np.hypot(b_cell[0] - a_cell[0], b_cell[1] - a_cell[1])) + 1)).astype(int)
+            clear = _segment_clear(elevations, cell_ok, points, max_slope, max_step)
+            return clear, (int(points[1][0] - points[0][0]), int(points[1][1] - points[0][1]))
+        cells = _line_cells(a_cell, b_cell)
+        first_step = (cells[1][0] - cells[0][0], cells[1][1] - cells[0][1]) if len(cells) > 1 else None
+        return clear_line(cells), first_step
+
+    def visible(a, b, before):
+        key = (a, b)
+        entry = sight.get(key)
+        if entry is None:
+            entry = sight[key] = line_first_step(a, b)
+        else:
+            memo_hits[0] += 1
+        clear, first_step = entry
+        if not clear:
+            return False
+        if max_angle is not None and before != -1 and first_step is not None:
+            a_row, a_col = grid.cell(a)
+            b_row, b_col = grid.cell(before)
+            if turn_exceeds((a_row - b_row, a_col - b_col), first_step):
+                return False
+        return True
+
+    def sight_counters():
+        return {"line_of_sight": len(sight), "line_of_sight_memo_hits": memo_hits[0]}
+
+    g[start] = 0.0
+    f[start] = sqrt(sum((int(a) - int(b)) ** 2 for a, b in zip(start_idx, goal_idx)))
+    heap = [(f[start], start)]
+
+    while heap:
+        priority, current = heapq.heappop(heap)
+        if current == goal:
+            _record(stats, expanded, pushes, max_open, **sight_counters())
+            return grid.trace(parent, goal)
+        if priority > f[current]:
+            continue
+        expanded += 1
+        if expanded % CANCEL_CHECK_INTERVAL == 0:
+            check_cancelled()
+
+        base = current * 8
+        prev = parent[current]
+        if prev != -1:
+            current_cell = grid.cell(current)
+            prev_cell = grid.cell(prev)
+            incoming = (current_cell[0] - prev_cell[0], current_cell[1] - prev_cell[1])
+            adjacent_dir = NEIGHBOR_OFFSETS.index(incoming) if incoming in NEIGHBOR_OFFSETS else -1
+            prev_of_parent = parent[prev]
+        for k in range(8):
+            if not passable[base + k]:
+                continue
+            neighbor = current + offsets[k]
+            dx_dist = steps[k]
+            if prev != -1 and max_angle is not None:
+                if adjacent_dir != -1:
+                    if blocked[adjacent_dir][k]:
+                        continue
+                elif turn_exceeds(incoming, NEIGHBOR_OFFSETS[k]):
+                    continue
+
+            # Theta* shortcut
+            if prev != -1 and visible(prev, neighbor, prev_of_parent):
+                tentative = g[prev] + distance(prev, neighbor)
+                if tentative < g[neighbor]:
+                    parent[neighbor] = prev
+                    g[neighbor] = tentative
+                    f[neighbor] = tentative + distance(neighbor, goal)
+                    heapq.heappush(heap, (f[neighbor], neighbor))
+                    pushes += 1
+                continue
+            tentative = g[current] + dx_dist
+            if tentative < g[neighbor]:
+                parent[neighbor] = current
+                g[neighbor] = tentative
+                f[neighbor] = tentative + distance(neighbor, goal)
+                heapq.heappush(heap, (f[neighbor], neighbor))
+                pushes += 1
+        if len(heap) > max_open:
+            max_open = len(heap)
+
+    _record(stats, expanded, pushes, max_open, **sight_counters())
+    return []
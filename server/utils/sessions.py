@@ -0,0 +1,229 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+import numpy as np
+from utils.executor import JobExecutor
+from utils.incremental import IncrementalPlanner
+from utils.metrics import stage
+from utils.optimal_path import get_elevation_grid
+from utils.routing import find_path, has_turn_limit, path_bounds, path_response
+from utils.traversability import edge_tables
+
+SESSION_TTL = float(os.environ.get("SESSION_TTL", 600.0))  # seconds a planning session lives without requests
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", 32))  # least recently used sessions are dropped beyond this
+SESSION_WORKERS = int(os.environ.get("SESSION_WORKERS", 2))
+SESSION_MARGIN = 0.5  # share of the path bounds loaded on every side, so later drags still fit
+
+# Sessions keep their grid and search state in this process, so their jobs run on threads
+session_executor = JobExecutor(kind="thread", workers=SESSION_WORKERS)
+
+
+class SessionElsewhere(RuntimeError):
+    pass
+
+
+def _process_tag() -> str:
+    # Session ids start with the id of the server process holding them
+    return f"{os.getpid():x}"
+
+
+class PlanningSession:
+    """
+    The terrain grid and incremental planner kept between the requests of one client that
+    keeps moving the endpoints of a path. A lock serializes the requests of a session.
+    """
+
+    def __init__(self, grid_size=100, buffer=10, interpolation="nearest", reducer="mean"):
+        self.id = f"{_process_tag()}-{uuid.uuid4().hex}"
+        self.grid_size = grid_size
+        self.buffer = buffer
+        self.interpolation = interpolation
+        self.reducer = reducer
+        self.bounds = None
+        self.x_coords = None
+        self.y_coords = None
+        self.elevations = None
+        self.planner = None
+        self.constraints = None
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def _load_grid(self, needed, timings):
+        # Loads more than the two points need, keeping the grid spacing of a plain /optimal-path request
+        min_x, max_x, min_y, max_y = needed
+        margin_x = (max_x - min_x) * SESSION_MARGIN
+        margin_y = (max_y - min_y) * SESSION_MARGIN
+        self.bounds = (min_x - margin_x, max_x + margin_x, min_y - margin_y, max_y + margin_y)
+        grid_size = int(round(self.grid_size * (1 + 2 * SESSION_MARGIN)))
+        xx, yy, self.elevations = get_elevation_grid(
+            self.bounds, grid_size=grid_size, interpolation=self.interpolation, reducer=self.reducer, timings=timings
+        )
+        self.x_coords = xx[0].copy()
+        self.y_coords = yy[:, 0].copy()
+        self.planner = None
+
+    def _fits(self, needed) -> bool:
+        if self.bounds is None:
+            return False
+        return (
+            needed[0] >= self.bounds[0] and needed[1] <= self.bounds[1]
+            and needed[2] >= self.bounds[2] and needed[3] <= self.bounds[3]
+        )
+
+    def _closest(self, point):
+        return int(abs(self.y_coords - point[1]).argmin()), int(abs(self.x_coords - point[0]).argmin())
+
+    def _plan(self, tables, first, last, constraints):
+        """
+        Brings the planner up to date with the new endpoint cells and constraints.
+        Returns the path as padded indices and how it was found.
+        """
+        planner = self.planner
+        mode = "incremental"
+        if planner is not None and constraints != self.constraints and not planner.update_tables(tables):
+            planner = None  # too many edges changed to repair
+        if planner is not None:
+            root, target = (first, last) if planner.forward else (last, first)
+            if planner.root == root:
+                planner.move_target(target)
+            elif planner.target == target:
+                # The root end was dragged: grow a new tree from the end that stayed put
+                planner = IncrementalPlanner(tables, target, root, forward=not planner.forward)
+                mode = "rerooted"
+            else:
+                planner = None
+        if planner is None:
+            planner = IncrementalPlanner(tables, first, last)
+            mode = "replanned"
+        self.planner = planner
+        self.constraints = constraints
+        return planner.compute(), mode
+
+    def route(
+        self,
+        point1,
+        point2,
+        max_slope=None,
+        min_elev=None,
+        max_elev=None,
+        max_step=None,
+        max_angle=None,
+        length_weighted_slope=False,
+    ):
+        """
+        Plans point1 -> point2 on the session grid and returns the /optimal-path response dict with a
+        "replan" entry telling whether the grid was reused and whether the search was repaired
+        ("incremental"), restarted from the other endpoint ("rerooted") or run from scratch ("replanned").
+        Turning limits need the heading in the search state, so those requests always run a full astar
+        on the (reused) grid.
+        """
+        with self.lock:
+            self.last_used = time.monotonic()
+            timings = {}
+            needed = path_bounds([point1, point2], self.buffer)
+            grid = "reused"
+            if not self._fits(needed):
+                self._load_grid(needed, timings)
+                grid = "loaded"
+            start_idx = self._closest(point1)
+            goal_idx = self._closest(point2)
+            constraints = (max_slope, min_elev, max_elev, max_step)
+            search_stats = {}
+            with stage(timings, "search"):
+                if has_turn_limit(max_angle):
+                    path_indices = find_path(
+                        "astar", self.elevations, start_idx, goal_idx,
+                        max_slope=max_slope, min_elev=min_elev, max_elev=max_elev, max_step=max_step,
+                        max_angle=max_angle, stats=search_stats,
+                    )
+                    mode = "replanned"
+                else:
+                    tables = edge_tables(self.elevations, max_slope, None, min_elev, max_elev, max_step)
+                    expanded_before = self.planner.expanded if self.planner is not None else 0
+                    path, mode = self._plan(tables, tables.index(start_idx), tables.index(goal_idx), constraints)
+                    path_indices = [tables.cell(index) for index in path]
+                    expanded = self.planner.expanded - (expanded_before if mode == "incremental" else 0)
+                    search_stats = {"expanded": expanded, "max_open": len(self.planner.queued)}
+            with stage(timings, "stats"):
+                if path_indices:
+                    rows, cols = np.asarray(path_indices, dtype=np.int64).T
+                    points = np.column_stack([
+                        self.x_coords[cols], self.y_coords[rows], self.elevations[rows, cols]
+                    ]).astype(np.float64)
+                else:
+                    points = np.empty((0, 3))
+                response = path_response(points, length_weighted_slope)
+            self.last_used = time.monotonic()
+        return {
+            **response,
+            "replan": {"mode": mode, "grid": grid},
+            "debug": {"stages": timings, "search": search_stats},
+        }
+
+
+class SessionStore:
+    """
+    The open planning sessions by id. Sessions unused for longer than ttl are dropped,
+    and the least recently used one when more than max_sessions are open.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        now = time.monotonic()
+        for session_id in [key for key, session in self._sessions.items() if now - session.last_used > self.ttl]:
+            del self._sessions[session_id]
+
+    def create(self, **settings) -> PlanningSession:
+        session = PlanningSession(**settings)
+        with self._lock:
+            self._expire()
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    @staticmethod
+    def _check_process(session_id):
+        tag, _, rest = session_id.partition("-")
+        if len(rest) == 32 and tag != _process_tag() and all(c in "0123456789abcdef" for c in tag + rest):
+            raise SessionElsewhere(
+                "The session is held by another server process; run a single worker or route "
+                "every request of a session to the same one (sticky sessions)"
+            )
+
+    def get(self, session_id):
+        """
+        The session with this id, or None when it does not exist or has expired.
+        Raises SessionElsewhere for a session created by another server process.
+        """
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                self._check_process(session_id)
+                return None
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id) -> bool:
+        with self._lock:
+            if self._sessions.pop(session_id, None) is not None:
+                return True
+        self._check_process(session_id)
+        return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire()
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions, "ttl": self.ttl}
+
+
+sessions = SessionStore()
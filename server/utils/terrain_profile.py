@@ -1,44 +1,59 @@
-import os
-import json
-import pdal
 import numpy as np
 from typing import List
-from models import ProfileResponse  
+from utils.dtm_tiles import sample_dtm
+from utils.ept import EPT_PATH, depth_for_cell_size
+from utils.point_cache import read_points
+from utils.rasterize import rasterize_points, bilinear_sample
 
-EPT_PATH = os.path.join("../client/public/pointclouds/markovec/ept.json")
+PROFILE_BUFFER = 2.0  # metres around the line, so axis-aligned profiles still get a 2D neighbourhood
+PROFILE_RESOLUTION = 1.0  # ground raster cell size in metres, as for the DTM tiles
+PROFILE_MAX_CELLS = 4_000_000  # the raster cell size grows for long diagonal profiles to stay below this
+MAX_PROFILE_POINTS = 10_000
 
-def get_terrain_profile(point1: List[float], point2: List[float], num_points: int = 100) -> ProfileResponse:
+
+def _sample_ground(line: np.ndarray, bounds, ept_path: str = EPT_PATH):
+    """
+    Rasterizes the ground points around the line and samples the raster bilinearly at every line point.
+    Returns None when there are no ground points.
+    """
+    min_x, max_x, min_y, max_y = bounds
+    cell_size = max(PROFILE_RESOLUTION, np.sqrt((max_x - min_x) * (max_y - min_y) / PROFILE_MAX_CELLS))
+    cloud = read_points(bounds, ept_path, classification=2, depth=depth_for_cell_size(cell_size, ept_path))
+    if len(cloud) == 0:
+        return None
+    cols = int(np.ceil((max_x - min_x) / cell_size)) + 1
+    rows = int(np.ceil((max_y - min_y) / cell_size)) + 1
+    # Grid nodes at min + k * cell_size, as rasterize_points places them at linspace(min, max, n)
+    raster_bounds = (min_x, min_x + (cols - 1) * cell_size, min_y, min_y + (rows - 1) * cell_size)
+    raster = rasterize_points(cloud['X'], cloud['Y'], cloud['Z'], raster_bounds, (rows, cols))
+    return bilinear_sample(raster, (line[:, 0] - min_x) / cell_size, (line[:, 1] - min_y) / cell_size)
+
+
+def sample_terrain_profile(
+    point1: List[float],
+    point2: List[float],
+    num_points: int = 100,
+    use_dtm: bool = True,
+    ept_path: str = EPT_PATH,
+) -> dict:
+    """
+    Samples the ground elevation at num_points evenly spaced points from point1 to point2.
+    Uses the tiled ground raster when it covers the line, otherwise a raster of the ground points
+    around the line; both are interpolated bilinearly for all samples at once, so the cost does not
+    grow with the number of samples times the number of points.
+    Returns {"distances": (N,), "coordinates": (N, 3)} arrays, empty when there is no ground data.
+    """
     line = np.linspace(point1[:2], point2[:2], num_points)
-    pipeline_def = {
-        "pipeline": [
-            {
-                "type": "readers.ept",
-                "filename": EPT_PATH,
-                "bounds": f"([{min(point1[0], point2[0])}, {max(point1[0], point2[0])}], "
-                          f"[{min(point1[1], point2[1])}, {max(point1[1], point2[1])}])"
-            },
-        ]
-    }
-    pipeline = pdal.Pipeline(json.dumps(pipeline_def))
-    pipeline.execute()
-    if len(pipeline.arrays) == 0:
-        return ProfileResponse(distances=[], elevations=[], coordinates=[])
-    cloud = pipeline.arrays[0]
-    points = np.column_stack([cloud['X'], cloud['Y'], cloud['Z']])
-    elevations = []
-    coordinates = []
-    distances = []
     total_distance = np.linalg.norm(np.array(point2) - np.array(point1))
-    for i, (x, y) in enumerate(line):
-        dist = np.linalg.norm(points[:, :2] - [x, y], axis=1)
-        nearest = np.argmin(dist)
-        z = points[nearest, 2]
-        current_dist = (i / (num_points - 1)) * total_distance
-        distances.append(current_dist)
-        elevations.append(z)
-        coordinates.append([float(x), float(y), float(z)])
-    return ProfileResponse(
-        distances=distances,
-        elevations=elevations,
-        coordinates=coordinates
-    )
\ No newline at end of file
+    elevations = sample_dtm(line[:, 0], line[:, 1]) if use_dtm else None
+    if elevations is None:
+        bounds = (
+            min(point1[0], point2[0]) - PROFILE_BUFFER, max(point1[0], point2[0]) + PROFILE_BUFFER,
+            min(point1[1], point2[1]) - PROFILE_BUFFER, max(point1[1], point2[1]) + PROFILE_BUFFER,
+        )
+        elevations = _sample_ground(line, bounds, ept_path)
+    if elevations is None:
+        return {"distances": np.empty(0), "coordinates": np.empty((0, 3))}
+    distances = np.arange(num_points) / max(num_points - 1, 1) * total_distance
+    return {"distances": distances, "coordinates": np.column_stack([line, elevations])}
+
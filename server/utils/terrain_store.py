@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import shutil
+import threading
+import numpy as np
+from typing import Optional
+from utils.ept import EPT_PATH, get_ept_info
+from utils.rasterize import bilinear_sample
+
+TERRAIN_STORE_DIR = os.environ.get("TERRAIN_STORE_DIR", os.path.join("cache", "terrain"))
+CURRENT_NAME = "current.json"
+META_NAME = "meta.json"
+LEASES_DIR = "leases"
+WATCH_INTERVAL = 60.0  # seconds between checks of the EPT dataset in --watch mode
+
+
+def dataset_fingerprint(ept_path: str = EPT_PATH) -> str:
+    """
+    Fingerprint of everything in the EPT dataset that can change the ground raster.
+    """
+    from utils.dtm_tiles import node_file_stats, tile_fingerprint
+
+    info = get_ept_info(ept_path)
+    metadata = info["metadata"]
+    min_x, min_y, _, max_x, max_y, _ = metadata.get("boundsConforming", metadata["bounds"])
+    return tile_fingerprint(metadata, info["hierarchy"], (min_x, max_x, min_y, max_y), node_file_stats(ept_path))
+
+
+def read_current(store_dir: str = TERRAIN_STORE_DIR) -> Optional[dict]:
+    try:
+        with open(os.path.join(store_dir, CURRENT_NAME), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_alive(pid: int) -> bool:
+    """
+    Whether a process with this id is running. Never signals it: on Windows os.kill with signal 0
+    would terminate the process, so the process handle is queried instead.
+    """
+    if os.name == "nt":
+        import ctypes
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return ctypes.get_last_error() == 5  # ERROR_ACCESS_DENIED: it exists but belongs to someone else
+        try:
+            code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+                return True
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect_garbage(store_dir: str = TERRAIN_STORE_DIR) -> int:
+    """
+    Deletes the generations that are no longer current and have no live process attached
+    (leases of processes that died without releasing them are dropped). Returns the number deleted.
+    """
+    current = read_current(store_dir)
+    current_id = current["generation"] if current else None
+    removed = 0
+    for name in os.listdir(store_dir) if os.path.isdir(store_dir) else ():
+        path = os.path.join(store_dir, name)
+        if name == current_id or not os.path.isdir(path):
+            continue
+        leases = os.path.join(path, LEASES_DIR)
+        live = 0
+        for lease in os.listdir(leases) if os.path.isdir(leases) else ():
+            if lease.isdigit() and _pid_alive(int(lease)):
+                live += 1
+            else:
+                try:
+                    os.remove(os.path.join(leases, lease))
+                except OSError:
+                    pass
+        if live == 0:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def build_generation(
+    ept_path: str = EPT_PATH,
+    store_dir: str = TERRAIN_STORE_DIR,
+    cache_dir: str = None,
+    force: bool = False,
+) -> dict:
+    """
+    Publishes the ground raster of the EPT dataset as a new store generation: the DTM tiles
+    (built or updated first, see utils.dtm_tiles) mosaicked into one float32 elevation raster,
+    written as a .npy file that processes memory-map read-only. The generation becomes
+    current with an atomic rename of current.json, so readers always see a complete one.
+    Does nothing when the current generation was built from the same dataset fingerprint.
+    """
+    from utils.dtm_tiles import DTM_CACHE_DIR, MANIFEST_NAME, build_dtm_tiles
+
+    cache_dir = cache_dir or DTM_CACHE_DIR
+    fingerprint = dataset_fingerprint(ept_path)
+    current = read_current(store_dir)
+    if current is not None and current["fingerprint"] == fingerprint and not force:
+        return {"generation": current["generation"], "built": False}
+
+    tiles_summary = build_dtm_tiles(ept_path, cache_dir)
+    with open(os.path.join(cache_dir, MANIFEST_NAME), "r") as f:
+        manifest = json.load(f)
+    cells = manifest["tile_cells"]
+    resolution = manifest["resolution"]
+    keys = [tuple(int(v) for v in key.split("_")) for key in manifest["tiles"]]
+    if not keys:
+        raise RuntimeError("The EPT dataset has no DTM tiles to store.")
+    tx0, tx1 = min(tx for tx, _ in keys), max(tx for tx, _ in keys)
+    ty0, ty1 = min(ty for _, ty in keys), max(ty for _, ty in keys)
+    shape = ((ty1 - ty0 + 1) * cells, (tx1 - tx0 + 1) * cells)
+
+    generation = f"{time.strftime('%Y%m%dT%H%M%S')}-{fingerprint[:12]}"
+    suffix = 0
+    while os.path.exists(os.path.join(store_dir, generation + (f"-{suffix}" if suffix else ""))):
+        suffix += 1  # a forced rebuild must never write into a generation that may be mapped
+    generation += f"-{suffix}" if suffix else ""
+    gen_dir = os.path.join(store_dir, generation)
+    os.makedirs(os.path.join(gen_dir, LEASES_DIR), exist_ok=True)
+    elevation = np.lib.format.open_memmap(
+        os.path.join(gen_dir, "elevation.npy"), mode="w+", dtype=np.float32, shape=shape
+    )
+    elevation[:] = np.nan  # empty tiles stay NaN and are never sampled
+    for key, entry in manifest["tiles"].items():
+        if entry["empty"]:
+            continue
+        tx, ty = (int(v) for v in key.split("_"))
+        r0, c0 = (ty - ty0) * cells, (tx - tx0) * cells
+        elevation[r0:r0 + cells, c0:c0 + cells] = np.load(os.path.join(cache_dir, entry["file"]), mmap_mode="r")
+    elevation.flush()
+    del elevation
+
+    meta = {
+        "generation": generation,
+        "fingerprint": fingerprint,
+        "ept_path": os.path.abspath(ept_path),
+        "resolution": resolution,
+        "origin_cell": [tx0 * cells, ty0 * cells],  # global (column, row) of raster cell [0, 0]
+        "shape": list(shape),
+    }
+    with open(os.path.join(gen_dir, META_NAME), "w") as f:
+        json.dump(meta, f)
+    tmp_current = os.path.join(store_dir, CURRENT_NAME + ".tmp")
+    with open(tmp_current, "w") as f:
+        json.dump({"generation": generation, "fingerprint": fingerprint}, f)
+    os.replace(tmp_current, os.path.join(store_dir, CURRENT_NAME))
+    removed = collect_garbage(store_dir)
+    return {"generation": generation, "built": True, "tiles": tiles_summary, "removed_generations": removed}
+
+
+class TerrainGeneration:
+    """
+    One attached store generation: its elevation raster as a read-only memory-mapped NumPy array. Every process
+    maps the same files, so the pages are shared through the OS page cache instead of copied per worker.
+    """
+
+    def __init__(self, gen_dir: str):
+        with open(os.path.join(gen_dir, META_NAME), "r") as f:
+            self.meta = json.load(f)
+        self.id = self.meta["generation"]
+        self.dir = gen_dir
+        self.resolution = self.meta["resolution"]
+        self.origin_col, self.origin_row = self.meta["origin_cell"]
+        self.elevation = np.load(os.path.join(gen_dir, "elevation.npy"), mmap_mode="r")
+
+    def sample(self, x, y) -> Optional[np.ndarray]:
+        """
+        Bilinearly samples the elevation at the given coordinates, like dtm_tiles.sample_dtm, reading
+        only the cells around the samples. Returns None when a sample falls outside the stored
+        area or next to an empty tile.
+        """
+        grid = self.elevation
+        fx = np.asarray(x, dtype=np.float64) / self.resolution - 0.5 - self.origin_col
+        fy = np.asarray(y, dtype=np.float64) / self.resolution - 0.5 - self.origin_row
+        if fx.size == 0:
+            return np.empty(fx.shape)
+        rows, cols = grid.shape
+        if fx.min() < 0 or fy.min() < 0 or np.floor(fx.max()) + 1 > cols - 1 or np.floor(fy.max()) + 1 > rows - 1:
+            return None
+        values = bilinear_sample(grid, fx, fy)
+        if np.isnan(values).any():
+            return None
+        return values
+
+    def nbytes(self) -> int:
+        return self.elevation.nbytes
+
+
+class TerrainStore:
+    """
+    Attaches this process to the current generation of the terrain store and follows reloads:
+    each access checks current.json (one stat) and moves to a new generation when it changed.
+    A lease file per process in the generation directory keeps the supervisor from deleting a
+    generation that is still attached; requests already holding the old arrays keep valid views.
+    """
+
+    def __init__(self, store_dir: str = TERRAIN_STORE_DIR):
+        self.store_dir = store_dir
+        self._lock = threading.Lock()
+        self._generation = None
+        self._mtime = None
+        self.reloads = 0
+
+    @staticmethod
+    def _lease_path(gen_dir):
+        return os.path.join(gen_dir, LEASES_DIR, str(os.getpid()))
+
+    def _attach(self) -> Optional[TerrainGeneration]:
+        current = read_current(self.store_dir)
+        if current is None:
+            return None
+        gen_dir = os.path.join(self.store_dir, current["generation"])
+        # Lease first, so the generation cannot be collected while it is being opened
+        lease = self._lease_path(gen_dir)
+        try:
+            with open(lease, "w"):
+                pass
+            return TerrainGeneration(gen_dir)
+        except (OSError, ValueError):
+            try:
+                os.remove(lease)
+            except OSError:
+                pass
+            return None
+
+    def current(self) -> Optional[TerrainGeneration]:
+        """
+        The attached generation, or None when no store has been built.
+        """
+        try:
+            mtime = os.path.getmtime(os.path.join(self.store_dir, CURRENT_NAME))
+        except OSError:
+            mtime = None
+        with self._lock:
+            # Also retried while attaching failed, e.g. a generation being collected as current.json changed
+            if mtime != self._mtime or (self._generation is None and mtime is not None):
+                old = self._generation
+                self._generation = self._attach() if mtime is not None else None
+                self._mtime = mtime
+                if old is not None and (self._generation is None or old.id != self._generation.id):
+                    self._release(old)
+                    self.reloads += 1
+            return self._generation
+
+    def _release(self, generation):
+        try:
+            os.remove(self._lease_path(generation.dir))
+        except OSError:
+            pass
+
+    def release(self):
+        with self._lock:
+            if self._generation is not None:
+                self._release(self._generation)
+            self._generation = None
+            self._mtime = None
+
+    def stats(self) -> dict:
+        generation = self.current()
+        if generation is None:
+            return {"generation": None}
+        return {
+            "generation": generation.id,
+            "shape": generation.meta["shape"],
+            "mapped_bytes": generation.nbytes(),
+            "reloads": self.reloads,
+        }
+
+
+terrain_store = TerrainStore()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Build the shared terrain store that every server worker memory-maps. "
+                    "Run it before starting the workers; with --watch it keeps running and publishes a new "
+                    "generation whenever the EPT dataset changes."
+    )
+    parser.add_argument("--ept", default=EPT_PATH)
+    parser.add_argument("--store-dir", default=TERRAIN_STORE_DIR)
+    parser.add_argument("--force", action="store_true", help="Build a new generation even if the dataset is unchanged")
+    parser.add_argument("--watch", action="store_true", help="Keep checking the dataset and reload on change")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL)
+    args = parser.parse_args()
+    print(build_generation(args.ept, args.store_dir, force=args.force))
+    while args.watch:
+        time.sleep(args.interval)
+        try:
+            summary = build_generation(args.ept, args.store_dir)
+            if summary["built"]:
+                print(summary)
+            else:
+                collect_garbage(args.store_dir)
+        except Exception as e:
+            print(f"Terrain store update failed: {e}")
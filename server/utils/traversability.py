@@ -0,0 +1,220 @@
+import os
+import math
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from utils.executor import register_worker_stats
+
+# Same neighbour order as the original dict-based searches, so ties resolve identically
+NEIGHBOR_OFFSETS = ((-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+STEP_LENGTHS = tuple(math.sqrt(dy * dy + dx * dx) for dy, dx in NEIGHBOR_OFFSETS)
+
+EDGE_TABLE_CACHE_SIZE = 16
+# Tables take about 17 bytes per cell and direction, and their flat_climbs() list another 32 on top
+EDGE_TABLE_CACHE_MAX_BYTES = int(os.environ.get("EDGE_TABLE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+INF = float("inf")
+
+
+class EdgeTables:
+    """
+    8-direction passability and edge-cost stacks for one elevation grid and constraint set.
+
+    Cells are addressed by a single integer index into a (rows + 2) x (cols + 2) grid whose border
+    is never passable, so neighbour lookups need no bounds checks. passable[r, c, k] tells whether
+    the step from padded cell (r, c) in direction k satisfies the forbidden mask, elevation range,
+    slope and step constraints; cost[r, c, k] is its cost (step length + |dz|) and climb[r, c, k]
+    its |dz|, both inf when impassable.
+
+    spacing is the size of one cell in base-grid cells (used by coarse pyramid levels): step lengths
+    are scaled by it for slopes and costs, while max_step keeps applying to the unscaled 1 / sqrt(2) steps.
+    """
+
+    def __init__(
+        self,
+        elevations,
+        max_slope=None,
+        forbidden_mask=None,
+        min_elev=None,
+        max_elev=None,
+        max_step=None,
+        spacing=1.0,
+    ):
+        elevations = np.asarray(elevations, dtype=np.float64)
+        self.elevations = elevations
+        self.spacing = spacing
+        self.step_lengths = tuple(step * spacing for step in STEP_LENGTHS)
+        self.rows, self.cols = elevations.shape
+        self.width = self.cols + 2
+        self.size = (self.rows + 2) * self.width
+        self.offsets = tuple(dy * self.width + dx for dy, dx in NEIGHBOR_OFFSETS)
+
+        padded = np.zeros((self.rows + 2, self.width), dtype=np.float64)
+        padded[1:-1, 1:-1] = elevations
+        allowed = np.ones(elevations.shape, dtype=bool)
+        if forbidden_mask is not None:
+            allowed &= ~np.asarray(forbidden_mask, dtype=bool)
+        # Written as "not below / not above" so NaN elevations pass, like the original comparisons
+        if min_elev is not None:
+            allowed &= ~(elevations < min_elev)
+        if max_elev is not None:
+            allowed &= ~(elevations > max_elev)
+        cell_ok = np.zeros((self.rows + 2, self.width), dtype=bool)
+        cell_ok[1:-1, 1:-1] = allowed
+        self.cell_ok = cell_ok
+
+        rows, cols = self.rows, self.cols
+        passable = np.zeros((self.rows + 2, self.width, 8), dtype=bool)
+        climb = np.full((self.rows + 2, self.width, 8), np.inf)
+        source = padded[1:-1, 1:-1]
+        for k, (dy, dx) in enumerate(NEIGHBOR_OFFSETS):
+            if max_step is not None and STEP_LENGTHS[k] > max_step:
+                continue
+            target = padded[1 + dy:rows + 1 + dy, 1 + dx:cols + 1 + dx]
+            ok = cell_ok[1 + dy:rows + 1 + dy, 1 + dx:cols + 1 + dx].copy()
+            dz = target - source
+            if max_slope is not None:
+                with np.errstate(invalid="ignore"):
+                    ok &= ~(np.abs(dz / self.step_lengths[k]) > max_slope)
+            passable[1:-1, 1:-1, k] = ok
+            climb[1:-1, 1:-1, k] = np.where(ok, np.abs(dz), np.inf)
+        self.passable = passable
+        self.climb = climb
+        self.cost = climb + np.asarray(self.step_lengths)
+        self._flat_climbs = None
+        self._flat_passable = None
+        self._csr = None
+
+    def index(self, cell):
+        return (int(cell[0]) + 1) * self.width + int(cell[1]) + 1
+
+    def cell(self, index):
+        row, col = divmod(index, self.width)
+        return row - 1, col - 1
+
+    def trace(self, parent, goal):
+        path = []
+        current = goal
+        while current != -1:
+            path.append(self.cell(current))
+            current = parent[current]
+        path.reverse()
+        return path
+
+    def flat_climbs(self):
+        """
+        |dz| of every edge as one flat list, direction k from cell i at [i * 8 + k], for the search loops.
+        The loops add the step length themselves so path costs are summed exactly as before.
+        Built once per table and shared by every search that reuses it; callers must not modify it.
+        """
+        if self._flat_climbs is None:
+            self._flat_climbs = self.climb.ravel().tolist()
+            _trim_cache()
+        return self._flat_climbs
+
+    def flat_passable(self):
+        if self._flat_passable is None:
+            self._flat_passable = bytes(self.passable.ravel().tobytes())
+        return self._flat_passable
+
+
+    def csr_graph(self):
+        """
+        The directed 8-connected grid graph as a scipy.sparse CSR matrix over padded cell indices,
+        with the edge costs as weights. Built with vectorized code and kept with the tables.
+        """
+        if self._csr is None:
+            from scipy.sparse import csr_matrix
+
+            sources, directions = np.nonzero(self.passable.reshape(self.size, 8) & np.isfinite(self.cost.reshape(self.size, 8)))
+            targets = sources + np.asarray(self.offsets)[directions]
+            weights = self.cost.reshape(self.size, 8)[sources, directions]
+            self._csr = csr_matrix((weights, (sources, targets)), shape=(self.size, self.size))
+            _trim_cache()
+        return self._csr
+
+    def nbytes(self) -> int:
+        """
+        Memory held by the tables, including the lazily built flat lists and CSR graph. A flat_climbs()
+        entry counts 32 bytes: an 8-byte list slot and a 24-byte float object.
+        """
+        total = sum(array.nbytes for array in (self.elevations, self.cell_ok, self.passable, self.climb, self.cost))
+        if self._flat_climbs is not None:
+            total += 32 * len(self._flat_climbs)
+        if self._flat_passable is not None:
+            total += len(self._flat_passable)
+        if self._csr is not None:
+            total += self._csr.data.nbytes + self._csr.indices.nbytes + self._csr.indptr.nbytes
+        return total
+
+
+def _digest(array) -> str:
+    if array is None:
+        return ""
+    array = np.ascontiguousarray(array)
+    return f"{array.shape}{array.dtype}" + hashlib.blake2b(array.tobytes(), digest_size=16).hexdigest()
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def edge_tables(
+    elevations,
+    max_slope=None,
+    forbidden_mask=None,
+    min_elev=None,
+    max_elev=None,
+    max_step=None,
+    spacing=1.0,
+) -> EdgeTables:
+    """
+    Returns the EdgeTables for a grid and constraint set, reusing a cached copy when the same
+    elevations (by content) were already processed with the same constraints.
+    """
+    key = (
+        _digest(np.asarray(elevations, dtype=np.float64)), _digest(forbidden_mask),
+        max_slope, min_elev, max_elev, max_step, spacing,
+    )
+    with _cache_lock:
+        tables = _cache.get(key)
+        if tables is not None:
+            _cache.move_to_end(key)
+            _cache_stats["hits"] += 1
+            return tables
+        _cache_stats["misses"] += 1
+    tables = EdgeTables(elevations, max_slope, forbidden_mask, min_elev, max_elev, max_step, spacing)
+    with _cache_lock:
+        _cache[key] = tables
+    _trim_cache()
+    return tables
+
+
+def _trim_cache():
+    # Tables grow when their flat lists or CSR graph are first built, so this also runs after that
+    with _cache_lock:
+        cached = sum(tables.nbytes() for tables in _cache.values())
+        while len(_cache) > EDGE_TABLE_CACHE_SIZE or (len(_cache) > 1 and cached > EDGE_TABLE_CACHE_MAX_BYTES):
+            _, evicted = _cache.popitem(last=False)
+            cached -= evicted.nbytes()
+            _cache_stats["evictions"] += 1
+
+
+def edge_table_cache_stats() -> dict:
+    with _cache_lock:
+        return {
+            "entries": len(_cache),
+            "bytes": sum(tables.nbytes() for tables in _cache.values()),
+            "max_bytes": EDGE_TABLE_CACHE_MAX_BYTES,
+            **_cache_stats,
+        }
+
+
+register_worker_stats("edge_tables", edge_table_cache_stats)
+
+
+def clear_edge_table_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,115 @@
+import os
+import time
+import importlib
+import threading
+from utils.ept import EPT_PATH, get_ept_info
+from utils.metrics import stage
+
+# Areas to load into the point cache at startup, as "min_x,max_x,min_y,max_y[,grid_size]" entries separated by ";"
+PREWARM_AREAS = os.environ.get("PREWARM_AREAS", "")
+PREWARM_GRID_SIZE = int(os.environ.get("PREWARM_GRID_SIZE", 100))
+# Imported lazily by the request code; loading them here keeps the import time out of the first request
+HEAVY_MODULES = ("pdal", "scipy.interpolate", "scipy.ndimage", "scipy.spatial", "scipy.sparse.csgraph")
+
+
+def parse_areas(spec: str = PREWARM_AREAS):
+    """
+    Parses PREWARM_AREAS into a list of ((min_x, max_x, min_y, max_y), grid_size) tuples.
+    """
+    areas = []
+    for entry in spec.split(";"):
+        if not entry.strip():
+            continue
+        values = [float(v) for v in entry.split(",")]
+        if len(values) not in (4, 5):
+            raise ValueError(f"Prewarm area '{entry}' needs min_x,max_x,min_y,max_y and an optional grid size")
+        min_x, max_x, min_y, max_y = values[:4]
+        if min_x >= max_x or min_y >= max_y:
+            raise ValueError(f"Prewarm area '{entry}' is empty")
+        areas.append(((min_x, max_x, min_y, max_y), int(values[4]) if len(values) == 5 else PREWARM_GRID_SIZE))
+    return areas
+
+
+def warm_process(ept_path: str = EPT_PATH, areas=None) -> dict:
+    """
+    Loads what the first request would otherwise load in this process: the heavy modules, the
+    parsed ept.json and hierarchy, and the ground points of each prewarm area (through the same
+    get_elevation_grid call a request makes, so requests over an area at that grid density hit the
+    point cache). Returns the seconds spent per stage; a failing stage is reported, not raised.
+    """
+    from utils.optimal_path import get_elevation_grid
+
+    timings = {}
+    errors = []
+    with stage(timings, "imports"):
+        for name in HEAVY_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                errors.append(f"{name}: {e}")
+    with stage(timings, "ept_info"):
+        try:
+            get_ept_info(ept_path)
+        except (OSError, ValueError) as e:
+            errors.append(f"ept.json: {e}")
+    with stage(timings, "areas"):
+        for bounds, grid_size in parse_areas() if areas is None else areas:
+            try:
+                get_elevation_grid(bounds, grid_size=grid_size, ept_path=ept_path)
+            except Exception as e:
+                errors.append(f"area {bounds}: {e}")
+    return {"seconds": timings, "errors": errors}
+
+
+def warm_worker(index: int = 0, workers: int = 1):
+    # Worker pool warm-up: every worker process needs its own imports and metadata, but each area
+    # is prefetched by one worker only, so the areas take their points' memory once, not per worker
+    summary = warm_process(areas=parse_areas()[index::workers])
+    for error in summary["errors"]:
+        print(f"Worker {os.getpid()} warm-up: {error}")
+
+
+class Readiness:
+    """
+    Startup state of the server: warms the server process in a background thread, then waits
+    until every worker of the job executor has run its own warm-up.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.ready_after = None
+        self.summary = None
+        self._ready = threading.Event()
+
+    def start(self, job_executor=None, ept_path: str = EPT_PATH, warm: bool = True) -> threading.Thread:
+        """
+        Warms up in a daemon thread and marks the server ready when done. warm=False skips the
+        warm-up of this process; without job_executor there are no workers to wait for. With a
+        process pool the areas are left to the workers, which run the requests that read them.
+        """
+        areas = [] if job_executor is not None and job_executor.kind == "process" else None
+
+        def _run():
+            self.summary = warm_process(ept_path, areas) if warm else {"seconds": {}, "errors": []}
+            for error in self.summary["errors"]:
+                print(f"Warm-up: {error}")
+            while job_executor is not None and not job_executor.warmed_up():
+                time.sleep(0.05)
+            self.ready_after = time.perf_counter() - self.started
+            self._ready.set()
+            print(f"Ready after {self.ready_after:.2f} s")
+
+        thread = threading.Thread(target=_run, name="warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def stats(self) -> dict:
+        if not self.ready():
+            return {"status": "starting", "seconds": time.perf_counter() - self.started}
+        return {"status": "ready", "startup_seconds": self.ready_after, **self.summary}
+
+
+readiness = Readiness()